@@ -14,6 +14,12 @@ from langchain_core.documents import Document
 import os
 from pprint import pprint
 
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.ingestion import split_lazily
+from utils.parallel_loader import ParallelDirectoryLoader
+from utils.pdf_stream import PDFPageStreamLoader
+
 # %% Text Import from Markdown File
 file_path = 'data/chromadb_cheatsheet.md'
 loader = TextLoader(file_path)
@@ -50,6 +56,14 @@ file_path = "data/Retrieval Augmented Generation.pdf"
 loader = PyPDFLoader(file_path)
 docs_pdf = loader.load()
 
+# %% large PDFs: stream pages instead of loading them all
+# pages come out as they are parsed (memory stays flat), and go straight into the splitter;
+# max_workers > 1 extracts page ranges in parallel processes
+loader = PDFPageStreamLoader(file_path, pages_per_range=32, max_workers=1)
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100, add_start_index=True)
+chunks_pdf = split_lazily(loader.lazy_load(), text_splitter)
+next(chunks_pdf)
+
 #%% Word Document
 file_path = "data/Vector Databases.docx"
 loader = Docx2txtLoader(file_path)
@@ -75,4 +89,15 @@ for file_path in file_paths[:2]:
 # %%
 docs_unstructured
 
+# %% load a whole folder
+# loader picked by file type (PDF, Word, text, Unstructured for the rest); documents stream back as
+# each file finishes, a broken file only shows up in loader.errors.
+# max_workers=1 loads in this process: worker processes re-import this script on Windows/macOS, so
+# max_workers > 1 (one process per core) belongs in a script under `if __name__ == "__main__":`
+loader = ParallelDirectoryLoader("data", max_workers=1)
+docs_folder = list(loader.lazy_load())
+print(f"{len(docs_folder)} documents from {len(loader.results)} files")
+for result in loader.results:
+    print(f"{result.seconds:6.2f}s  {result.loader:>12}  {result.path}  {result.error or ''}")
+
 # %%
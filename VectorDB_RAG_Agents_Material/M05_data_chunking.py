@@ -9,13 +9,18 @@ from langchain_text_splitters import (
 
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_openai.embeddings import OpenAIEmbeddings
+from utils.artifact_cache import ArtifactCache
+from utils.embedding_cache import CachedEmbeddings
+from utils.semantic_chunking import BatchedSemanticChunker
 
 import matplotlib.pyplot as plt
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv(usecwd=True))
 # %%
+# parsed documents and chunks are cached by file content + loader/splitter settings: re-runs skip both
+artifact_cache = ArtifactCache()
 loader = Docx2txtLoader("data/Vector Databases.docx")
-pages = loader.load_and_split()
+pages = artifact_cache.split(RecursiveCharacterTextSplitter(), artifact_cache.load(loader))  # = loader.load_and_split()
 print(f'Loaded {len(pages)} pages from the Word Document.')
 
 
@@ -36,14 +41,14 @@ recursive_text_splitter = RecursiveCharacterTextSplitter(
 
 
 # %% Character Text Splitter
-texts = text_splitter.split_documents(pages)
+texts = artifact_cache.split(text_splitter, pages)
 print(f'Number of Chunks after splitting: {len(texts)}')
 # get the number of tokens in each chunk
 chunks = [len(doc.page_content) / 4 for doc in texts]
 print(f"Number of Tokens in each chunk: {chunks}")
 
 # %% Recursive Character Text Splitter
-texts = recursive_text_splitter.split_documents(pages)
+texts = artifact_cache.split(recursive_text_splitter, pages)
 print(f'Number of Chunks after splitting: {len(texts)}')
 # get the number of tokens in each chunk
 chunks = [len(doc.page_content) / 4 for doc in texts]
@@ -55,10 +60,28 @@ plt.bar(range(len(chunks)), chunks)
 plt.title('Number of Tokens in each chunk')
 plt.show()
 # %% Semantic Text Splitter
-semantic_splitter = SemanticChunker(embeddings=OpenAIEmbeddings(),
+# sentence embeddings are cached on disk: re-runs do not call the API again
+semantic_splitter = SemanticChunker(embeddings=CachedEmbeddings(OpenAIEmbeddings()),
                                     breakpoint_threshold_type="gradient")
 texts = semantic_splitter.split_documents(pages)
 
+# %% Batched Semantic Text Splitter
+# same breakpoint rules; all sentences go out in a few token-packed requests, breakpoints are computed in NumPy,
+# and each chunk's vector is pooled from its sentence vectors: store it with
+# utils.ingestion.chroma_writer(db_client)(texts, chunk_vectors.tolist()) instead of embedding the chunks again
+sentence_cache = CachedEmbeddings(OpenAIEmbeddings())
+batched_splitter = BatchedSemanticChunker(embeddings=sentence_cache,
+                                          breakpoint_threshold_type="gradient",
+                                          add_start_index=True)
+texts, chunk_vectors = batched_splitter.split_documents_with_embeddings(pages)
+print(f"{len(texts)} chunks from {batched_splitter.embedded_texts} sentences "
+      f"in {batched_splitter.embedding_batches} batches; chunk vectors: {chunk_vectors.shape}")
+# only cache misses reach OpenAI: 0 requests on a re-run
+print(f"{sentence_cache.misses} sentences embedded in {sentence_cache.requests} API requests")
+
+# %% unmap the cached documents (pages and split chunks) now that they are no longer needed
+artifact_cache.close()
+
 # %%
 texts
 
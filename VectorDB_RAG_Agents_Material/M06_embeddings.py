@@ -5,6 +5,9 @@ from langchain_community.document_loaders import Docx2txtLoader
 from langchain_openai.embeddings import OpenAIEmbeddings
 from transformers import AutoTokenizer
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils.artifact_cache import ArtifactCache
+from utils.embedding_cache import CachedEmbeddings
+from utils.token_length import TokenLengthCounter, TokenRecursiveTextSplitter
 
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv(usecwd=True))
@@ -12,7 +15,8 @@ load_dotenv(find_dotenv(usecwd=True))
 
 # %% OpenAI embeddings
 # https://platform.openai.com/docs/guides/embeddings/embedding-models
-embeddings_model = OpenAIEmbeddings(model='text-embedding-3-small')
+# cached on disk by (model, text): already embedded texts skip the API
+embeddings_model = CachedEmbeddings(OpenAIEmbeddings(model='text-embedding-3-small'))
 
 
 # %%
@@ -21,24 +25,34 @@ tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/all-minilm-l6-v
 def tokens(text: str) -> int:
     return len(tokenizer.encode(text))
 
-text_splitter = RecursiveCharacterTextSplitter(
+# same counts as tokens(), but each document is tokenized only once
+# (the splitter registers every document with the counter before splitting it)
+token_length = TokenLengthCounter.from_hf_tokenizer(tokenizer)
+
+text_splitter = TokenRecursiveTextSplitter(
     chunk_size = 256,
     chunk_overlap  = 26,
-    length_function = tokens,
+    length_function = token_length,
     add_start_index = True,
 )
 # %%
+# parsed documents and chunks are cached by file content + loader/splitter settings: re-runs skip both
+artifact_cache = ArtifactCache()
 loader = Docx2txtLoader("data/Vector Databases.docx")
-pages = loader.load_and_split()
+pages = artifact_cache.split(RecursiveCharacterTextSplitter(), artifact_cache.load(loader))  # = loader.load_and_split()
 
 #%% Split the text with text_splitter
-docs_texts = text_splitter.split_documents(pages)
+docs_texts = artifact_cache.split(text_splitter, pages)
+print(token_length.stats())
 # %%
 texts = [doc.page_content for doc in docs_texts]
+artifact_cache.close()  # unmap the cached pages and chunks; the texts are copied out
 # %%
 embeddings = embeddings_model.embed_documents(texts)
 # %% for each chunk, calculate the embeddings
 len(embeddings)
+#%% cache hits / misses
+embeddings_model.stats()
 # %% get the length of vectors
 print(f"length of embeddings {len(embeddings[1])}")
 
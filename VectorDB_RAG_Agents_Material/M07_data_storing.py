@@ -1,6 +1,7 @@
 #%% Packages
 import os
 import requests
+from typing import Iterator
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
@@ -11,6 +12,11 @@ from langchain_core.documents import Document
 from langchain_community.document_loaders import GutenbergLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from utils.bm25 import BM25Index
+from utils.embedding_cache import CachedEmbeddings
+from utils.hnsw import HNSWParams
+from utils.ingestion import incremental_ingest, stream_chunks
+
 
 #%% To work with URLs
 CA_BUNDLE = os.path.expanduser("~/certs/ca-bundle.pem")
@@ -48,28 +54,30 @@ def process_data(url: str, book_title: str) -> list[Document]:
     return chunks
 
 #%% load the text and split it
-def process_data(url: str, book_title: str) -> list[Document]:
-    # load text
-    loader = GutenbergLoader(url)
-    data = loader.load()
-    # split text
+def process_data(url: str, book_title: str) -> Iterator[Document]:
+    # streams the book: only one window of text is split at a time
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size = 1000,
         chunk_overlap  = 100,
         add_start_index = True,
     )
-    chunks = text_splitter.split_documents(data)
-    # add metadata book_title
-    for chunk in chunks:
-        chunk.metadata["book_title"] = book_title
-    return chunks
+    return stream_chunks(url, text_splitter, metadata={"book_title": book_title})
 
 #%% Embeddings Model
-embeddings_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+# in-process model: this file runs top to bottom as a script too, and a process
+# pool (SentenceTransformerPool) would re-import it in every worker. The pool's
+# speed-up is measured in benchmarks/embedding_pool_benchmark.py.
+embeddings_model = CachedEmbeddings(SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2"))
 
 # %% connect to the database
 persistent_db_path = "db"
-db_client = Chroma(persist_directory=persistent_db_path, embedding_function=embeddings_model)
+# index parameters, used when the collection is created (tune them with benchmarks/hnsw_autotune.py;
+# an existing collection keeps its own: `python working_with_chroma.py rebuild --M ...` changes them)
+hnsw_params = HNSWParams(M=16, construction_ef=100, search_ef=100)
+db_client = Chroma(persist_directory=persistent_db_path, embedding_function=embeddings_model,
+                   collection_metadata=hnsw_params.metadata())
+# BM25 index of the same chunks (same ids), for hybrid lexical + vector search
+bm25_index = BM25Index.open("db_bm25")
 
 #%% Text Import from Project Gutenberg
 dracula_url = "https://www.gutenberg.org/cache/epub/345/pg345.txt"
@@ -81,10 +89,19 @@ frankenstein_chunks = process_data(url=frankenstein_url, book_title="Frankenstei
 
 
 # %% add the documents to the database
-db_client.add_documents(dracula_chunks)
+# load/split, embed and write overlap; memory is bounded by the batches in flight.
+# Chunk ids come from source + start_index + content hash: re-runs only embed
+# chunks with new text, re-key shifted chunks with their stored vectors and
+# remove the ones that disappeared.
+dracula_stats = incremental_ingest(dracula_chunks, dracula_url, embeddings_model, db_client,
+                                   lexical_index=bm25_index, batch_size=64, max_memory_mb=256)
+print(dracula_stats)
 
 #%%
-db_client.add_documents(frankenstein_chunks)
+frankenstein_stats = incremental_ingest(frankenstein_chunks, frankenstein_url, embeddings_model, db_client,
+                                        lexical_index=bm25_index, batch_size=64, max_memory_mb=256)
+print(frankenstein_stats)
+bm25_index.save()
 # %%
 len(db_client.get()['ids'])
 
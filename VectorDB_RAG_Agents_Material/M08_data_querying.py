@@ -5,6 +5,14 @@ from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
 from pprint import pprint
 
+from utils.bm25 import BM25Index
+from utils.hnsw import HNSWParams
+from utils.hybrid_search import hybrid_search
+from utils.metadata_index import MetadataIndex
+from utils.mmr import max_marginal_relevance_search, max_marginal_relevance_search_batch
+from utils.numpy_store import NumpyVectorStore
+from utils.quantized_store import QuantizedVectorStore
+
 #%% Embeddings Model
 embeddings_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
 print(embeddings_model)
@@ -13,6 +21,9 @@ print(embeddings_model)
 persistent_db_path = "db"
 db_client = Chroma(persist_directory=persistent_db_path,
                    embedding_function=embeddings_model)
+# index parameters stored with the collection; search ef (candidates kept per query: higher = better
+# recall, slower) is tuned with `python working_with_chroma.py search-ef --search-ef N` or `rebuild`
+print(HNSWParams.of(db_client))
 
 # %% get all objects
 res = db_client.get()
@@ -25,14 +36,47 @@ res = db_client.similarity_search_with_score(my_query, k=5)
 found_docs= [doc[0] for doc in res]              
 score = [doc[1] for doc in res]              
 
+# %% Exact search with NumPy: brute force over an mmap'd float32 matrix
+# for small/medium collections it beats the HNSW index (see benchmarks/brute_force_vs_hnsw.py)
+numpy_db = NumpyVectorStore.from_chroma(db_client, path="db_numpy")
+numpy_db.similarity_search_with_score(my_query, k=5)
+
+#%% many queries in one pass over the matrix
+res = numpy_db.similarity_search_batch(["Where does Dracula live?",
+                                        "Who created the monster?"], k=3)
+
+# %% Quantized storage: int8 (or binary) codes in RAM, float32 on disk
+# the codes pick candidates, the float32 vectors (mmap) re-score only those
+quantized_db = QuantizedVectorStore.from_chroma(db_client, path="db_quantized", mode="int8")
+quantized_db.similarity_search(my_query)
+
+#%%
+res = quantized_db.similarity_search_with_score(my_query, k=5)
+
+#%% memory saved and recall@k against the float32 search
+pprint(quantized_db.memory_report())
+quantized_db.recall_at_k(["Where does Dracula live?",
+                          "Who created the monster?",
+                          "What happens after Dracula bites someone?"], k=5)
+
 # %% Maximum Margin Relevance
-# lambda_param: 0.0: only similarity, 1.0: only diversity
-# k: number of results
-db_client.max_marginal_relevance_search(my_query, 
-                                        k=5, 
-                                        lambda_param=0.5)
+# lambda_mult: 1.0: only similarity, 0.0: only diversity
+# k: number of results, fetch_k: candidates re-ranked (vectorized, fetch_k can be large)
+max_marginal_relevance_search(db_client, my_query,
+                              k=5,
+                              fetch_k=200,
+                              lambda_mult=0.5)
+
+#%% MMR for several queries at once
+res = max_marginal_relevance_search_batch(db_client, ["Where does Dracula live?",
+                                                      "Who created the monster?"], k=5, fetch_k=200)
+
+# %% Hybrid Search: BM25 + vectors, fused with reciprocal rank fusion
+# names and rare words ("Whitby", "Van Helsing") come from the lexical side, so k stays small
+bm25_index = BM25Index.open("db_bm25")
+hybrid_search(db_client, bm25_index, "What happens in Whitby with Van Helsing?", k=3)
 
-# %% Hybrid Search (Text + Metadata)
+# %% Filtered Search (Text + Metadata)
 my_query = "Where does it play?"
 filter_metadata =  {"book_title": "Frankenstein"}
 res = db_client.similarity_search(my_query, 
@@ -41,6 +85,19 @@ res = db_client.similarity_search(my_query,
 
 
 
+# %% Same filter resolved by the metadata index (bitmaps per key/value):
+# only the matching chunks are compared with the query
+metadata_index = MetadataIndex.from_chroma(db_client._collection)
+filtered = metadata_index.query(db_client._collection,
+                                where={"$and": [{"book_title": "Frankenstein"},
+                                                {"start_index": {"$lt": 100_000}}]},
+                                query_embeddings=[embeddings_model.embed_query(my_query)],
+                                n_results=10)
+pprint(filtered["documents"][0][:3])
+
+#%% the NumPy stores use the index for their `filter` too
+numpy_db.similarity_search(my_query, k=10, filter={"book_title": {"$in": ["Frankenstein", "Dracula"]}})
+
 # %%
 pprint(res[0].page_content)
 # %%
@@ -1,11 +1,17 @@
 #%% Packages
 # from langchain.vectorstores import Chroma
 
-from langchain_core.vectorstores import Chroma
+from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
 from pprint import pprint
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
+
+from utils.answer_cache import SemanticAnswerCache
+from utils.context_packing import ContextPacker, token_counter
+
+from utils.rag import RAGChat
+from utils.retrieval_cache import CachedRetriever
 load_dotenv()
 
 #%% Embeddings Model
@@ -14,6 +20,8 @@ embeddings_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
 #%% connect to the database
 persistent_db_path = "db"
 db_client = Chroma(persist_directory=persistent_db_path, embedding_function=embeddings_model)
+# caches query embeddings and search results; results are dropped when the collection changes
+retriever = CachedRetriever(db_client)
 
 
 # %% LLM Setup
@@ -21,26 +29,23 @@ db_client = Chroma(persist_directory=persistent_db_path, embedding_function=embe
 MODEL = "llama-3.1-8b-instant"
 llm = ChatGroq(model=MODEL, temperature=0)
 
-# %% RAG Chat Function
-def rag_chat(user_query: str, k: int = 5):
-    retrieved_docs = db_client.similarity_search(query=user_query, k=k)
-    retrieved_docs_text = [doc.page_content for doc in retrieved_docs]
+# %% Context packing
+# merge overlapping chunks (start_index), drop duplicates, fit the context into a token budget;
+# cl100k_base counts close to the Llama 3 tokenizer (both tiktoken BPEs);
+# without tiktoken or network access the count falls back to characters
+count_tokens = token_counter("cl100k_base")
+packer = ContextPacker(count_tokens, budget=1500)
 
-    retrieved_docs_text_str = "\n".join(retrieved_docs_text)
+# %% Semantic answer cache
+# paraphrased questions that retrieve the same chunks reuse the earlier answer (no LLM call)
+answer_cache = SemanticAnswerCache(threshold=0.9, max_entries=5000, ttl=6 * 3600)
 
-    query_and_context = (
-        "These docs can help you with your questions. If you have no answer, simply say 'I do not know'."
-        f"Question: {user_query}\n"
-        f"Relevant docs: {retrieved_docs_text_str}"
-    )
+# %% RAG Chat Function
+# retrieve -> pack the context -> build the prompt (utils/rag.py: build_messages) -> LLM
+rag = RAGChat(retriever, llm, context_packer=packer, answer_cache=answer_cache)
 
-    messages = [
-        ("system", "You are an expert assistant providing information strictly based on the context provided to you. Your task is to answer questions or provide information only using the details given in the current context. Do not reference any external knowledge or information not explicitly mentioned in the context. If the context does not contain sufficient information to answer a question, clearly state that the information is not available in the provided context."),
-        ("human", query_and_context)
-    ]
-    
-    res = llm.invoke(messages)
-    return res.content
+def rag_chat(user_query: str, k: int = 5):
+    return rag.chat(user_query, k=k)
 
 #%% TESTING
 # check if it only uses the provided context
@@ -51,28 +56,41 @@ user_query = "Where does Dracula live?"
 rag_chat(user_query)
 # %% RAG Chat with style
 def rag_chat_add_style_language(user_query: str, k: int = 5, style: str = "formal", language: str = "english"):
-    retrieved_docs = db_client.similarity_search(query=user_query, k=k)
-    retrieved_docs_text = [doc.page_content for doc in retrieved_docs]
-
-    retrieved_docs_text_str = "\n".join(retrieved_docs_text)
-
-    query_and_context = (
-        "These docs can help you with your questions. If you have no answer, simply say 'I do not know'."
-        f"Question: {user_query}\n"
-        f"Relevant docs: {retrieved_docs_text_str}"
-    )
-
-    messages = [
-        ("system", f"You are an expert assistant providing information strictly based on the context provided to you. Your task is to answer questions or provide information only using the details given in the current context. Do not reference any external knowledge or information not explicitly mentioned in the context. If the context does not contain sufficient information to answer a question, clearly state that the information is not available in the provided context. You should answer in a {style} style and in {language} language."),
-        ("human", query_and_context)
-    ]
-    
-    res = llm.invoke(messages)
-    return res.content
+    return rag.chat(user_query, k=k, style=style, language=language)
 
 
 # %%
 user_query = "What happens after Dracula bites someone?"
 # default of 5 docs does not hold the answer, try with 10
 rag_chat_add_style_language(user_query, style="Shakespearean", language="english",  k=10)
+# %% same question, other style: no embedding, no search
+rag_chat_add_style_language(user_query, style="casual", language="german",  k=10)
+pprint(retriever.stats())
+# prompt tokens before and after packing the 10 chunks
+pprint(packer.last_stats)
+# %% Streaming: print tokens as they arrive
+def rag_chat_stream(user_query: str, k: int = 5, **prompt):
+    for token in rag.stream(user_query, k=k, **prompt):
+        print(token, end="", flush=True)
+    print()
+    return rag.last_timing
+
+# time to first token vs. total latency
+rag_chat_stream("Where does Dracula live?", style="formal", language="english")
+# %% Many questions at once
+# one batched embedding pass and one search per batch, LLM calls run concurrently; answers keep the input order
+# (async code can use `await rag.achat(q)` / `await rag.achat_batch(questions)` directly)
+def rag_chat_batch(questions: list[str], k: int = 5, concurrency: int = 8, **prompt):
+    return rag.chat_batch(questions, k=k, concurrency=concurrency, **prompt)
+
+questions = ["Where does Dracula live?",
+             "Who created the monster?",
+             "What happens after Dracula bites someone?"]
+answers = rag_chat_batch(questions, concurrency=4)
+pprint(dict(zip(questions, answers)))
+# %% Paraphrases: answered from the semantic cache in milliseconds when the retrieved context is the same
+for question in ["Where does Dracula live?", "Where does Dracula live ?", "Where is Dracula living?"]:
+    rag_chat(question)
+    print(f"{question!r}: {rag.last_timing.total_seconds * 1000:.1f} ms")
+pprint(answer_cache.stats())
 # %%
@@ -0,0 +1,94 @@
+# brute_force_vs_hnsw.py
+"""
+Exact NumPy brute force vs. Chroma's HNSW index on synthetic clustered
+vectors: build time, query latency (single and batched) and recall@k, per
+collection size. Prints the size from which HNSW answers faster.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.brute_force_vs_hnsw --sizes 1000 10000 100000 --dim 384
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from benchmarks.common import CHROMA_BATCH, clustered_vectors
+from utils.numpy_store import NumpyVectorStore
+
+
+def build_numpy(path: str, vectors: np.ndarray) -> tuple[NumpyVectorStore, float]:
+    t0 = time.perf_counter()
+    ids = [str(i) for i in range(len(vectors))]
+    store = NumpyVectorStore.build(path, vectors, [""] * len(vectors), [{}] * len(vectors), ids, None, metric="cosine")
+    return store, time.perf_counter() - t0
+
+
+def build_hnsw(vectors: np.ndarray) -> tuple[chromadb.Collection, float]:
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(f"bench_{len(vectors)}", metadata={"hnsw:space": "cosine"})
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), CHROMA_BATCH):
+        block = vectors[start:start + CHROMA_BATCH]
+        collection.add(ids=[str(i) for i in range(start, start + len(block))], embeddings=block)
+    return collection, time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000, 20_000, 50_000, 100_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"dim {args.dim}, {args.queries} queries, k={args.k}; latencies in ms per query")
+    print(f"{'n':>9} {'build np':>9} {'build hnsw':>10} {'np 1x1':>8} {'np batch':>9} {'hnsw 1x1':>9} "
+          f"{'hnsw batch':>10} {'recall':>7}")
+    crossover = None
+    for n in args.sizes:
+        vectors = clustered_vectors(n, args.dim, args.clusters, rng)
+        queries = clustered_vectors(args.queries, args.dim, args.clusters, rng)
+        with tempfile.TemporaryDirectory() as path:
+            store, np_build = build_numpy(path, vectors)
+            collection, hnsw_build = build_hnsw(vectors)
+
+            t0 = time.perf_counter()
+            for query in queries:
+                store.search_vectors(query, args.k)
+            np_single = (time.perf_counter() - t0) / len(queries)
+            t0 = time.perf_counter()
+            exact, _ = store.search_vectors(queries, args.k)
+            np_batch = (time.perf_counter() - t0) / len(queries)
+
+            t0 = time.perf_counter()
+            for query in queries:
+                collection.query(query_embeddings=[query], n_results=args.k, include=[])
+            hnsw_single = (time.perf_counter() - t0) / len(queries)
+            t0 = time.perf_counter()
+            found = collection.query(query_embeddings=queries, n_results=args.k, include=[])["ids"]
+            hnsw_batch = (time.perf_counter() - t0) / len(queries)
+            del store
+
+        recall = np.mean([
+            len(set(map(int, ids)) & set(truth.tolist())) / args.k for ids, truth in zip(found, exact)
+        ])
+        if crossover is None and hnsw_single < np_single:
+            crossover = n
+        print(f"{n:>9} {np_build:>8.2f}s {hnsw_build:>9.2f}s {np_single * 1e3:>8.2f} {np_batch * 1e3:>9.3f} "
+              f"{hnsw_single * 1e3:>9.2f} {hnsw_batch * 1e3:>10.3f} {recall:>7.3f}")
+
+    if crossover is None:
+        print("brute force was faster at every size tested")
+    else:
+        print(f"HNSW single-query latency wins from n={crossover} (brute force is exact and needs no index build)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# chunking_autotune.py
+"""
+Chunking autotuner: sweeps chunker type, chunk size and overlap on a local
+corpus and a question set. For every configuration it reports index size on
+disk, ingest time (split + embed + write), query latency, recall@k of the
+gold passages and the average prompt tokens of the retrieved context. It
+then marks the Pareto-optimal configurations and recommends one: the
+smallest index among the Pareto set whose recall is within `--tolerance`
+of the best.
+
+Questions: a JSON list (or JSONL) of {"question": ..., "gold": passage
+text as it appears in the corpus}. Without `--questions`, sentences are
+sampled from the corpus and asked with every third word dropped; that
+tests retrievability, use real questions for real decisions.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.chunking_autotune --corpus data --sizes 256 512 1000 2000 --overlaps 0 0.1 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+import chromadb
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter
+
+from benchmarks.common import CHROMA_BATCH, dir_bytes
+from utils.fakes import HashEmbeddings
+from utils.ingestion import chroma_writer
+from utils.parallel_loader import ParallelDirectoryLoader
+from utils.semantic_chunking import BatchedSemanticChunker, approx_tokens
+
+GOLD_COVERAGE = 0.5  # share of a gold passage a retrieved chunk must contain to count as found
+
+
+@dataclass
+class Question:
+    question: str
+    gold: str
+    doc: int = -1    # document that contains the gold passage
+    start: int = -1  # its offset in that document
+
+
+@dataclass
+class TrialResult:
+    chunker: str
+    chunk_size: Optional[int]
+    chunk_overlap: Optional[int]
+    chunks: int
+    index_bytes: int
+    ingest_seconds: float
+    p50_ms: float
+    p95_ms: float
+    recall_at_k: float
+    prompt_tokens: float
+    pareto: bool = False
+
+
+def load_corpus(path: str) -> list[Document]:
+    docs = [doc for doc in ParallelDirectoryLoader(path, max_workers=1).lazy_load() if doc.page_content.strip()]
+    for i, doc in enumerate(docs):
+        doc.metadata = {**doc.metadata, "doc": i}
+    return docs
+
+
+def locate(questions: list[Question], docs: list[Document]) -> list[Question]:
+    """Find each gold passage in the corpus; questions whose passage is not found are dropped."""
+    found = []
+    for q in questions:
+        for doc in docs:
+            start = doc.page_content.find(q.gold)
+            if start >= 0:
+                q.doc, q.start = doc.metadata["doc"], start
+                found.append(q)
+                break
+    return found
+
+
+def sample_questions(docs: list[Document], n: int, rng: random.Random) -> list[Question]:
+    sentences = [
+        sentence.strip() for doc in docs for sentence in re.split(r"(?<=[.?!])\s+|\n{2,}", doc.page_content)
+        if 80 <= len(sentence.strip()) <= 400
+    ]
+    questions = []
+    for gold in rng.sample(sentences, min(n, len(sentences))):
+        words = gold.split()
+        questions.append(Question(" ".join(w for i, w in enumerate(words) if i % 3 != 2), gold))
+    return questions
+
+
+def read_questions(path: str) -> list[Question]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    items = json.loads(text) if text.lstrip().startswith("[") else [json.loads(l) for l in text.splitlines() if l]
+    return [Question(item["question"], item["gold"]) for item in items]
+
+
+def splitters(args: argparse.Namespace, embeddings: Any) -> list[tuple[str, Optional[int], Optional[int], Any]]:
+    configs = []
+    for name in args.chunkers:
+        if name == "semantic":
+            for threshold_type in ("percentile", "gradient"):
+                configs.append((f"semantic-{threshold_type}", None, None, BatchedSemanticChunker(
+                    embeddings, breakpoint_threshold_type=threshold_type, add_start_index=True)))
+            continue
+        splitter_class = RecursiveCharacterTextSplitter if name == "recursive" else CharacterTextSplitter
+        for size in args.sizes:
+            for overlap in args.overlaps:
+                overlap_chars = int(size * overlap)
+                kwargs = {"separator": " "} if name == "character" else {}
+                configs.append((name, size, overlap_chars, splitter_class(
+                    chunk_size=size, chunk_overlap=overlap_chars, add_start_index=True, **kwargs)))
+    return configs
+
+
+def covers(chunk: Document, q: Question) -> bool:
+    if chunk.metadata.get("doc") != q.doc or chunk.metadata.get("start_index", -1) < 0:
+        return False
+    start = chunk.metadata["start_index"]
+    overlap = min(start + len(chunk.page_content), q.start + len(q.gold)) - max(start, q.start)
+    return overlap >= GOLD_COVERAGE * len(q.gold)
+
+
+def run_trial(name: str, size: Optional[int], overlap: Optional[int], splitter: Any, docs: list[Document],
+              questions: list[Question], embeddings: Any, k: int, workdir: str) -> TrialResult:
+    path = tempfile.mkdtemp(dir=workdir)
+    db = Chroma(persist_directory=path, embedding_function=embeddings, collection_name="chunks")
+    t0 = time.perf_counter()
+    if isinstance(splitter, BatchedSemanticChunker):
+        chunks, vectors = splitter.split_documents_with_embeddings(docs)  # pooled, no second embedding pass
+        vectors = vectors.tolist()
+    else:
+        chunks = splitter.split_documents(docs)
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+    write = chroma_writer(db)
+    for start in range(0, len(chunks), CHROMA_BATCH):
+        write(chunks[start:start + CHROMA_BATCH], vectors[start:start + CHROMA_BATCH])
+    ingest_seconds = time.perf_counter() - t0
+
+    latencies, hits, tokens = [], 0, []
+    for q in questions:
+        t0 = time.perf_counter()
+        found = db.similarity_search(q.question, k=k)
+        latencies.append(time.perf_counter() - t0)
+        hits += any(covers(chunk, q) for chunk in found)
+        tokens.append(sum(approx_tokens(chunk.page_content) for chunk in found))
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1e3
+    return TrialResult(name, size, overlap, len(chunks), dir_bytes(path), round(ingest_seconds, 3),
+                       round(float(p50), 3), round(float(p95), 3), round(hits / len(questions), 4),
+                       round(float(np.mean(tokens)), 1))
+
+
+def pareto_front(results: list[TrialResult]) -> None:
+    """Mark results no other result beats on every objective (and strictly on one)."""
+    def objectives(r: TrialResult) -> tuple:
+        # all minimized
+        return (r.index_bytes, r.ingest_seconds, r.p95_ms, r.prompt_tokens, -r.recall_at_k)
+
+    for r in results:
+        mine = objectives(r)
+        r.pareto = not any(
+            all(a <= b for a, b in zip(objectives(o), mine)) and objectives(o) != mine for o in results
+        )
+
+
+def recommend(results: list[TrialResult], tolerance: float) -> TrialResult:
+    best_recall = max(r.recall_at_k for r in results)
+    candidates = [r for r in results if r.pareto and r.recall_at_k >= best_recall - tolerance]
+    return min(candidates, key=lambda r: (r.index_bytes, r.prompt_tokens, r.p95_ms))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="data")
+    parser.add_argument("--questions", help="JSON / JSONL file of {question, gold}")
+    parser.add_argument("--n-questions", type=int, default=100, help="sampled questions without --questions")
+    parser.add_argument("--chunkers", nargs="+", default=["recursive", "character", "semantic"],
+                        choices=["recursive", "character", "semantic"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[256, 512, 1000, 2000], help="characters")
+    parser.add_argument("--overlaps", type=float, nargs="+", default=[0.0, 0.1, 0.2], help="fraction of size")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.02, help="recall given up for a smaller index")
+    parser.add_argument("--embedder", choices=["hash", "minilm"], default="hash")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.embedder == "minilm":
+        from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
+        embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    else:
+        embeddings = HashEmbeddings()
+    docs = load_corpus(args.corpus)
+    questions = read_questions(args.questions) if args.questions else \
+        sample_questions(docs, args.n_questions, random.Random(args.seed))
+    questions = locate(questions, docs)
+    if not questions:
+        raise SystemExit("No gold passage was found in the corpus.")
+    print(f"{len(docs)} documents, {len(questions)} questions, k={args.k}, embedder {args.embedder}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, size, overlap, splitter in splitters(args, embeddings):
+            results.append(run_trial(name, size, overlap, splitter, docs, questions, embeddings, args.k, workdir))
+    pareto_front(results)
+    choice = recommend(results, args.tolerance)
+
+    print(f"{'chunker':>21} {'size':>5} {'overlap':>7} {'chunks':>7} {'index KB':>9} {'ingest s':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'recall':>7} {'tokens':>7}")
+    for r in sorted(results, key=lambda r: (r.chunker, r.chunk_size or 0, r.chunk_overlap or 0)):
+        mark = "*" if r.pareto else " "
+        print(f"{mark} {r.chunker:>19} {r.chunk_size or '-':>5} {r.chunk_overlap if r.chunk_overlap is not None else '-':>7} "
+              f"{r.chunks:>7} {r.index_bytes / 1024:>9.0f} {r.ingest_seconds:>9.3f} {r.p50_ms:>7.2f} "
+              f"{r.p95_ms:>7.2f} {r.recall_at_k:>7.3f} {r.prompt_tokens:>7.0f}")
+    print("* Pareto-optimal (index size, ingest time, p95 latency, prompt tokens, recall)")
+    print(f"recommended: {choice.chunker}, chunk_size={choice.chunk_size}, chunk_overlap={choice.chunk_overlap} "
+          f"(recall {choice.recall_at_k:.3f}, {choice.prompt_tokens:.0f} prompt tokens, "
+          f"{choice.index_bytes / 1024:.0f} KB index)")
+
+    if args.output:
+        report = {
+            "benchmark": "chunking_autotune",
+            "config": vars(args),
+            "environment": {"chromadb": chromadb.__version__},
+            "results": [asdict(r) for r in results],
+            "recommended": asdict(choice),
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
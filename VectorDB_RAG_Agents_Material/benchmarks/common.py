@@ -0,0 +1,20 @@
+# common.py
+"""Helpers shared by the benchmarks: synthetic vectors, Chroma batch size, disk usage."""
+from __future__ import annotations
+
+import os
+
+import numpy as np
+
+CHROMA_BATCH = 5_000  # below Chroma's max batch size
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors around random centers, like sentence embeddings of a few topics."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
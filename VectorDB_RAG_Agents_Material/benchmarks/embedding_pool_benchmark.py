@@ -0,0 +1,64 @@
+# embedding_pool_benchmark.py
+"""
+Throughput (texts/sec) of local MiniLM embeddings: one process vs. a pool
+of N worker processes, on the Gutenberg books ingested in M07.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.embedding_pool_benchmark --workers 1 2 4 8 --limit 4000
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import os
+import time
+
+from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.embedding_pool import SentenceTransformerPool
+from utils.ingestion import stream_chunks
+
+GUTENBERG_BOOKS = [
+    "https://www.gutenberg.org/cache/epub/345/pg345.txt",  # Dracula
+    "https://www.gutenberg.org/cache/epub/84/pg84.txt",    # Frankenstein
+]
+
+
+def load_texts(sources: list[str], limit: int) -> list[str]:
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    chunks = itertools.chain.from_iterable(stream_chunks(source, text_splitter) for source in sources)
+    return [doc.page_content for doc in itertools.islice(chunks, limit)]
+
+
+def throughput(embeddings, texts: list[str]) -> float:
+    embeddings.embed_documents(texts[:32])  # warm-up: model load, first batch
+    t0 = time.perf_counter()
+    embeddings.embed_documents(texts)
+    return len(texts) / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=4000, help="number of chunks to embed")
+    parser.add_argument("--sources", nargs="+", default=GUTENBERG_BOOKS)
+    args = parser.parse_args()
+
+    texts = load_texts(args.sources, args.limit)
+    print(f"{len(texts)} chunks, model {args.model}, {os.cpu_count()} CPUs")
+    print(f"{'backend':>22} {'texts/sec':>10} {'speedup':>8}")
+
+    baseline = throughput(SentenceTransformerEmbeddings(model_name=args.model), texts)
+    print(f"{'single process':>22} {baseline:>10.1f} {1.0:>8.2f}")
+
+    for workers in sorted(set(args.workers)):
+        with SentenceTransformerPool(args.model, workers=workers, batch_size=args.batch_size) as pool:
+            rate = throughput(pool, texts)
+        print(f"{f'pool ({workers} workers)':>22} {rate:>10.1f} {rate / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# filtered_search_benchmark.py
+"""
+Filtered vs. unfiltered search latency at several filter selectivities:
+NumpyVectorStore with the metadata bitmap index, Chroma's own `where`
+filter, and Chroma restricted to the ids resolved by the index. Before
+timing, `check_index` compares the index and its bitmaps with a brute-force
+filter over the same metadatas (`--check-only` runs just that).
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.filtered_search_benchmark --n 100000
+"""
+from __future__ import annotations
+
+import argparse
+import operator
+import tempfile
+import time
+from typing import Any, Optional
+
+import chromadb
+import numpy as np
+
+from benchmarks.common import CHROMA_BATCH, clustered_vectors
+from utils.metadata_index import Bitmap, MetadataIndex
+from utils.numpy_store import NumpyVectorStore
+
+BUCKETS = 1_000  # metadata "bucket" is 0..999, so {"bucket": {"$lt": b}} selects b / 1000 of the rows
+RANGES = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+FLAGS = [True, False, 1, 0.0]  # as in Chroma, True is not 1 and 0.0 is 0
+CHECK_FILTERS = [
+    None,
+    {"book": "book-3"},
+    {"book": {"$ne": "book-3"}},
+    {"bucket": {"$gte": 990}},
+    {"bucket": {"$gt": 10, "$lte": 20}},
+    {"score": {"$lt": 0.25}},
+    {"book": {"$in": ["book-1", "book-2", "missing"]}},
+    {"book": {"$nin": ["book-1", "book-2"]}},
+    {"rare": True},
+    {"rare": {"$ne": True}},
+    {"$and": [{"book": "book-1"}, {"bucket": {"$lt": 500}}]},
+    {"$or": [{"bucket": {"$lt": 5}}, {"$and": [{"rare": True}, {"score": {"$gte": 0.5}}]}]},
+    {"bucket": {"$lt": -1}},
+    {"flag": True},
+    {"flag": 1},
+    {"flag": {"$in": [False, 0]}},
+    {"flag": {"$ne": 0}},
+    {"flag": {"$gte": 0.5}},
+]
+
+
+def same(a: Any, b: Any) -> bool:
+    return isinstance(a, bool) == isinstance(b, bool) and a == b
+
+
+def compare(value: Any, op: str, operand: Any) -> bool:
+    if op == "$eq":
+        return same(value, operand)
+    if op == "$ne":
+        return not same(value, operand)
+    if op == "$in":
+        return any(same(value, v) for v in operand)
+    if op == "$nin":
+        return not any(same(value, v) for v in operand)
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and RANGES[op](value, operand)
+
+
+def matches(metadata: Optional[dict], where: Optional[dict]) -> bool:
+    """Brute-force evaluation of a `where` filter on one metadata dict."""
+    metadata = metadata or {}
+    for key, condition in (where or {}).items():
+        if key == "$and":
+            ok = all(matches(metadata, c) for c in condition)
+        elif key == "$or":
+            ok = any(matches(metadata, c) for c in condition)
+        elif key not in metadata:
+            ok = False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            ok = all(compare(metadata[key], op, operand) for op, operand in condition.items())
+        if not ok:
+            return False
+    return True
+
+
+def check_index(rng: np.random.Generator, n: int = 150_000) -> None:
+    """
+    MetadataIndex.where()/rows() and Bitmap set algebra against brute force,
+    on enough rows for several containers, sparse (array) and dense (bitset).
+    """
+    metadatas = [
+        {"bucket": int(b), "book": f"book-{b % 10}", "score": float(s), "flag": FLAGS[f],
+         **({"rare": True} if s > 0.9 else {})}
+        for b, s, f in zip(rng.integers(BUCKETS, size=n), rng.random(n), rng.integers(len(FLAGS), size=n))
+    ]
+    index = MetadataIndex(metadatas)
+    sets = []
+    for where in CHECK_FILTERS:
+        expected = np.array([i for i, m in enumerate(metadatas) if matches(m, where)], dtype=np.int64)
+        found = index.rows(where)
+        assert np.array_equal(found, expected), f"rows({where}): {len(found)} rows, expected {len(expected)}"
+        assert len(index.where(where)) == len(expected)
+        sets.append(expected)
+    for a, b in zip(sets, sets[1:]):
+        x, y = Bitmap.from_sorted(a), Bitmap.from_sorted(b)
+        for op, expected in ((operator.and_, np.intersect1d(a, b)), (operator.or_, np.union1d(a, b)),
+                             (operator.sub, np.setdiff1d(a, b))):
+            assert np.array_equal(op(x, y).to_array(), expected), f"Bitmap {op.__name__} differs"
+    print(f"metadata index matches brute force on {len(CHECK_FILTERS)} filters over {n} rows")
+
+
+def per_query_ms(fn, queries: np.ndarray) -> float:
+    t0 = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - t0) / len(queries) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--selectivity", type=float, nargs="+", default=[0.001, 0.01, 0.1, 0.5])
+    parser.add_argument("--check-only", action="store_true", help="only compare the index with brute force")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    check_index(np.random.default_rng(1))
+    if args.check_only:
+        return
+    vectors = clustered_vectors(args.n, args.dim, 50, rng)
+    queries = clustered_vectors(args.queries, args.dim, 50, rng)
+    metadatas = [{"bucket": int(b), "book": f"book-{b % 10}"} for b in rng.integers(BUCKETS, size=args.n)]
+    ids = [str(i) for i in range(args.n)]
+
+    collection = chromadb.EphemeralClient().create_collection("filtered", metadata={"hnsw:space": "cosine"})
+    for start in range(0, args.n, CHROMA_BATCH):
+        stop = start + CHROMA_BATCH
+        collection.add(ids=ids[start:stop], embeddings=vectors[start:stop], metadatas=metadatas[start:stop])
+    index = MetadataIndex.from_chroma(collection)
+
+    with tempfile.TemporaryDirectory() as path:
+        store = NumpyVectorStore.build(path, vectors, [""] * args.n, metadatas, ids, None, metric="cosine")
+        print(f"n={args.n}, k={args.k}; ms per query")
+        print(f"{'filter':>10} {'numpy+index':>12} {'chroma where':>13} {'chroma+index':>13}")
+        filters = [None] + [{"bucket": {"$lt": max(1, int(s * BUCKETS))}} for s in args.selectivity]
+        for where in filters:
+            label = "none" if where is None else f"{where['bucket']['$lt'] / BUCKETS:.1%}"
+            numpy_ms = per_query_ms(lambda q: store.search_vectors(q, args.k, where), queries)
+            chroma_ms = per_query_ms(
+                lambda q: collection.query(query_embeddings=[q], n_results=args.k, where=where, include=[]), queries
+            )
+            indexed_ms = per_query_ms(
+                lambda q: index.query(collection, where, n_results=args.k, query_embeddings=[q], include=[]), queries
+            )
+            print(f"{label:>10} {numpy_ms:>12.2f} {chroma_ms:>13.2f} {indexed_ms:>13.2f}")
+        del store
+
+
+if __name__ == "__main__":
+    main()
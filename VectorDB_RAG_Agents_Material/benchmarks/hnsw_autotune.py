@@ -0,0 +1,199 @@
+# hnsw_autotune.py
+"""
+HNSW autotuner: builds a Chroma index for every M x construction ef on a
+sample of vectors, then queries it at every search ef. For each setting it
+reports build time, index size (the HNSW files, which the index keeps in
+memory), p50/p95 single-query latency and recall@k against exact search,
+and recommends the cheapest setting whose recall reaches `--target-recall`:
+lowest p95 (or smallest index / fastest build with `--optimize`).
+
+The sample comes from a persisted collection (`--db`, e.g. db/ of M07; the
+queries are held-out vectors of the same collection) or, without `--db`,
+from synthetic clustered vectors. Nothing is embedded.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.hnsw_autotune --db db --sample 20000 --target-recall 0.95
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import chromadb
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from benchmarks.common import CHROMA_BATCH, clustered_vectors, dir_bytes
+from utils.hnsw import HNSWParams, set_search_ef
+from utils.maintenance import COPY_PAGE
+
+SYNC_THRESHOLD = 1000  # Chroma's default: records added between writes of the index files
+OBJECTIVES = {
+    "latency": lambda r: (r.p95_ms, r.index_bytes, r.build_seconds),
+    "memory": lambda r: (r.index_bytes, r.p95_ms, r.build_seconds),
+    "build": lambda r: (r.build_seconds, r.p95_ms, r.index_bytes),
+}
+
+
+@dataclass
+class TrialResult:
+    M: int
+    construction_ef: int
+    search_ef: int
+    build_seconds: float
+    index_bytes: int
+    p50_ms: float
+    p95_ms: float
+    recall_at_k: float
+
+
+def sample_collection(path: str, collection_name: str, n: int, rng: np.random.Generator) -> tuple[np.ndarray, str]:
+    """Up to `n` stored vectors of a persisted collection, read page by page, and its space."""
+    collection = chromadb.PersistentClient(path=path).get_collection(collection_name)
+    total = collection.count()
+    pages = rng.permutation(range(0, total, COPY_PAGE))  # whole pages: offsets are slow to seek one by one
+    blocks, taken = [], 0
+    for offset in pages:
+        page = collection.get(include=["embeddings"], limit=COPY_PAGE, offset=int(offset))
+        blocks.append(np.asarray(page["embeddings"], dtype=np.float32))
+        taken += len(blocks[-1])
+        if taken >= n:
+            break
+    if not blocks:
+        raise SystemExit(f"{collection_name} in {path} is empty.")
+    vectors = np.concatenate(blocks)
+    return vectors[rng.permutation(len(vectors))[:n]], HNSWParams.of(collection).space
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Row numbers of the true k nearest vectors of every query, by brute force."""
+    if space == "cosine":
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    if space == "l2":
+        scores = 2 * queries @ vectors.T - np.einsum("ij,ij->i", vectors, vectors)  # -(|q-v|^2) + |q|^2
+    else:  # cosine, ip: larger inner product is nearer
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def build(client: chromadb.ClientAPI, name: str, vectors: np.ndarray, params: HNSWParams) -> tuple[chromadb.Collection, float]:
+    configuration = params.configuration()
+    configuration["hnsw"]["sync_threshold"] = min(SYNC_THRESHOLD, len(vectors))  # so the index files are all written
+    collection = client.create_collection(name, configuration=configuration, embedding_function=None)
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), CHROMA_BATCH):
+        block = vectors[start:start + CHROMA_BATCH]
+        collection.add(ids=[str(i) for i in range(start, start + len(block))], embeddings=block)
+    return collection, time.perf_counter() - t0
+
+
+def reopen(path: str, name: str) -> chromadb.Collection:
+    """The collection from a new client, so its index is loaded again with the current search ef."""
+    SharedSystemClient.clear_system_cache()
+    return chromadb.PersistentClient(path=path).get_collection(name)
+
+
+def measure(collection: chromadb.Collection, queries: np.ndarray, truth: np.ndarray, k: int) -> tuple[float, float, float]:
+    """p50 and p95 single-query latency in ms, and recall@k."""
+    collection.query(query_embeddings=queries[:1], n_results=k, include=[])  # warm-up
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        found = collection.query(query_embeddings=[query], n_results=k, include=[])["ids"][0]
+        latencies.append(time.perf_counter() - t0)
+        hits += len(set(map(int, found)) & set(expected.tolist()))
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1e3
+    return float(p50), float(p95), hits / truth.size
+
+
+def recommend(results: list[TrialResult], target_recall: float, optimize: str) -> Optional[TrialResult]:
+    candidates = [r for r in results if r.recall_at_k >= target_recall]
+    return min(candidates, key=OBJECTIVES[optimize]) if candidates else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="persisted Chroma directory to sample (default: synthetic vectors)")
+    parser.add_argument("--collection", default="langchain")
+    parser.add_argument("--sample", type=int, default=20_000, help="vectors indexed per trial")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vectors only")
+    parser.add_argument("--clusters", type=int, default=50, help="synthetic vectors only")
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], help="default: the collection's, cosine if synthetic")
+    parser.add_argument("--M", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[64, 100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[16, 32, 64, 100, 200])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--optimize", choices=sorted(OBJECTIVES), default="latency",
+                        help="what 'cheapest' means among settings that reach the target recall")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.db:
+        vectors, space = sample_collection(args.db, args.collection, args.sample + args.queries, rng)
+        vectors, queries = vectors[args.queries:], vectors[:args.queries]  # held out: not in the index
+    else:
+        vectors = clustered_vectors(args.sample, args.dim, args.clusters, rng)
+        queries = clustered_vectors(args.queries, args.dim, args.clusters, rng)
+        space = "cosine"
+    space = args.space or space
+    truth = exact_neighbors(vectors, queries, args.k, space)
+    print(f"{len(vectors)} vectors of dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}, space {space}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for m in args.M:
+            for construction_ef in args.construction_ef:
+                path = tempfile.mkdtemp(dir=workdir)
+                client = chromadb.PersistentClient(path=path)
+                params = HNSWParams(M=m, construction_ef=construction_ef, search_ef=args.search_ef[0], space=space)
+                collection, build_seconds = build(client, f"hnsw_{m}_{construction_ef}", vectors, params)
+                index_bytes = sum(dir_bytes(entry.path) for entry in os.scandir(path) if entry.is_dir())
+                for search_ef in args.search_ef:
+                    set_search_ef(collection, search_ef)
+                    collection = reopen(path, collection.name)
+                    p50, p95, recall = measure(collection, queries, truth, args.k)
+                    results.append(TrialResult(m, construction_ef, search_ef, round(build_seconds, 3), index_bytes,
+                                               round(p50, 3), round(p95, 3), round(recall, 4)))
+                    r = results[-1]
+                    print(f"M={m:<3} construction_ef={construction_ef:<4} search_ef={search_ef:<4} "
+                          f"build {r.build_seconds:>7.2f}s  index {r.index_bytes / 2**20:>7.1f} MB  "
+                          f"p50 {r.p50_ms:>6.2f} ms  p95 {r.p95_ms:>6.2f} ms  recall {r.recall_at_k:.3f}")
+    choice = recommend(results, args.target_recall, args.optimize)
+
+    if choice is None:
+        best = max(results, key=lambda r: r.recall_at_k)
+        print(f"no setting reaches recall {args.target_recall}; best was {best.recall_at_k:.3f} "
+              f"(M={best.M}, construction_ef={best.construction_ef}, search_ef={best.search_ef})")
+    else:
+        print(f"recommended ({args.optimize}): M={choice.M}, construction_ef={choice.construction_ef}, "
+              f"search_ef={choice.search_ef} (recall {choice.recall_at_k:.3f}, p95 {choice.p95_ms:.2f} ms, "
+              f"{choice.index_bytes / 2**20:.1f} MB index, {choice.build_seconds:.2f} s build)")
+        print(f"apply to db/: python working_with_chroma.py rebuild --M {choice.M} "
+              f"--construction-ef {choice.construction_ef} --search-ef {choice.search_ef}")
+
+    if args.output:
+        report = {
+            "benchmark": "hnsw_autotune",
+            "config": vars(args),
+            "environment": {"chromadb": chromadb.__version__, "vectors": len(vectors), "dim": int(vectors.shape[1])},
+            "results": [asdict(r) for r in results],
+            "recommended": asdict(choice) if choice else None,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# ingestion_benchmark.py
+"""
+Where ingestion time goes: the M04 loaders, the M05/M06 splitter,
+embedding and the Chroma write of M07, timed stage by stage on the files in
+`data/` copied `--scale` times. Reports docs/sec, chunks/sec,
+embeddings/sec, bytes read and written and the process peak RSS after each
+stage, then the same work through the overlapped `utils.ingestion.ingest`
+pipeline for comparison. `--workers N` also times loading the folder with
+`ParallelDirectoryLoader` on N processes.
+
+By default chunks are embedded with the deterministic `HashEmbeddings`, so
+load, split and write are measured without a model; `--embedder minilm`
+uses all-MiniLM-L6-v2 instead.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.ingestion_benchmark --scale 50 --output ingestion.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Optional
+
+import chromadb
+from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader, TextLoader
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.common import CHROMA_BATCH, dir_bytes
+from utils.fakes import HashEmbeddings
+from utils.ingestion import chroma_writer, chunk_id, ingest
+from utils.parallel_loader import ParallelDirectoryLoader
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DATA_DIR = "data"
+LOADERS = {".pdf": PyPDFLoader, ".docx": Docx2txtLoader, ".md": TextLoader, ".txt": TextLoader}
+EMBED_BATCH = 64
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far (MB)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)  # bytes on macOS, KB on Linux
+
+
+def make_fixtures(data_dir: str, target: str, scale: int) -> list[str]:
+    """`scale` copies of every supported file in `data_dir`, each copy its own source."""
+    originals = [name for name in sorted(os.listdir(data_dir)) if os.path.splitext(name)[1].lower() in LOADERS]
+    paths = []
+    for copy in range(scale):
+        for name in originals:
+            stem, ext = os.path.splitext(name)
+            path = os.path.join(target, f"{stem}-{copy}{ext}")
+            shutil.copyfile(os.path.join(data_dir, name), path)
+            paths.append(path)
+    return paths
+
+
+def load(paths: list[str]) -> list[Document]:
+    docs = []
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        loader = LOADERS[ext](path, encoding="utf-8") if LOADERS[ext] is TextLoader else LOADERS[ext](path)
+        docs += loader.load()
+    return docs
+
+
+def stage(name: str, seconds: float, items: dict[str, int], **extra: Any) -> dict:
+    row = {"stage": name, "seconds": round(seconds, 4)}
+    for unit, count in items.items():
+        row[unit] = count
+        row[f"{unit}_per_sec"] = round(count / seconds, 1) if seconds else None
+    return {**row, **extra, "peak_rss_mb": peak_rss_mb()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=20, help="copies of each file in data/")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--embedder", choices=["hash", "minilm"], default="hash")
+    parser.add_argument("--workers", type=int, default=0, help="also load with N processes (0: serial only)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.embedder == "minilm":
+        from langchain_community.embeddings.sentence_transformer import SentenceTransformerEmbeddings
+        embeddings = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    else:
+        embeddings = HashEmbeddings()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, add_start_index=True
+    )
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        fixtures = os.path.join(workdir, "fixtures")
+        os.makedirs(fixtures)
+        paths = make_fixtures(DATA_DIR, fixtures, args.scale)
+        bytes_read = dir_bytes(fixtures)
+
+        t0 = time.perf_counter()
+        docs = load(paths)
+        rows.append(stage("load", time.perf_counter() - t0, {"files": len(paths), "docs": len(docs)},
+                          bytes_read=bytes_read))
+        if args.workers:
+            loader = ParallelDirectoryLoader(fixtures, max_workers=args.workers)
+            t0 = time.perf_counter()
+            n_docs = sum(1 for _ in loader.lazy_load())
+            rows.append(stage(f"load ({args.workers} workers)", time.perf_counter() - t0,
+                              {"files": len(loader.results), "docs": n_docs}, bytes_read=bytes_read))
+
+        t0 = time.perf_counter()
+        chunks = splitter.split_documents(docs)
+        for chunk in chunks:
+            chunk.id = chunk_id(chunk)
+        rows.append(stage("split", time.perf_counter() - t0, {"docs": len(docs), "chunks": len(chunks)}))
+
+        texts = [chunk.page_content for chunk in chunks]
+        t0 = time.perf_counter()
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH):
+            vectors += embeddings.embed_documents(texts[start:start + EMBED_BATCH])
+        rows.append(stage("embed", time.perf_counter() - t0, {"embeddings": len(vectors)}))
+
+        db_path = os.path.join(workdir, "db")
+        db_client = Chroma(persist_directory=db_path, embedding_function=embeddings, collection_name="ingest")
+        write = chroma_writer(db_client)
+        t0 = time.perf_counter()
+        for start in range(0, len(chunks), CHROMA_BATCH):
+            write(chunks[start:start + CHROMA_BATCH], vectors[start:start + CHROMA_BATCH])
+        rows.append(stage("write", time.perf_counter() - t0, {"chunks": len(chunks)},
+                          bytes_written=dir_bytes(db_path)))
+        del docs, texts, vectors
+
+        # the same chunks through the overlapped embed -> write pipeline, into a fresh store
+        pipeline_path = os.path.join(workdir, "db_pipeline")
+        pipeline_client = Chroma(persist_directory=pipeline_path, embedding_function=embeddings,
+                                 collection_name="ingest")
+        stats = ingest(iter(chunks), embeddings, chroma_writer(pipeline_client))
+        rows.append(stage("embed+write pipeline", stats.seconds, {"chunks": stats.chunks},
+                          bytes_written=dir_bytes(pipeline_path)))
+
+    print(f"{len(paths)} files ({bytes_read / 2**20:.1f} MB), embedder {args.embedder}")
+    print(f"{'stage':>21} {'seconds':>8} {'per sec':>28} {'written MB':>11} {'peak RSS MB':>12}")
+    for row in rows:
+        rates = ", ".join(f"{row[key]:.0f} {key[:-8]}" for key in row if key.endswith("_per_sec") and row[key])
+        written = f"{row['bytes_written'] / 2**20:.1f}" if "bytes_written" in row else "-"
+        print(f"{row['stage']:>21} {row['seconds']:>8.3f} {rates:>28} {written:>11} {row['peak_rss_mb'] or '-':>12}")
+
+    if args.output:
+        report = {
+            "benchmark": "ingestion",
+            "config": vars(args),
+            "environment": {
+                "python": platform.python_version(),
+                "chromadb": chromadb.__version__,
+                "machine": platform.machine(),
+            },
+            "results": rows,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
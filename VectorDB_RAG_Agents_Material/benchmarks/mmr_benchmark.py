@@ -0,0 +1,72 @@
+# mmr_benchmark.py
+"""
+Latency of MMR re-ranking vs. fetch_k: LangChain's loop implementation,
+the vectorized one (single query and batched) and plain exact top-k search
+over the same NumpyVectorStore, on synthetic clustered vectors.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.mmr_benchmark --n 100000 --fetch-k 20 200 1000 4000
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+from benchmarks.common import clustered_vectors
+from utils.mmr import mmr_batch
+from utils.numpy_store import NumpyVectorStore
+
+
+def per_query_ms(fn, queries: np.ndarray) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) / len(queries) * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[20, 200, 1000, 4000])
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.n, args.dim, 50, rng)
+    queries = clustered_vectors(args.queries, args.dim, 50, rng)
+    with tempfile.TemporaryDirectory() as path:
+        ids = [str(i) for i in range(args.n)]
+        store = NumpyVectorStore.build(path, vectors, [""] * args.n, [{}] * args.n, ids, None, metric="cosine")
+        search = per_query_ms(lambda: store.search_vectors(queries, args.k), queries)
+        print(f"n={args.n}, k={args.k}; ms per query, exact top-{args.k} search alone: {search:.2f}")
+        print(f"{'fetch_k':>8} {'langchain':>10} {'vectorized':>11} {'batched':>8}")
+        for fetch_k in args.fetch_k:
+            idx, _ = store.search_vectors(queries, fetch_k)
+            candidates = np.asarray(store.vectors[idx])
+
+            def langchain() -> None:
+                for query, cands in zip(queries, candidates):
+                    maximal_marginal_relevance(query, cands, lambda_mult=args.lambda_mult, k=args.k)
+
+            def vectorized() -> None:
+                for query, cands in zip(queries, candidates):
+                    mmr_batch(query[None], cands[None], args.k, args.lambda_mult)
+
+            # the batched column includes the candidate search itself
+            def batched() -> None:
+                top, _ = store.search_vectors(queries, fetch_k)
+                mmr_batch(queries, np.asarray(store.vectors[top]), args.k, args.lambda_mult)
+
+            print(f"{fetch_k:>8} {per_query_ms(langchain, queries):>10.2f} "
+                  f"{per_query_ms(vectorized, queries):>11.2f} {per_query_ms(batched, queries):>8.2f}")
+        del store
+
+
+if __name__ == "__main__":
+    main()
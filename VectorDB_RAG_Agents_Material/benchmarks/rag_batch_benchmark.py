@@ -0,0 +1,71 @@
+# rag_batch_benchmark.py
+"""
+Orchestration throughput of the RAG API, offline: deterministic hash
+embeddings, an in-memory Chroma collection and a fake chat model with a
+fixed latency. Compares rag.chat() in a loop with rag.chat_batch() at
+several concurrency levels.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.rag_batch_benchmark --questions 200 --latency 0.2 --concurrency 1 8 32
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import chromadb
+from langchain_community.vectorstores import Chroma
+
+from utils.fakes import FakeChatModel, HashEmbeddings
+from utils.rag import RAGChat
+from utils.retrieval_cache import CachedRetriever
+
+WORDS = ("castle night blood count ship storm letter doctor garlic window wolf diary train "
+         "monster creator ice lake science grave lightning mountain village friend journey").split()
+
+
+def synthetic_texts(n: int, words_per_text: int, rng: random.Random) -> list[str]:
+    return [" ".join(rng.choices(WORDS, k=words_per_text)) for _ in range(n)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=5_000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM seconds per call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    db_client = Chroma(client=chromadb.EphemeralClient(), collection_name="rag_benchmark",
+                       embedding_function=HashEmbeddings())
+    texts = synthetic_texts(args.chunks, 150, rng)
+    for start in range(0, len(texts), 5_000):
+        db_client.add_texts(texts[start:start + 5_000])
+    questions = [f"What about the {' '.join(rng.choices(WORDS, k=4))}? #{i}" for i in range(args.questions)]
+    llm = FakeChatModel(latency=args.latency)
+
+    print(f"{args.questions} questions, {args.chunks} chunks, LLM latency {args.latency}s")
+    print(f"{'mode':>24} {'seconds':>8} {'questions/sec':>14}")
+
+    sequential = min(args.questions, 20)  # the loop is slow by construction: time a sample
+    rag = RAGChat(CachedRetriever(db_client), llm)
+    t0 = time.perf_counter()
+    for question in questions[:sequential]:
+        rag.chat(question, k=args.k)
+    rate = sequential / (time.perf_counter() - t0)
+    print(f"{'chat() loop':>24} {args.questions / rate:>8.2f} {rate:>14.1f}")
+
+    for concurrency in args.concurrency:
+        rag = RAGChat(CachedRetriever(db_client), llm)  # fresh caches: no reuse between runs
+        t0 = time.perf_counter()
+        answers = rag.chat_batch(questions, k=args.k, concurrency=concurrency)
+        seconds = time.perf_counter() - t0
+        assert len(answers) == len(questions) and questions[-1].split("#")[-1] in answers[-1]
+        print(f"{f'chat_batch(c={concurrency})':>24} {seconds:>8.2f} {len(questions) / seconds:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# retrieval_benchmark.py
+"""
+Latency and recall@k of the M08 query paths on a LangChain Chroma store
+(similarity_search, similarity_search_with_score,
+max_marginal_relevance_search and filtered similarity_search at several
+selectivities) as the collection grows. Corpora are synthetic clustered
+embeddings with metadata, so no model download or network is needed;
+ground truth is exact search (and exact MMR) with NumpyVectorStore.
+
+Reports p50/p95/p99 latency, QPS and recall@k per size, query type and
+filter selectivity; `--output` writes the rows as JSON for regression
+tracking.
+
+Run from VectorDB_RAG_Agents_Material:
+    python -m benchmarks.retrieval_benchmark --sizes 10000 100000 1000000 --output retrieval.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+import chromadb
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import CHROMA_BATCH, clustered_vectors
+from utils.numpy_store import NumpyVectorStore
+
+BUCKETS = 1_000  # metadata "bucket" is 0..999, so {"bucket": {"$lt": b}} selects b / 1000 of the rows
+BOOKS = 10
+
+
+class QueryVectors(Embeddings):
+    """Embeddings that look query texts up in a table of precomputed vectors."""
+
+    def __init__(self, vectors: dict[str, np.ndarray]):
+        self.vectors = vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectors[text].tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, rng: np.random.Generator):
+    vectors = clustered_vectors(n, dim, clusters, rng)
+    buckets = rng.integers(BUCKETS, size=n)
+    metadatas = [{"row": i, "bucket": int(b), "book": f"book-{b % BOOKS}"} for i, b in enumerate(buckets.tolist())]
+    texts = [f"chunk {i} of book-{b % BOOKS}" for i, b in enumerate(buckets.tolist())]
+    return vectors, texts, metadatas
+
+
+def build_chroma(name: str, vectors: np.ndarray, texts: list[str], metadatas: list[dict], embedding: Embeddings):
+    client = chromadb.EphemeralClient()
+    db = Chroma(collection_name=name, embedding_function=embedding, client=client,
+                collection_metadata={"hnsw:space": "cosine"})
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), CHROMA_BATCH):
+        stop = start + CHROMA_BATCH
+        db._collection.add(ids=[str(i) for i in range(start, min(stop, len(vectors)))],
+                           embeddings=vectors[start:stop], documents=texts[start:stop],
+                           metadatas=metadatas[start:stop])
+    return client, db, time.perf_counter() - t0
+
+
+def rows_of(docs: list[Any]) -> list[int]:
+    return [(doc[0] if isinstance(doc, tuple) else doc).metadata["row"] for doc in docs]
+
+
+def measure(fn: Callable[[str], list], queries: list[str]) -> tuple[np.ndarray, list[list[int]]]:
+    """Per-query latencies (s) and the rows each query returned."""
+    fn(queries[0])  # warm-up
+    latencies, found = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        res = fn(query)
+        latencies.append(time.perf_counter() - t0)
+        found.append(rows_of(res))
+    return np.asarray(latencies), found
+
+
+def recall_at_k(found: list[list[int]], truth: list[list[int]]) -> float:
+    scores = [len(set(f) & set(t)) / len(t) for f, t in zip(found, truth) if t]
+    return float(np.mean(scores)) if scores else 1.0
+
+
+def result_row(n: int, query_type: str, selectivity: Optional[float], latencies: np.ndarray, recall: float) -> dict:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1e3
+    return {
+        "n": n,
+        "query_type": query_type,
+        "selectivity": selectivity,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "qps": round(len(latencies) / float(latencies.sum()), 1),
+        "recall_at_k": round(recall, 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fetch-k", type=int, default=50)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--selectivity", type=float, nargs="+", default=[0.001, 0.01, 0.1, 0.5])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    k = args.k
+    results: list[dict] = []
+    print(f"dim {args.dim}, {args.queries} queries, k={k}; latencies in ms")
+    print(f"{'n':>9} {'query':>22} {'filter':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'qps':>8} {'recall':>7}")
+    for n in args.sizes:
+        vectors, texts, metadatas = synthetic_corpus(n, args.dim, args.clusters, rng)
+        query_vectors = clustered_vectors(args.queries, args.dim, args.clusters, rng)
+        queries = [f"query-{i}" for i in range(args.queries)]
+        embedding = QueryVectors(dict(zip(queries, query_vectors)))
+        client, db, build_seconds = build_chroma(f"retrieval_{n}", vectors, texts, metadatas, embedding)
+
+        with tempfile.TemporaryDirectory() as path:
+            exact = NumpyVectorStore.build(path, vectors, texts, metadatas, [str(i) for i in range(n)], embedding,
+                                           metric="cosine")
+            truth_knn = [rows_of(docs) for docs in exact.similarity_search_batch(queries, k)]
+            truth_mmr = [rows_of(docs) for docs in exact.max_marginal_relevance_search_batch(
+                queries, k, args.fetch_k, args.lambda_mult)]
+            filters = {s: {"bucket": {"$lt": max(1, int(s * BUCKETS))}} for s in args.selectivity}
+            truth_filtered = {s: [rows_of(docs) for docs in exact.similarity_search_batch(queries, k, where)]
+                              for s, where in filters.items()}
+            del exact
+
+        cases: list[tuple[str, Optional[float], Callable[[str], list], list[list[int]]]] = [
+            ("similarity_search", None, lambda q: db.similarity_search(q, k=k), truth_knn),
+            ("similarity_with_score", None, lambda q: db.similarity_search_with_score(q, k=k), truth_knn),
+            ("mmr", None, lambda q: db.max_marginal_relevance_search(
+                q, k=k, fetch_k=args.fetch_k, lambda_mult=args.lambda_mult), truth_mmr),
+        ]
+        cases += [
+            ("filtered_search", s, lambda q, where=where: db.similarity_search(q, k=k, filter=where), truth_filtered[s])
+            for s, where in filters.items()
+        ]
+        for query_type, selectivity, fn, truth in cases:
+            latencies, found = measure(fn, queries)
+            row = result_row(n, query_type, selectivity, latencies, recall_at_k(found, truth))
+            row["build_seconds"] = round(build_seconds, 2)
+            results.append(row)
+            label = "-" if selectivity is None else f"{selectivity:.1%}"
+            print(f"{n:>9} {query_type:>22} {label:>7} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                  f"{row['p99_ms']:>8.2f} {row['qps']:>8.0f} {row['recall_at_k']:>7.3f}")
+        client.delete_collection(f"retrieval_{n}")
+
+    if args.output:
+        report = {
+            "benchmark": "retrieval",
+            "config": vars(args),
+            "environment": {
+                "python": platform.python_version(),
+                "chromadb": chromadb.__version__,
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
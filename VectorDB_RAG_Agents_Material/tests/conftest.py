@@ -0,0 +1,34 @@
+# conftest.py
+# the tests import `utils` and `benchmarks` as the course scripts do, from VectorDB_RAG_Agents_Material
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.fakes import HashEmbeddings  # noqa: E402
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """HashEmbeddings that records every request that reaches the "provider"."""
+
+    def __init__(self, dim: int = 32, model_name: str = "counting"):
+        super().__init__(dim, model_name)
+        self.calls = 0
+        self.texts: list[str] = []
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += texts
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts.append(text)
+        return super().embed_query(text)
+
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbeddings()
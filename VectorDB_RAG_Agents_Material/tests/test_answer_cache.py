@@ -0,0 +1,129 @@
+# test_answer_cache.py
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from utils import answer_cache
+from utils.answer_cache import SemanticAnswerCache, context_fingerprint, prompt_key
+from utils.rag import RAGChat
+
+DOCS = [Document(page_content="Dracula lives in a castle.", metadata={"source": "dracula.txt"}),
+        Document(page_content="The castle is in Transylvania.", metadata={"source": "dracula.txt"})]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(answer_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def near(vector, cosine, rng):
+    """A vector at the given cosine similarity to `vector`."""
+    vector = vector / np.linalg.norm(vector)
+    other = rng.standard_normal(len(vector))
+    other -= other @ vector * vector
+    return cosine * vector + np.sqrt(1 - cosine**2) * other / np.linalg.norm(other)
+
+
+def test_fingerprint_and_prompt_key():
+    assert context_fingerprint(DOCS) == context_fingerprint([Document(page_content=d.page_content,
+                                                                      metadata=dict(d.metadata)) for d in DOCS])
+    assert context_fingerprint(DOCS) != context_fingerprint(DOCS[::-1])
+    assert context_fingerprint(DOCS[:1]) != context_fingerprint(
+        [Document(page_content=DOCS[0].page_content, metadata={"source": "other.txt"})])
+    assert prompt_key(5, style="formal", language="german") == prompt_key(5, language="german", style="formal")
+    assert prompt_key(5) != prompt_key(4) != prompt_key(4, style="formal")
+
+
+def test_a_hit_needs_similarity_context_and_prompt(clock):
+    rng = np.random.default_rng(0)
+    question = rng.standard_normal(64)
+    cache = SemanticAnswerCache(threshold=0.9)
+    fingerprint, key = context_fingerprint(DOCS), prompt_key(5)
+    cache.put(question, fingerprint, "In a castle.", key)
+
+    assert cache.get(3 * question, fingerprint, key) == "In a castle."  # scale does not matter
+    assert cache.get(near(question, 0.95, rng), fingerprint, key) == "In a castle."
+    assert cache.get(near(question, 0.85, rng), fingerprint, key) is None
+    assert cache.get(question, context_fingerprint(DOCS[:1]), key) is None
+    assert cache.get(question, fingerprint, prompt_key(5, language="german")) is None
+    assert cache.stats() == {"hits": 2, "misses": 3, "hit_rate": 0.4, "entries": 1, "invalidations": 0}
+
+
+def test_the_most_similar_matching_entry_wins(clock):
+    rng = np.random.default_rng(1)
+    question = rng.standard_normal(64)
+    cache = SemanticAnswerCache(threshold=0.8)
+    fingerprint = context_fingerprint(DOCS)
+    cache.put(near(question, 0.85, rng), fingerprint, "far")
+    cache.put(near(question, 0.99, rng), fingerprint, "close")
+    cache.put(question, "another context", "other context")
+    assert cache.get(question, fingerprint) == "close"
+
+
+def test_expired_entries_are_dropped(clock):
+    cache = SemanticAnswerCache(ttl=10)
+    cache.put([1.0, 0.0], "f", "old")
+    cache.put([0.0, 1.0], "f", "lasting", ttl=100)
+    clock[0] = 10.0
+    assert cache.get([1.0, 0.0], "f") is None
+    assert len(cache) == 1
+    assert cache.get([0.0, 1.0], "f") == "lasting"
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.put([1.0, 0.0, 0.0], "f", "a")
+    clock[0] = 1.0
+    cache.put([0.0, 1.0, 0.0], "f", "b")
+    clock[0] = 2.0
+    assert cache.get([1.0, 0.0, 0.0], "f") == "a"
+    clock[0] = 3.0
+    cache.put([0.0, 0.0, 1.0], "f", "c")
+    assert len(cache) == 2
+    assert cache.get([0.0, 1.0, 0.0], "f") is None
+    assert cache.get([1.0, 0.0, 0.0], "f") == "a" and cache.get([0.0, 0.0, 1.0], "f") == "c"
+
+
+def test_a_new_collection_version_drops_every_answer(clock):
+    cache = SemanticAnswerCache()
+    cache.put([1.0, 0.0], "f", "a", version=(10,))
+    assert cache.get([1.0, 0.0], "f") == "a"  # no version given: no check
+    assert cache.get([1.0, 0.0], "f", version=(10,)) == "a"
+    assert cache.get([1.0, 0.0], "f", version=(11,)) is None
+    assert len(cache) == 0 and cache.invalidations == 1
+    cache.put([1.0, 0.0], "f", "b", version=(11,))
+    assert cache.get([1.0, 0.0], "f", version=(11,)) == "b"
+
+
+class StubRetriever:
+    """Fixed context; questions embed to their word counts over a tiny vocabulary."""
+
+    vocabulary = ["where", "does", "dracula", "live"]
+
+    def __init__(self):
+        self.version = (1,)
+
+    def similarity_search(self, query, k=4):
+        return DOCS[:k]
+
+    def embed_query(self, query):
+        words = query.lower().replace("?", "").split()
+        return np.array([words.count(w) for w in self.vocabulary], dtype=np.float32)
+
+
+def test_rag_chat_reuses_answers():
+    llm = FakeListChatModel(responses=["In a castle.", "In einem Schloss.", "In a castle, still."])
+    retriever = StubRetriever()
+    rag = RAGChat(retriever, llm, answer_cache=SemanticAnswerCache(threshold=0.7))
+    assert rag.chat("Where does Dracula live?", k=2) == "In a castle."
+    assert rag.chat("where does dracula live", k=2) == "In a castle."
+    assert "".join(rag.stream("Where does Dracula live?", k=2)) == "In a castle."
+    assert llm.i == 1
+
+    assert rag.chat("Where does Dracula live?", k=2, language="german") == "In einem Schloss."
+    retriever.version = (2,)
+    assert rag.chat("Where does Dracula live?", k=2) == "In a castle, still."
+    assert rag.answer_cache.invalidations == 1
@@ -0,0 +1,124 @@
+# test_artifact_cache.py
+import os
+
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.artifact_cache import ArtifactCache, CachedDocuments, code_digest, documents_digest
+
+
+LOADS = []  # not an attribute: the loader's settings are part of the key
+
+
+class TextLoader:
+    """Minimal loader: one Document per paragraph."""
+
+    def __init__(self, file_path, encoding="utf-8"):
+        self.file_path = file_path
+        self.encoding = encoding
+
+    def load(self):
+        LOADS.append(self.file_path)
+        with open(self.file_path, encoding=self.encoding) as f:
+            paragraphs = f.read().split("\n\n")
+        return [Document(page_content=p, metadata={"source": self.file_path, "page": i})
+                for i, p in enumerate(paragraphs)]
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = tmp_path / "book.txt"
+    path.write_text("\n\n".join(f"Paragraph {i} about the castle, the sea and the lab. é" * 5 for i in range(50)))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def clear_loads():
+    LOADS.clear()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with ArtifactCache(str(tmp_path / "cache")) as cache:
+        yield cache
+
+
+def test_hits_return_the_same_documents(cache, book):
+    loader = TextLoader(book)
+    docs = cache.load(loader)
+    cached = cache.load(loader)
+    assert len(LOADS) == 1
+    assert isinstance(cached, CachedDocuments)
+    assert list(cached) == docs
+    assert cached[3] == docs[3] and cached[-1] == docs[-1] and cached[5:8] == docs[5:8]
+    assert documents_digest(cached) == documents_digest(docs)
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=10, add_start_index=True)
+    chunks = cache.split(splitter, cached)
+    assert list(cache.split(splitter, docs)) == chunks == splitter.split_documents(docs)
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_changed_file_or_settings_are_new_keys(cache, book):
+    loader = TextLoader(book)
+    cache.load(loader)
+    cache.load(TextLoader(book, encoding="utf-8-sig"))
+    assert cache.stats()["misses"] == 2
+
+    with open(book, "a") as f:
+        f.write(" edited")
+    edited = cache.load(loader)
+    assert len(LOADS) == 3
+    assert edited[-1].page_content.endswith(" edited")
+
+    docs = list(edited)
+    cache.split(RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=0), docs)
+    cache.split(RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=0), docs)
+    cache.split(RecursiveCharacterTextSplitter(chunk_size=120, chunk_overlap=0), docs)
+    assert cache.stats()["misses"] == 5
+
+
+def test_length_function_code_is_part_of_the_key(cache, book):
+    def words(text):
+        return len(text.split())
+
+    def chars(text):
+        return len(text.split()) * 2
+
+    assert code_digest(words) != code_digest(chars)
+    assert code_digest(words) == code_digest(lambda text: len(text.split()))
+    docs = TextLoader(book).load()
+    by_words = cache.split(RecursiveCharacterTextSplitter(chunk_size=20, chunk_overlap=0, length_function=words), docs)
+    by_chars = cache.split(RecursiveCharacterTextSplitter(chunk_size=20, chunk_overlap=0, length_function=chars), docs)
+    assert len(by_chars) > len(by_words)
+
+
+def test_close_unmaps_the_documents(tmp_path, book):
+    with ArtifactCache(str(tmp_path)) as cache:
+        cache.load(TextLoader(book))
+        first = cache.load(TextLoader(book))
+        with cache.load(TextLoader(book)) as second:
+            assert len(second) == 50
+        assert second.closed and not first.closed
+        with pytest.raises(ValueError, match="closed"):
+            second[0]
+    assert first.closed
+    assert "closed" in repr(first)
+
+
+def test_eviction_and_corrupt_files(tmp_path, book):
+    cache = ArtifactCache(str(tmp_path), max_bytes=1)
+    cache.load(TextLoader(book))
+    assert cache.stats()["bytes"] == 0 and cache.evictions == 1
+
+    cache = ArtifactCache(str(tmp_path))
+    loader = TextLoader(book)
+    cache.load(loader)
+    (path,) = [entry.path for entry in os.scandir(tmp_path) if entry.name.endswith(".docs")]
+    with open(path, "r+b") as f:
+        f.write(b"NOTDOCS!")
+    assert len(cache.load(loader)) == 50
+    assert len(LOADS) == 3
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,141 @@
+# test_bm25.py
+import math
+import random
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+import chromadb
+import pytest
+
+from utils.bm25 import B, K1, BM25Index, tokenize
+from utils.hybrid_search import hybrid_search, reciprocal_rank_fusion
+
+WORDS = ["castle", "count", "whitby", "ship", "storm", "blood", "night", "wolf", "garlic", "lucy", "mina", "diary"]
+
+
+def corpus(n=200, seed=0):
+    rng = random.Random(seed)
+    return {f"c{i}": " ".join(rng.choices(WORDS, k=rng.randint(3, 30))) for i in range(n)}
+
+
+def naive_bm25(texts, query, k1=K1, b=B):
+    """Textbook BM25 over a dict id -> text."""
+    docs = {chunk_id: Counter(tokenize(text)) for chunk_id, text in texts.items()}
+    avg_len = sum(sum(c.values()) for c in docs.values()) / len(docs)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(term in c for c in docs.values())
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for chunk_id, c in docs.items():
+            if c[term]:
+                norm = k1 * (1 - b + b * sum(c.values()) / avg_len)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * c[term] * (k1 + 1) / (c[term] + norm)
+    return scores
+
+
+def assert_same_ranking(index, texts, query, k=10):
+    expected = naive_bm25(texts, query)
+    hits = index.search(query, k=k)
+    assert len(hits) == min(k, len(expected))
+    for chunk_id, score in hits:
+        assert score == pytest.approx(expected[chunk_id], rel=1e-5)
+    # everything left out scores no more than the last hit
+    assert sorted(expected.values(), reverse=True)[len(hits) - 1] == pytest.approx(hits[-1][1], rel=1e-5)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+
+@pytest.mark.parametrize("query", ["castle count", "whitby storm ship", "garlic garlic lucy", "nothing here"])
+def test_scores_match_textbook_bm25(query):
+    texts = corpus()
+    index = BM25Index()
+    items = list(texts.items())
+    for start in range(0, len(items), 37):  # several merges
+        index.add([i for i, _ in items[start:start + 37]], [t for _, t in items[start:start + 37]])
+        index.search("castle")
+    if not naive_bm25(texts, query):
+        assert index.search(query) == []
+    else:
+        assert_same_ranking(index, texts, query)
+
+
+def test_replace_and_delete_follow_the_texts(tmp_path):
+    texts = corpus()
+    index = BM25Index(str(tmp_path / "bm25"))
+    index.add(texts, texts.values())
+    index.delete(["c1", "c2", "missing"])
+    index.add(["c3", "new"], ["whitby whitby harbour", "harbour lights"])
+    for chunk_id in ["c1", "c2"]:
+        del texts[chunk_id]
+    texts.update(c3="whitby whitby harbour", new="harbour lights")
+    assert len(index) == len(texts) and "c1" not in index and "new" in index
+    assert_same_ranking(index, texts, "harbour whitby")
+
+    index.save()
+    reopened = BM25Index.open(str(tmp_path / "bm25"))
+    assert reopened.ids == list(index.ids) and len(reopened) == len(texts)
+    for query in ["harbour whitby", "mina diary night"]:
+        assert reopened.search(query) == index.search(query)
+        assert_same_ranking(reopened, texts, query)
+
+    # a reopened, memory-mapped index still takes updates and saves over its own files
+    reopened.delete(["c3"])
+    reopened.add(["c4"], ["harbour"])
+    reopened.save()
+    del texts["c3"]
+    texts["c4"] = "harbour"
+    assert_same_ranking(BM25Index.open(str(tmp_path / "bm25")), texts, "harbour whitby")
+
+
+def test_from_chroma_and_save_without_path():
+    texts = corpus(30)
+    collection = chromadb.EphemeralClient().create_collection(f"bm25-{uuid.uuid4().hex}")
+    collection.add(ids=list(texts), documents=list(texts.values()), embeddings=[[float(i), 1.0] for i in range(30)])
+    index = BM25Index.from_chroma(collection, page=7)
+    assert len(index) == 30
+    assert_same_ranking(index, texts, "lucy mina")
+    with pytest.raises(ValueError):
+        index.save()
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], rrf_k=60)
+    scores = dict(fused)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores["a"] == pytest.approx(1 / 61) and scores["d"] == pytest.approx(1 / 62)
+    assert [doc_id for doc_id, _ in fused] == ["c", "a", "b", "d"]
+    assert reciprocal_rank_fusion([]) == []
+
+
+@pytest.fixture
+def hybrid(embeddings):
+    texts = {f"v{i}": f"the vampire hunters meet at night number {i}" for i in range(40)}
+    texts["rare"] = "Quincey Morris carries a bowie knife"
+    texts["rare_filtered"] = "Quincey Morris rides to the castle"
+    collection = chromadb.EphemeralClient().create_collection(f"hybrid-{uuid.uuid4().hex}")
+    collection.add(ids=list(texts), documents=list(texts.values()),
+                   embeddings=embeddings.embed_documents(list(texts.values())),
+                   metadatas=[{"part": 2 if chunk_id == "rare_filtered" else 1} for chunk_id in texts])
+    index = BM25Index()
+    index.add(texts, texts.values())
+    return SimpleNamespace(embeddings=embeddings, _collection=collection), index
+
+
+def test_hybrid_search_fuses_both_rankings(hybrid):
+    store, index = hybrid
+    query = "vampire hunters Quincey"
+    results = hybrid_search(store, index, query, k=4, fetch_k=10)
+    vector_ids = store._collection.query(query_embeddings=[store.embeddings.embed_query(query)],
+                                         n_results=10)["ids"][0]
+    expected = reciprocal_rank_fusion([vector_ids, [i for i, _ in index.search(query, 10)]])[:4]
+    assert [(doc.id, score) for doc, score in results] == expected
+    assert all(doc.page_content == store._collection.get(ids=[doc.id])["documents"][0] for doc, _ in results)
+
+
+def test_hybrid_filter_applies_to_lexical_hits(hybrid):
+    store, index = hybrid
+    results = hybrid_search(store, index, "Quincey Morris", k=3, fetch_k=5, filter={"part": 1})
+    ids = [doc.id for doc, _ in results]
+    assert "rare" in ids and "rare_filtered" not in ids
+    assert len(results) == 3
+    assert all(doc.metadata["part"] == 1 for doc, _ in results)
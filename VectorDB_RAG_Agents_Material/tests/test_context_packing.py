@@ -0,0 +1,94 @@
+# test_context_packing.py
+import random
+
+import pytest
+import tiktoken
+from langchain_core.documents import Document
+
+from utils.context_packing import ContextPacker, char_tokens, drop_duplicates, merge_overlapping, token_counter
+from utils.token_length import TokenLengthCounter
+
+BOOK = " ".join(f"word{i}" for i in range(2_000))
+
+
+def chunk(start, size, source="book", text=BOOK):
+    return Document(page_content=text[start:start + size], metadata={"source": source, "start_index": start})
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_merged_passages_are_slices_of_the_source():
+    rng = random.Random(0)
+    docs = [chunk(rng.randrange(0, 9_000), rng.randrange(50, 400)) for _ in range(40)]
+    passages = merge_overlapping(docs)
+    covered = set()
+    for rank, doc in passages:
+        start, end = doc.metadata["start_index"], doc.metadata["end_index"]
+        assert doc.page_content == BOOK[start:end]
+        assert not covered & set(range(start - 1, end + 1))  # no text twice, no adjacent passages left
+        covered |= set(range(start, end))
+    assert covered == {i for doc in docs for i in range(doc.metadata["start_index"],
+                                                        doc.metadata["start_index"] + len(doc.page_content))}
+    assert [rank for rank, _ in passages] == sorted(rank for rank, _ in passages)
+    assert sum(doc.metadata["merged_chunks"] for _, doc in passages) == len(docs)
+
+
+def test_sources_and_chunks_without_offsets_are_not_merged():
+    docs = [chunk(0, 100), chunk(50, 100, source="other"), Document(page_content="loose text")]
+    passages = merge_overlapping(docs)
+    assert [rank for rank, _ in passages] == [0, 1, 2]
+    assert passages[2][1].page_content == "loose text"
+
+
+def test_duplicates_keep_the_best_ranked_passage():
+    text = "the count lives in a castle high in the carpathian mountains far from town"
+    passages = list(enumerate([
+        Document(page_content=text),
+        Document(page_content="  THE count lives in a castle high in the carpathian mountains far from town "),
+        Document(page_content=text.replace("town", "the village")),
+        Document(page_content="a ship sails from varna to whitby through the storm"),
+    ]))
+    kept = drop_duplicates(passages)
+    assert [rank for rank, _ in kept] == [0, 3]
+    assert [rank for rank, _ in drop_duplicates(passages, threshold=1.01)] == [0, 2, 3]
+
+
+def test_pack_fills_the_budget_in_rank_order():
+    docs = [chunk(i * 1_000, 300) for i in [0, 2, 4, 6]] + [chunk(9_000, 30)]
+    packer = ContextPacker(words, budget=100)
+    packed = packer(docs)
+    assert sum(words(doc.page_content) + 1 for doc in packed) <= 100
+    assert [doc.metadata["start_index"] for doc in packed] == [0, 2_000, 9_000]  # the 4th no longer fits
+    assert packer.last_stats["packed"] == 3
+    assert packer.last_stats["tokens_out"] == sum(words(doc.page_content) + 1 for doc in packed)
+
+
+def test_a_first_passage_larger_than_the_budget_is_truncated():
+    packed = ContextPacker(words, budget=20).pack([chunk(0, 2_000)])
+    assert len(packed) == 1
+    assert words(packed[0].page_content) == 19
+    assert BOOK.startswith(packed[0].page_content + " ")
+
+
+def test_token_counter_falls_back_to_characters(monkeypatch):
+    def offline(name):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+    with pytest.warns(UserWarning, match="cl100k_base"):
+        count = token_counter()
+    assert count is char_tokens
+    assert [count(""), count("abc"), count("abcd")] == [0, 1, 2]
+    packed = ContextPacker(count, budget=50).pack([chunk(0, 1_000)])
+    assert count(packed[0].page_content) + 1 <= 50
+
+
+def test_token_counter_uses_the_encoding(monkeypatch):
+    encoding = tiktoken.Encoding("bytes", pat_str=r"\S+|\s+", mergeable_ranks={bytes([i]): i for i in range(256)},
+                                 special_tokens={})
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: encoding)
+    count = token_counter()
+    assert isinstance(count, TokenLengthCounter)
+    assert count("héllo") == len("héllo".encode())
@@ -0,0 +1,87 @@
+# test_embedding_cache.py
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+
+import utils.embedding_cache as embedding_cache
+from utils.embedding_cache import CachedEmbeddings
+from utils.fakes import HashEmbeddings
+
+ROOT = embedding_cache.__file__.rsplit("utils", 1)[0]
+
+
+@pytest.fixture(autouse=True)
+def fresh_stores(monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_STORES", {})  # as in a new process
+
+
+def test_hits_skip_the_model(tmp_path, embeddings):
+    cached = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    first = cached.embed_documents(["a cat", "a dog", "a cat"])
+    assert embeddings.texts == ["a cat", "a dog"]
+    again = cached.embed_documents(["a  cat", "a dog"])  # same text once normalized
+    assert embeddings.calls == 1
+    assert again == first[:2]
+    np.testing.assert_allclose(first[0], HashEmbeddings(32).embed_query("a cat"), rtol=1e-6)
+    assert cached.embed_query("a cat") == first[0]  # queries have their own key
+    assert embeddings.calls == 2
+
+
+def test_instances_on_one_directory_share_the_store(tmp_path, embeddings):
+    a = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    b = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    assert a._disk is b._disk
+    texts_a = [f"first {i}" for i in range(50)]
+    texts_b = [f"second {i}" for i in range(50)]
+    vectors_a = a.embed_documents(texts_a)
+    vectors_b = b.embed_documents(texts_b)
+    embeddings.calls = 0
+    assert a.embed_documents(texts_b) == vectors_b
+    assert b.embed_documents(texts_a) == vectors_a
+    assert embeddings.calls == 0
+
+
+def test_reopening_does_not_truncate(tmp_path, embeddings, monkeypatch):
+    a = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    vectors = a.embed_documents([f"text {i}" for i in range(20)])
+    monkeypatch.setattr(embedding_cache, "_STORES", {})  # a second process opens the directory
+    b = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    b.embed_documents(["something new"])
+    assert a.embed_documents([f"text {i}" for i in range(20)]) == vectors
+    assert a.embed_documents(["something new"]) == b.embed_documents(["something new"])
+    assert embeddings.calls == 2
+    assert len(a._disk) == len(b._disk) == 21
+
+
+def test_processes_do_not_overwrite_each_other(tmp_path, embeddings):
+    parent = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    parent.embed_documents([f"parent {i}" for i in range(30)])
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {ROOT!r})
+        from utils.embedding_cache import CachedEmbeddings
+        from utils.fakes import HashEmbeddings
+        CachedEmbeddings(HashEmbeddings(32, "counting"), cache_dir={str(tmp_path)!r}).embed_documents(
+            [f"child {{i}}" for i in range(30)])
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True)
+    parent.embed_documents([f"parent {i}" for i in range(30, 60)])  # slots after the child's
+    reference = HashEmbeddings(32)
+    for text in [f"parent {i}" for i in range(60)] + [f"child {i}" for i in range(30)]:
+        np.testing.assert_allclose(parent._disk.get(parent._key(text, "document")), reference.embed_query(text),
+                                   rtol=1e-6)
+    assert len(parent._disk) == 90
+    assert embeddings.calls == 2
+
+
+def test_full_cache_evicts_least_recently_used(tmp_path, embeddings):
+    cached = CachedEmbeddings(embeddings, cache_dir=str(tmp_path), max_entries=10, hot_entries=2)
+    cached.embed_documents([f"text {i}" for i in range(10)])
+    cached.embed_documents(["text 0"])  # recently used: survives
+    cached.embed_documents(["text 10"])
+    assert len(cached._disk) == 10
+    assert cached._disk.get(cached._key("text 0", "document")) is not None
+    assert cached._disk.get(cached._key("text 1", "document")) is None
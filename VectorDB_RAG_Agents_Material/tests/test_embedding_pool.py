@@ -0,0 +1,28 @@
+# test_embedding_pool.py
+import numpy as np
+import pytest
+
+sentence_transformers = pytest.importorskip("sentence_transformers")
+
+from utils.embedding_pool import SentenceTransformerPool  # noqa: E402
+
+MODEL = "all-MiniLM-L6-v2"
+
+
+@pytest.fixture(scope="module")
+def model():
+    try:
+        return sentence_transformers.SentenceTransformer(MODEL, device="cpu")
+    except OSError as e:  # not downloaded and no network
+        pytest.skip(f"{MODEL} is not available: {e}")
+
+
+def test_pool_returns_the_vectors_of_the_model_in_order(model):
+    texts = [("word " * (i % 37)) + f"text {i}\nline" for i in range(150)]
+    with SentenceTransformerPool(MODEL, workers=2, batch_size=16) as pool:
+        vectors = np.asarray(pool.embed_documents(texts))
+        query = pool.embed_query(texts[3])
+        assert pool.embed_documents([]) == []
+    expected = model.encode([text.replace("\n", " ") for text in texts], convert_to_numpy=True)
+    np.testing.assert_allclose(vectors, expected, atol=1e-5)
+    np.testing.assert_allclose(query, expected[3], atol=1e-5)
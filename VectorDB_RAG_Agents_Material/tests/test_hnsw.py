@@ -0,0 +1,67 @@
+# test_hnsw.py
+import uuid
+from types import SimpleNamespace
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.api.client import SharedSystemClient
+
+from benchmarks.common import clustered_vectors
+from benchmarks.hnsw_autotune import TrialResult, exact_neighbors, recommend
+from utils.hnsw import HNSWParams, set_search_ef
+from utils.numpy_store import NumpyVectorStore
+
+PARAMS = HNSWParams(M=24, construction_ef=80, search_ef=40, space="cosine")
+
+
+def name():
+    return f"hnsw-{uuid.uuid4().hex}"
+
+
+def test_defaults_are_chromas():
+    assert HNSWParams.of(chromadb.EphemeralClient().create_collection(name())) == HNSWParams()
+
+
+def test_metadata_and_configuration_give_the_same_collection():
+    client = chromadb.EphemeralClient()
+    by_metadata = client.create_collection(name(), metadata=PARAMS.metadata())
+    by_configuration = client.create_collection(name(), configuration=PARAMS.configuration())
+    assert HNSWParams.of(by_metadata) == HNSWParams.of(by_configuration) == PARAMS
+    assert HNSWParams.of(SimpleNamespace(_collection=by_metadata)) == PARAMS  # a LangChain Chroma store
+
+
+def test_set_search_ef_is_persisted(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.create_collection("books", configuration=PARAMS.configuration())
+    rng = np.random.default_rng(0)
+    collection.add(ids=[str(i) for i in range(50)], embeddings=rng.standard_normal((50, 8)).astype(np.float32))
+    set_search_ef(SimpleNamespace(_collection=collection), 200)
+    SharedSystemClient.clear_system_cache()
+
+    reopened = chromadb.PersistentClient(path=str(tmp_path)).get_collection("books")
+    assert HNSWParams.of(reopened) == HNSWParams(M=24, construction_ef=80, search_ef=200, space="cosine")
+    assert len(reopened.query(query_embeddings=rng.standard_normal((1, 8)), n_results=5)["ids"][0]) == 5
+    SharedSystemClient.clear_system_cache()
+
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_autotune_ground_truth_is_exact_search(tmp_path, space):
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(2_000, 16, 10, rng)
+    queries = clustered_vectors(20, 16, 10, rng)
+    store = NumpyVectorStore.build(str(tmp_path), vectors, [""] * 2_000, [{}] * 2_000,
+                                   [str(i) for i in range(2_000)], None, metric=space)
+    assert np.array_equal(exact_neighbors(vectors, queries, 10, space), store.search_vectors(queries, 10)[0])
+
+
+def test_recommend_picks_the_cheapest_setting_over_the_target():
+    results = [
+        TrialResult(8, 64, 16, build_seconds=1.0, index_bytes=100, p50_ms=0.1, p95_ms=0.2, recall_at_k=0.90),
+        TrialResult(16, 100, 64, build_seconds=2.0, index_bytes=300, p50_ms=0.3, p95_ms=0.5, recall_at_k=0.96),
+        TrialResult(32, 100, 64, build_seconds=4.0, index_bytes=200, p50_ms=0.4, p95_ms=0.6, recall_at_k=0.99),
+    ]
+    assert recommend(results, 0.95, "latency") is results[1]
+    assert recommend(results, 0.95, "memory") is results[2]
+    assert recommend(results, 0.85, "build") is results[0]
+    assert recommend(results, 0.999, "latency") is None
@@ -0,0 +1,145 @@
+# test_ingestion.py
+import sys
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import chromadb
+import numpy as np
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.bm25 import BM25Index
+from utils.ingestion import chunk_id, ingest, incremental_ingest, split_stream
+
+SOURCE = "book.txt"
+
+
+def book(paragraphs=60, edit=None):
+    texts = [f"Paragraph {i} tells of castle{i} and river{i} under the moon{i}." for i in range(paragraphs)]
+    if edit is not None:
+        texts[edit] = "An entirely rewritten paragraph about wolves and storms at night."
+    return "\n\n".join(texts)
+
+
+def splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=120, chunk_overlap=0)
+
+
+def chunks(text, window_chars=400):
+    blocks = (text[i:i + 97] for i in range(0, len(text), 97))
+    return split_stream(blocks, splitter(), {"source": SOURCE}, window_chars=window_chars)
+
+
+@pytest.fixture
+def store():
+    collection = chromadb.EphemeralClient().create_collection(f"ingest-{uuid.uuid4().hex}")
+    return SimpleNamespace(_collection=collection)
+
+
+def stored(store):
+    got = store._collection.get(include=["embeddings", "documents", "metadatas"])
+    return {i: (d, m, np.asarray(e)) for i, d, m, e in zip(got["ids"], got["documents"], got["metadatas"],
+                                                              got["embeddings"])}
+
+
+def test_split_stream_offsets_point_into_the_text():
+    text = book()
+    docs = list(chunks(text))
+    assert len(docs) > 10
+    for doc in docs:
+        start = doc.metadata["start_index"]
+        assert text[start:start + len(doc.page_content)] == doc.page_content
+    assert [d.page_content for d in chunks(text)] == [d.page_content for d in docs]
+
+
+def test_ingest_writes_every_chunk_once(embeddings):
+    written = []
+    docs = list(chunks(book()))
+    stats = ingest(iter(docs), embeddings, lambda batch, vectors: written.extend(zip(batch, vectors)), batch_size=7)
+    assert [doc for doc, _ in written] == docs
+    assert stats.chunks == len(docs)
+    assert stats.batches == -(-len(docs) // 7)
+    for doc, vector in written:
+        assert vector.dtype == np.float32
+        np.testing.assert_array_equal(vector, np.float32(embeddings.embed_query(doc.page_content)))
+
+
+@pytest.mark.parametrize("limit", [1, 12_000])
+def test_memory_budget_counts_text_and_vectors(embeddings, limit):
+    docs = list(chunks(book(400)))
+    written = []
+    batch_bytes = []
+
+    def slow_write(batch, vectors):
+        time.sleep(0.002)
+        written.extend(batch)
+        batch_bytes.append(sum(sys.getsizeof(doc.page_content) for doc in batch) + vectors.nbytes)
+
+    stats = ingest(iter(docs), embeddings, slow_write, batch_size=8, max_memory_mb=limit / 2**20, queue_size=64)
+    assert written == docs
+    vector_bytes = 8 * embeddings.dim * 4
+    # the split and the embed stage both wait: the ceiling is only passed by the vectors of one batch
+    # (or, with a ceiling below one batch, by one batch at a time)
+    assert stats.peak_memory_bytes <= max(limit, max(batch_bytes)) + vector_bytes
+    assert stats.peak_memory_bytes >= max(batch_bytes)
+
+
+def test_ingest_raises_errors_from_any_stage(embeddings):
+    def fail(batch, vectors):
+        raise RuntimeError("write failed")
+
+    with pytest.raises(RuntimeError, match="write failed"):
+        ingest(chunks(book()), embeddings, fail, batch_size=4)
+    assert threading.active_count() < 5
+
+
+def test_rerun_embeds_nothing(store, embeddings):
+    first = incremental_ingest(chunks(book()), SOURCE, embeddings, store, batch_size=8)
+    calls = embeddings.calls
+    again = incremental_ingest(chunks(book()), SOURCE, embeddings, store, batch_size=8)
+    assert embeddings.calls == calls
+    assert (again.chunks, again.reused, again.deleted) == (0, 0, 0)
+    assert again.skipped == first.chunks == store._collection.count()
+
+
+def test_edit_embeds_only_the_new_text(store, embeddings):
+    incremental_ingest(chunks(book()), SOURCE, embeddings, store, batch_size=8)
+    embeddings.texts.clear()
+    edited = list(chunks(book(edit=3)))
+    stats = incremental_ingest(iter(edited), SOURCE, embeddings, store, batch_size=8)
+
+    old_texts = {doc.page_content for doc in chunks(book())}
+    new_texts = [doc.page_content for doc in edited if doc.page_content not in old_texts]
+    assert new_texts and sorted(embeddings.texts) == sorted(new_texts)
+    assert stats.reused > 0  # the chunks after the edit moved
+
+    # the store now holds exactly what a fresh ingest of the edited book gives
+    assert stats.chunks + stats.reused + stats.skipped == len(edited)
+    rows = stored(store)
+    assert set(rows) == {chunk_id(doc) for doc in edited}
+    for doc in edited:
+        text, metadata, vector = rows[chunk_id(doc)]
+        assert text == doc.page_content
+        assert metadata == doc.metadata
+        np.testing.assert_allclose(vector, embeddings.embed_query(doc.page_content), rtol=1e-6)
+
+
+def test_lexical_index_follows_the_rekeyed_ids(store, embeddings, tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"))
+    incremental_ingest(chunks(book()), SOURCE, embeddings, store, lexical_index=index, batch_size=8)
+    incremental_ingest(chunks(book(edit=3)), SOURCE, embeddings, store, lexical_index=index, batch_size=8)
+    ids = set(stored(store))
+    assert all(chunk_id in index for chunk_id in ids)
+    assert len(index) == len(ids)
+    hits = index.search("wolves storms", k=1)
+    assert store._collection.get(ids=[hits[0][0]])["documents"][0].startswith("An entirely rewritten")
+
+
+def test_removed_chunks_are_deleted(store, embeddings):
+    incremental_ingest(chunks(book()), SOURCE, embeddings, store, batch_size=8)
+    shorter = list(chunks(book(paragraphs=30)))
+    stats = incremental_ingest(iter(shorter), SOURCE, embeddings, store, batch_size=8)
+    assert stats.deleted > 0
+    assert set(stored(store)) == {chunk_id(doc) for doc in shorter}
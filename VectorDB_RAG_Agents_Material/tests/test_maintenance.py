@@ -0,0 +1,105 @@
+# test_maintenance.py
+import os
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.api.client import SharedSystemClient
+
+from utils.hnsw import HNSWParams
+from utils.maintenance import list_snapshots, prune_snapshots, rebuild_collection, restore, snapshot
+
+
+def add(collection, start, n, dim=16):
+    rng = np.random.default_rng(start)
+    collection.add(ids=[f"id{i}" for i in range(start, start + n)],
+                   embeddings=rng.standard_normal((n, dim)).astype(np.float32),
+                   documents=[f"doc {i}" for i in range(start, start + n)],
+                   metadatas=[{"i": i} for i in range(start, start + n)])
+
+
+def contents(persist_dir):
+    collection = chromadb.PersistentClient(path=str(persist_dir)).get_collection("books")
+    got = collection.get(include=["embeddings", "documents"])
+    order = np.argsort(got["ids"])
+    result = [got["ids"][i] for i in order], [got["documents"][i] for i in order], np.asarray(got["embeddings"])[order]
+    SharedSystemClient.clear_system_cache()
+    return result
+
+
+@pytest.fixture
+def db(tmp_path):
+    persist_dir = tmp_path / "db"
+    add(chromadb.PersistentClient(path=str(persist_dir)).create_collection("books"), 0, 300)
+    SharedSystemClient.clear_system_cache()
+    return persist_dir
+
+
+def test_restore_gives_back_the_snapshot(db, tmp_path):
+    bm25 = tmp_path / "db_bm25"
+    bm25.mkdir()
+    (bm25 / "ids.json").write_text('["id0"]')
+    before = contents(db)
+    first = snapshot(str(db), str(tmp_path / "snapshots"), "first", extra_dirs=[str(bm25)])
+
+    add(chromadb.PersistentClient(path=str(db)).get_collection("books"), 300, 200)
+    SharedSystemClient.clear_system_cache()
+    (bm25 / "ids.json").write_text('["id0", "id300"]')
+    second = snapshot(str(db), str(tmp_path / "snapshots"), "second", extra_dirs=[str(bm25)])
+    assert [m["name"] for m in list_snapshots(str(tmp_path / "snapshots"))] == [first["name"], second["name"]]
+    assert second["collections"] == ["books"]
+
+    result = restore(first["path"], str(db))
+    assert result["extra_dirs"] == [str(bm25.resolve())]
+    ids, documents, vectors = contents(db)
+    assert ids == before[0] and documents == before[1]
+    np.testing.assert_array_equal(vectors, before[2])
+    assert (bm25 / "ids.json").read_text() == '["id0"]'
+
+
+def test_extra_dirs_missing_from_the_snapshot_are_reported(db, tmp_path):
+    taken = snapshot(str(db), str(tmp_path / "snapshots"))
+    other = tmp_path / "other_index"
+    other.mkdir()
+    result = restore(taken["path"], str(db), extra_dirs=[str(other)])
+    assert result["stale"] == [str(other)] and result["extra_dirs"] == []
+
+
+def test_prune_keeps_the_newest_snapshots(db, tmp_path):
+    root = str(tmp_path / "snapshots")
+    names = []
+    for i in range(4):
+        # 1200 records first, so Chroma writes its index files; the small adds after leave them unchanged
+        add(chromadb.PersistentClient(path=str(db)).get_collection("books"), 10_000 * (i + 1), 10 if i else 1_200)
+        SharedSystemClient.clear_system_cache()
+        names.append(snapshot(str(db), root, f"s{i}")["name"])
+    latest = contents(db)
+    assert {f["method"] for f in list_snapshots(root)[-1]["files"].values()} == {"link"}
+
+    assert prune_snapshots(root, keep=2) == names[:2]
+    assert [m["name"] for m in list_snapshots(root)] == names[2:]
+    taken = snapshot(str(db), root, "s4", keep=2)
+    assert taken["pruned"] == [names[2]]
+    assert sorted(os.listdir(root)) == sorted([names[3], taken["name"]])
+    with pytest.raises(ValueError):
+        prune_snapshots(root, keep=0)
+
+    # files the deleted snapshots shared through hard links are still in the kept ones
+    restore(list_snapshots(root)[0]["path"], str(db))
+    ids, documents, vectors = contents(db)
+    assert ids == latest[0] and documents == latest[1]
+    np.testing.assert_array_equal(vectors, latest[2])
+
+
+def test_rebuild_keeps_the_records(db):
+    before = contents(db)
+    client = chromadb.PersistentClient(path=str(db))
+    hnsw = HNSWParams(space="l2", M=32, construction_ef=128, search_ef=64)
+    result = rebuild_collection(client, "books", page_size=70, hnsw=hnsw)
+    assert result["records"] == 300
+    assert HNSWParams.of(client.get_collection("books")) == hnsw
+    assert [c.name for c in client.list_collections()] == ["books"]
+    SharedSystemClient.clear_system_cache()
+    ids, documents, vectors = contents(db)
+    assert ids == before[0] and documents == before[1]
+    np.testing.assert_array_equal(vectors, before[2])
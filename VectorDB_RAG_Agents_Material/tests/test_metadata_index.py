@@ -0,0 +1,74 @@
+# test_metadata_index.py
+import chromadb
+import numpy as np
+import pytest
+
+from benchmarks.filtered_search_benchmark import CHECK_FILTERS, FLAGS, matches
+from utils.metadata_index import Bitmap, MetadataIndex
+
+
+@pytest.fixture(scope="module")
+def metadatas():
+    rng = np.random.default_rng(0)
+    n = 70_000  # two containers, the first one dense for the common values
+    return [
+        {"bucket": int(b), "book": f"book-{b % 10}", "score": float(s), "flag": FLAGS[f],
+         **({"rare": True} if s > 0.9 else {})}
+        for b, s, f in zip(rng.integers(1000, size=n), rng.random(n), rng.integers(len(FLAGS), size=n))
+    ]
+
+
+@pytest.fixture(scope="module")
+def index(metadatas):
+    return MetadataIndex(metadatas)
+
+
+@pytest.mark.parametrize("where", CHECK_FILTERS, ids=str)
+def test_rows_match_brute_force(metadatas, index, where):
+    expected = [i for i, metadata in enumerate(metadatas) if matches(metadata, where)]
+    assert index.rows(where).tolist() == expected
+    assert len(index.where(where)) == len(expected)
+
+
+def test_booleans_are_not_numbers():
+    index = MetadataIndex([{"a": True}, {"a": 1}, {"a": 1.0}, {"a": False}, {"a": 0}])
+    assert index.rows({"a": True}).tolist() == [0]
+    assert index.rows({"a": 1}).tolist() == [1, 2]
+    assert index.rows({"a": {"$in": [False]}}).tolist() == [3]
+    assert index.rows({"a": {"$ne": 0}}).tolist() == [0, 1, 2, 3]
+    assert index.rows({"a": {"$gte": 0}}).tolist() == [1, 2, 4]
+
+
+@pytest.mark.parametrize("density", [0.001, 0.05, 0.5])
+def test_bitmap_set_algebra(density):
+    rng = np.random.default_rng(1)
+    a, b = (np.flatnonzero(rng.random(200_000) < density) for _ in range(2))
+    x, y = Bitmap.from_sorted(a), Bitmap.from_sorted(b)
+    assert np.array_equal(x.to_array(), a)
+    assert np.array_equal((x & y).to_array(), np.intersect1d(a, b))
+    assert np.array_equal((x | y).to_array(), np.union1d(a, b))
+    assert np.array_equal((x - y).to_array(), np.setdiff1d(a, b))
+    assert len(x) == len(a)
+    members = set(a.tolist())
+    assert all((int(i) in x) == (i in members) for i in rng.integers(200_000, size=200))
+
+
+def test_query_sees_a_write_that_keeps_the_size(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path)).create_collection("books", embedding_function=None)
+    collection.add(ids=["a", "b", "c"], embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+                   metadatas=[{"book": "x"}, {"book": "y"}, {"book": "y"}])
+    index = MetadataIndex.from_chroma(collection)
+    assert index.query(collection, {"book": "x"}, query_embeddings=[[1.0, 0.0]])["ids"] == [["a"]]
+
+    collection.delete(ids=["a"])  # what incremental_ingest does with an edited chunk
+    collection.add(ids=["d"], embeddings=[[1.0, 0.0]], metadatas=[{"book": "x"}])
+    assert collection.count() == index.size
+    assert index.query(collection, {"book": "x"}, query_embeddings=[[1.0, 0.0]])["ids"] == [["d"]]
+    assert index.query(collection, {"book": "y"}, query_embeddings=[[0.0, 1.0]], n_results=5)["ids"] == [["b", "c"]]
+
+
+def test_query_without_matches_returns_empty_lists():
+    collection = chromadb.EphemeralClient().create_collection("empty_filter", embedding_function=None)
+    collection.add(ids=["a"], embeddings=[[1.0, 0.0]], metadatas=[{"book": "x"}])
+    result = MetadataIndex.from_chroma(collection).query(collection, {"book": "z"}, query_embeddings=[[1.0, 0.0]])
+    assert result["ids"] == [[]]
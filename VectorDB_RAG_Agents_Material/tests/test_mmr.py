@@ -0,0 +1,78 @@
+# test_mmr.py
+import uuid
+from types import SimpleNamespace
+
+import chromadb
+import numpy as np
+import pytest
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from utils.mmr import max_marginal_relevance_search, max_marginal_relevance_search_batch, mmr, mmr_batch
+from utils.numpy_store import NumpyVectorStore
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.25, 0.5, 0.9, 1.0])
+def test_same_picks_as_langchain(rng, lambda_mult):
+    queries = rng.standard_normal((8, 24)).astype(np.float32)
+    candidates = rng.standard_normal((8, 40, 24)).astype(np.float32)
+    chosen = mmr_batch(queries, candidates, k=6, lambda_mult=lambda_mult)
+    for query, cands, picks in zip(queries, candidates, chosen):
+        expected = maximal_marginal_relevance(query, cands, lambda_mult=lambda_mult, k=6)
+        assert picks.tolist() == expected
+        assert mmr(query, cands, k=6, lambda_mult=lambda_mult) == expected
+
+
+def test_padding_is_never_picked(rng):
+    queries = rng.standard_normal((3, 16)).astype(np.float32)
+    candidates = rng.standard_normal((3, 10, 16)).astype(np.float32)
+    valid = np.zeros((3, 10), dtype=bool)
+    for i, n in enumerate([10, 4, 0]):
+        valid[i, :n] = True
+    chosen = mmr_batch(queries, candidates, k=6, valid=valid)
+    assert chosen[0].tolist() == maximal_marginal_relevance(queries[0], candidates[0], k=6)
+    assert chosen[1, :4].tolist() == maximal_marginal_relevance(queries[1], candidates[1, :4], k=6)
+    assert chosen[1, 4:].tolist() == [-1, -1]
+    assert chosen[2].tolist() == [-1] * 6
+    assert mmr(queries[0], candidates[0, :3], k=6) == maximal_marginal_relevance(queries[0], candidates[0, :3], k=6)
+
+
+@pytest.fixture
+def texts():
+    return [f"topic{i % 7} detail{i} note{i % 3}" for i in range(120)]
+
+
+def test_chroma_batch_matches_langchain_on_the_fetched_candidates(embeddings, texts):
+    collection = chromadb.EphemeralClient().create_collection(f"mmr-{uuid.uuid4().hex}")
+    collection.add(ids=[str(i) for i in range(len(texts))], documents=texts,
+                   embeddings=embeddings.embed_documents(texts), metadatas=[{"i": i % 2} for i in range(len(texts))])
+    store = SimpleNamespace(embeddings=embeddings, _collection=collection)
+    queries = ["topic3 detail5", "note1 topic0", "detail77"]
+
+    results = max_marginal_relevance_search_batch(store, queries, k=4, fetch_k=15, lambda_mult=0.3, filter={"i": 1})
+    for query, docs in zip(queries, results):
+        vector = embeddings.embed_query(query)
+        fetched = collection.query(query_embeddings=[vector], n_results=15, where={"i": 1},
+                                   include=["embeddings", "documents"])
+        picks = maximal_marginal_relevance(np.asarray(vector), fetched["embeddings"][0], lambda_mult=0.3, k=4)
+        assert [doc.id for doc in docs] == [fetched["ids"][0][j] for j in picks]
+        assert [doc.page_content for doc in docs] == [fetched["documents"][0][j] for j in picks]
+        assert all(int(doc.id) % 2 == 1 for doc in docs)
+    assert max_marginal_relevance_search(store, queries[1], k=4, fetch_k=15, lambda_mult=0.3,
+                                         filter={"i": 1}) == results[1]
+    assert max_marginal_relevance_search_batch(store, []) == []
+
+
+def test_numpy_store_matches_langchain(tmp_path, embeddings, texts):
+    store = NumpyVectorStore.from_texts(texts, embeddings, path=str(tmp_path), metric="cosine")
+    query = "topic2 note0"
+    docs = store.max_marginal_relevance_search(query, k=5, fetch_k=30, lambda_mult=0.5)
+    vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+    rows, _ = store.search_vectors(vector[None], 30)
+    picks = maximal_marginal_relevance(vector, np.asarray(store.vectors[rows[0]]), lambda_mult=0.5, k=5)
+    assert [doc.page_content for doc in docs] == [texts[rows[0][j]] for j in picks]
+    assert store.max_marginal_relevance_search_by_vector(vector.tolist(), k=5, fetch_k=30) == docs
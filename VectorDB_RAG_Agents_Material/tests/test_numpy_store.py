@@ -0,0 +1,110 @@
+# test_numpy_store.py
+import os
+
+import chromadb
+import numpy as np
+import pytest
+
+from utils.numpy_store import NumpyVectorStore
+
+
+def brute_force(vectors, queries, k, metric):
+    if metric == "l2":
+        scores = ((queries[:, None, :] - vectors[None]) ** 2).sum(-1)
+    elif metric == "cosine":
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = 1 - (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+    else:
+        scores = 1 - queries @ vectors.T
+    idx = np.argsort(scores, axis=1, kind="stable")[:, :k]
+    return idx, np.take_along_axis(scores, idx, axis=1)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 16)).astype(np.float32)
+    metadatas = [{"group": i % 5, "even": i % 2 == 0} for i in range(500)]
+    return vectors, metadatas, [f"id{i}" for i in range(500)], rng.standard_normal((7, 16)).astype(np.float32)
+
+
+def build(path, vectors, metadatas, ids, metric="l2", embedding=None):
+    return NumpyVectorStore.build(str(path), vectors, [f"text {i}" for i in ids], metadatas, ids, embedding,
+                                  metric=metric)
+
+
+@pytest.mark.parametrize("metric", ["l2", "cosine", "ip"])
+def test_search_matches_brute_force(tmp_path, data, metric):
+    vectors, metadatas, ids, queries = data
+    store = build(tmp_path, vectors, metadatas, ids, metric)
+    idx, scores = store.search_vectors(queries, 10)
+    expected_idx, expected_scores = brute_force(vectors, queries, 10, metric)
+    assert np.array_equal(idx, expected_idx)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-4, atol=1e-4)
+    single = [store.search_vectors(q, 10) for q in queries]
+    assert np.array_equal(np.concatenate([i for i, _ in single]), idx)
+
+
+def test_filtered_search_matches_brute_force(tmp_path, data):
+    vectors, metadatas, ids, queries = data
+    store = build(tmp_path, vectors, metadatas, ids)
+    where = {"$and": [{"group": {"$in": [1, 3]}}, {"even": True}]}
+    rows = np.array([i for i, m in enumerate(metadatas) if m["group"] in (1, 3) and m["even"]])
+    idx, scores = store.search_vectors(queries, 10, where)
+    expected_idx, expected_scores = brute_force(vectors[rows], queries, 10, "l2")
+    assert np.array_equal(idx, rows[expected_idx])
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-4, atol=1e-4)
+    idx, scores = store.search_vectors(queries, 10, {"group": 99})
+    assert np.isinf(scores).all()
+
+
+@pytest.mark.parametrize("metric", ["l2", "cosine"])
+def test_distances_match_chroma(tmp_path, data, metric):
+    vectors, metadatas, ids, queries = data
+    store = build(tmp_path, vectors, metadatas, ids, metric)
+    collection = chromadb.EphemeralClient().create_collection(
+        f"exact_{metric}", embedding_function=None,
+        configuration={"hnsw": {"space": metric, "ef_search": 500, "ef_construction": 500}},
+    )
+    collection.add(ids=ids, embeddings=vectors)
+    result = collection.query(query_embeddings=queries, n_results=5)
+    idx, scores = store.search_vectors(queries, 5)
+    assert [[ids[i] for i in row] for row in idx.tolist()] == result["ids"]
+    np.testing.assert_allclose(scores, result["distances"], rtol=1e-3, atol=1e-4)
+
+
+@pytest.mark.parametrize("alias", ["symlink", "hardlink"])
+def test_rebuild_from_own_memmap_under_another_name(tmp_path, alias):
+    vectors = np.random.default_rng(0).standard_normal((20_000, 64)).astype(np.float32)
+    ids = [str(i) for i in range(len(vectors))]
+    metadatas = [{}] * len(vectors)
+    real, other = tmp_path / "real", tmp_path / "other"
+    build(real, vectors, metadatas, ids)
+    if alias == "symlink":
+        os.symlink(real, other)
+    else:  # the same files under another directory
+        other.mkdir()
+        for name in os.listdir(real):
+            os.link(real / name, other / name)
+    store = NumpyVectorStore(str(other), None)
+    rebuilt = build(real, store.vectors, metadatas, ids, metric="cosine")
+    assert np.array_equal(np.asarray(rebuilt.vectors), vectors)
+    assert rebuilt.metric == "cosine"
+
+
+def test_build_from_part_of_own_memmap(tmp_path, data):
+    vectors, metadatas, ids, queries = data
+    store = build(tmp_path, vectors, metadatas, ids)
+    smaller = build(tmp_path, store.vectors[:100], metadatas[:100], ids[:100])
+    assert np.array_equal(np.asarray(smaller.vectors), vectors[:100])
+
+
+def test_add_texts_appends_and_persists(tmp_path, embeddings):
+    texts = [f"alpha{i} beta{i} gamma{i} delta{i}" for i in range(20)]
+    store = NumpyVectorStore.from_texts(texts[:15], embeddings, path=str(tmp_path), metadatas=[{"i": i} for i in range(15)])
+    new_ids = store.add_texts(texts[15:], [{"i": i} for i in range(15, 20)])
+    reopened = NumpyVectorStore(str(tmp_path), embeddings)
+    assert len(reopened.vectors) == 20
+    assert reopened.ids[15:] == new_ids
+    assert reopened.similarity_search(texts[17], k=1)[0].page_content == texts[17]
+    assert reopened.similarity_search(texts[17], k=3, filter={"i": {"$gte": 18}})[0].metadata["i"] >= 18
@@ -0,0 +1,50 @@
+# test_parallel_loader.py
+import multiprocessing
+import os
+
+import pytest
+
+import utils.parallel_loader as parallel_loader
+from utils.parallel_loader import ParallelDirectoryLoader
+
+_load_file = parallel_loader.load_file
+
+
+def crashing_load_file(path, loader):
+    if "bad" in os.path.basename(path):
+        os._exit(1)  # kills the worker: the pool breaks
+    return _load_file(path, loader)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    for i in range(8):
+        (tmp_path / f"{'bad' if i in (2, 5) else 'ok'}{i}.txt").write_text(f"file {i}", encoding="utf-8")
+    (tmp_path / "notes.xyz").write_text("no loader", encoding="utf-8")
+    return tmp_path
+
+
+def test_in_process_loads_every_file_and_records_errors(folder, monkeypatch):
+    monkeypatch.setattr(parallel_loader, "ProcessPoolExecutor", None)  # max_workers=1 never starts a pool
+    loader = ParallelDirectoryLoader(str(folder), max_workers=1, loaders={".xyz": "missing"})
+    docs = list(loader.lazy_load())
+    assert sorted(doc.page_content for doc in docs) == sorted(f"file {i}" for i in range(8))
+    assert [os.path.basename(r.path) for r in loader.errors] == ["notes.xyz"]
+    assert "Unknown loader" in loader.errors[0].error
+
+
+def test_skips_files_without_loader(folder):
+    loader = ParallelDirectoryLoader(str(folder), max_workers=1, default_loader=None)
+    assert len(list(loader.lazy_load())) == 8
+    assert len(loader.results) == 8
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="the patched loader reaches workers by fork")
+@pytest.mark.parametrize("workers", [2, 3])
+def test_worker_crash_only_fails_the_crashing_files(folder, monkeypatch, workers):
+    monkeypatch.setattr(parallel_loader, "load_file", crashing_load_file)
+    loader = ParallelDirectoryLoader(str(folder), glob="*.txt", max_workers=workers)
+    docs = list(loader.lazy_load())
+    assert len(docs) == 6
+    assert sorted(os.path.basename(r.path) for r in loader.errors) == ["bad2.txt", "bad5.txt"]
+    assert all("BrokenProcessPool" in r.error for r in loader.errors)
@@ -0,0 +1,63 @@
+# test_pdf_stream.py
+import pypdf
+import pytest
+from langchain_community.document_loaders import PyPDFLoader
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from utils.pdf_stream import PDFPageStreamLoader
+
+PAGES = 23
+
+
+@pytest.fixture(scope="module")
+def pdf(tmp_path_factory):
+    """A PDF whose page i reads "Page i of the book" on two lines."""
+    writer = pypdf.PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for i in range(PAGES):
+        page = writer.add_blank_page(width=300, height=200)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 20 150 Td (Page {i} of) Tj 0 -20 Td (the book) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    path = tmp_path_factory.mktemp("pdf") / "book.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+@pytest.mark.parametrize("pages_per_range, max_workers", [(32, 1), (5, 1), (1, 1), (4, 2)])
+def test_pages_match_pypdf_loader(pdf, pages_per_range, max_workers):
+    expected = PyPDFLoader(pdf).load()
+    docs = list(PDFPageStreamLoader(pdf, pages_per_range=pages_per_range, max_workers=max_workers).lazy_load())
+    assert [doc.page_content for doc in docs] == [doc.page_content for doc in expected]
+    assert [doc.metadata["page"] for doc in docs] == [doc.metadata["page"] for doc in expected] == list(range(PAGES))
+    assert all(doc.metadata["source"] == pdf and doc.metadata["total_pages"] == PAGES for doc in docs)
+    assert "Page 7 of" in docs[7].page_content
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_range_mode_joins_the_pages_of_a_range(pdf, max_workers):
+    pages = [doc.page_content for doc in PDFPageStreamLoader(pdf).lazy_load()]
+    ranges = list(PDFPageStreamLoader(pdf, pages_per_range=10, max_workers=max_workers, mode="range").lazy_load())
+    assert [(doc.metadata["page"], doc.metadata["last_page"]) for doc in ranges] == [(0, 9), (10, 19), (20, 22)]
+    assert [doc.page_content for doc in ranges] == ["\n".join(pages[i:i + 10]) for i in range(0, PAGES, 10)]
+
+
+def test_pages_are_yielded_lazily(pdf):
+    docs = PDFPageStreamLoader(pdf, pages_per_range=4).lazy_load()
+    assert next(docs).metadata["page"] == 0
+    assert len(list(docs)) == PAGES - 1
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        PDFPageStreamLoader("book.pdf", pages_per_range=0)
+    with pytest.raises(ValueError):
+        PDFPageStreamLoader("book.pdf", mode="chapter")
@@ -0,0 +1,92 @@
+# test_quantized_store.py
+import numpy as np
+import pytest
+
+from benchmarks.common import clustered_vectors
+from utils.numpy_store import NumpyVectorStore, distances
+from utils.quantized_store import QuantizedVectorStore
+
+N, DIM = 5_000, 64
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(N, DIM, 20, rng)
+    queries = clustered_vectors(50, DIM, 20, rng)
+    metadatas = [{"group": i % 4} for i in range(N)]
+    return vectors, [f"id{i}" for i in range(N)], metadatas, queries
+
+
+def build(path, data, mode, metric="l2", **kwargs):
+    vectors, ids, metadatas, _ = data
+    return QuantizedVectorStore.build(str(path), vectors, [f"text {i}" for i in ids], metadatas, ids, None,
+                                      mode=mode, metric=metric, **kwargs)
+
+
+# 1-bit codes of tight clusters need far more candidates than the default
+@pytest.mark.parametrize("mode, oversample, min_recall", [("int8", None, 0.95), ("binary", 128, 0.85)])
+@pytest.mark.parametrize("metric", ["l2", "cosine", "ip"])
+def test_recall_and_exact_distances(tmp_path, data, mode, oversample, min_recall, metric):
+    store = build(tmp_path, data, mode, metric, oversample=oversample)
+    queries = data[3]
+    assert store.recall_at_k(queries, k=10) >= min_recall
+
+    for query in queries[:10]:
+        rows, scores = store.search_vector(query, 10)
+        assert np.all(np.diff(scores) >= 0)
+        # re-scored in float32: the distances are the exact ones of those rows
+        exact = distances(query[None, :], data[0][rows], np.linalg.norm(data[0][rows], axis=1), metric)[0]
+        np.testing.assert_allclose(scores, exact, rtol=1e-4, atol=1e-4)
+
+
+def test_recall_grows_with_oversample(tmp_path, data):
+    build(tmp_path, data, "binary")
+    recalls = [QuantizedVectorStore(str(tmp_path), None, oversample=o).recall_at_k(data[3], k=10) for o in (4, 16, 64)]
+    assert recalls == sorted(recalls) and recalls[0] < recalls[-1]
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_oversampling_everything_is_exact(tmp_path, data, mode):
+    store = build(tmp_path, data, mode, oversample=N)
+    idx, scores = store.search_vectors(data[3], 3)
+    exact_idx, exact_scores = NumpyVectorStore.search_vectors(store, data[3], 3)
+    assert np.array_equal(idx, exact_idx)
+    np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+
+def test_filtered_search_stays_in_the_filter(tmp_path, data):
+    store = build(tmp_path, data, "int8")
+    idx, scores = store.search_vectors(data[3], 10, {"group": 2})
+    assert np.isfinite(scores).all()
+    assert all(i % 4 == 2 for i in idx.ravel())
+    exact_idx, _ = NumpyVectorStore.search_vectors(store, data[3], 10, {"group": 2})
+    assert np.mean([len(set(a) & set(b)) / 10 for a, b in zip(idx.tolist(), exact_idx.tolist())]) >= 0.95
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_added_rows_are_coded_and_persisted(tmp_path, embeddings, mode):
+    texts = [f"alpha{i} beta{i} gamma{i} delta{i}" for i in range(300)]
+    vectors = np.asarray(embeddings.embed_documents(texts[:250]), dtype=np.float32)
+    store = QuantizedVectorStore.build(str(tmp_path), vectors, texts[:250], [{}] * 250,
+                                       [str(i) for i in range(250)], embeddings, mode=mode)
+    store.add_texts(texts[250:])
+    reopened = QuantizedVectorStore(str(tmp_path), embeddings)
+    assert len(reopened.codes) == len(reopened.vectors) == 300
+    expected = QuantizedVectorStore._encode(np.asarray(reopened.vectors[250:]), mode, reopened.quant)
+    assert np.array_equal(reopened.codes[250:], expected)
+    # the hash embeddings collide: the top hit is a row with the query's exact vector
+    (doc, score), = reopened.similarity_search_with_score(texts[280], k=1)
+    assert score == pytest.approx(0, abs=1e-5)
+    assert embeddings.embed_query(doc.page_content) == pytest.approx(embeddings.embed_query(texts[280]))
+
+
+def test_memory_report_and_modes(tmp_path, data):
+    int8 = build(tmp_path / "int8", data, "int8").memory_report()
+    binary = build(tmp_path / "binary", data, "binary").memory_report()
+    # the float32 norms stay resident too, so slightly under 4x and 32x
+    assert 3 < int8["compression"] < 4
+    assert 10 < binary["compression"] < 32
+    assert int8["float32_bytes"] == N * DIM * 4
+    with pytest.raises(ValueError, match="mode"):
+        build(tmp_path / "pq", data, "pq")
@@ -0,0 +1,88 @@
+# test_rag.py
+import asyncio
+
+from langchain_core.documents import Document
+
+from utils.fakes import FakeChatModel
+from utils.rag import RAGChat, build_messages, run_sync
+
+QUESTIONS = [f"What happens in chapter {i}?" for i in range(12)]
+
+
+class StubRetriever:
+    """Two chunks per question; records the batches it is asked for."""
+
+    def __init__(self):
+        self.batches = []
+
+    def similarity_search(self, query, k=4):
+        return [Document(page_content=f"{query} chunk {j}") for j in range(min(k, 2))]
+
+    def similarity_search_batch(self, queries, k=4):
+        self.batches.append(list(queries))
+        return [self.similarity_search(query, k) for query in queries]
+
+
+class CountingChatModel(FakeChatModel):
+    """FakeChatModel that records the prompts and the most calls in flight at once."""
+
+    prompts: list = []
+    in_flight: int = 0
+    most_in_flight: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompts.append([(m.type, m.content) for m in messages])  # ("system", ...), ("human", ...)
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+def answer(question):
+    return f"Based on the provided context, this is a fake answer to: {question}"
+
+
+def test_batch_answers_come_back_in_question_order():
+    retriever = StubRetriever()
+    llm = CountingChatModel(latency=0.02, prompts=[])
+    rag = RAGChat(retriever, llm, concurrency=3, batch_size=5)
+    answers = rag.chat_batch(QUESTIONS, k=2, style="casual", language="german")
+    assert answers == [answer(q) for q in QUESTIONS]
+    assert retriever.batches == [QUESTIONS[:5], QUESTIONS[5:10], QUESTIONS[10:]]
+    assert 1 < llm.most_in_flight <= 3
+    expected = [build_messages(q, retriever.similarity_search(q, 2), style="casual", language="german")
+                for q in QUESTIONS]
+    assert sorted(llm.prompts) == sorted(expected)
+
+
+def test_sync_async_and_streamed_answers_agree():
+    rag = RAGChat(StubRetriever(), FakeChatModel(latency=0.0))
+    question = QUESTIONS[3]
+    assert rag.chat(question) == answer(question)
+    tokens = list(rag.stream(question))
+    assert len(tokens) > 1 and "".join(tokens) == answer(question)
+    assert rag.last_timing.tokens == len(tokens)
+    assert rag.last_timing.first_token_seconds <= rag.last_timing.total_seconds
+
+    async def streamed():
+        return [token async for token in rag.astream(question)]
+
+    assert "".join(run_sync(streamed())) == answer(question)
+    assert run_sync(rag.achat(question)) == answer(question)
+    assert len(rag.timings) == 3  # chat, stream, astream
+
+
+def test_context_packer_shapes_the_prompt():
+    llm = CountingChatModel(latency=0.0, prompts=[])
+    rag = RAGChat(StubRetriever(), llm, context_packer=lambda docs: docs[:1])
+    rag.chat_batch(QUESTIONS[:2], k=2)
+    assert all("chunk 0" in prompt[-1][1] and "chunk 1" not in prompt[-1][1] for prompt in llm.prompts)
+
+
+def test_run_sync_inside_a_running_loop():
+    async def outer():
+        return run_sync(asyncio.sleep(0, result="done"))
+
+    assert asyncio.run(outer()) == "done"
@@ -0,0 +1,128 @@
+# test_retrieval_cache.py
+import uuid
+from types import SimpleNamespace
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.api.client import SharedSystemClient
+
+from utils import retrieval_cache
+from utils.retrieval_cache import CachedRetriever, TTLCache, collection_version
+
+TEXTS = [f"chapter{i % 9} tells of castle{i % 4} and ship{i % 5}" for i in range(60)]
+
+
+class CountingCollection:
+    """chromadb collection that counts the queries reaching it."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.queries = 0
+
+    def query(self, **kwargs):
+        self.queries += 1
+        return self.collection.query(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def fill(collection, embeddings, texts=TEXTS, start=0):
+    collection.add(ids=[f"id{start + i}" for i in range(len(texts))], documents=texts,
+                   embeddings=embeddings.embed_documents(texts),
+                   metadatas=[{"even": (start + i) % 2 == 0} for i in range(len(texts))])
+
+
+@pytest.fixture
+def store(embeddings):
+    collection = chromadb.EphemeralClient().create_collection(f"retrieval-{uuid.uuid4().hex}")
+    fill(collection, embeddings)
+    embeddings.calls = 0
+    return SimpleNamespace(embeddings=embeddings, _collection=CountingCollection(collection))
+
+
+def uncached(store, query, k, filter=None):
+    res = store._collection.collection.query(query_embeddings=[store.embeddings.embed_query(query)], n_results=k,
+                                             where=filter, include=["documents", "distances"])
+    return list(zip(res["ids"][0], res["documents"][0], res["distances"][0]))
+
+
+def flat(results):
+    return [(doc.id, doc.page_content, distance) for doc, distance in results]
+
+
+def test_results_are_those_of_the_store(store):
+    retriever = CachedRetriever(store)
+    queries = ["castle1 ship2", "chapter3", "castle1 ship2", "ship4 castle0"]
+    batch = retriever.similarity_search_with_score_batch(queries, k=5, filter={"even": True})
+    for query, results in zip(queries, batch):
+        assert flat(results) == pytest.approx(uncached(store, query, 5, {"even": True}))
+        assert all(doc.metadata["even"] for doc, _ in results)
+    assert retriever.similarity_search("chapter3", k=5, filter={"even": True}) == [doc for doc, _ in batch[1]]
+
+
+def test_repeated_queries_skip_the_model_and_the_search(store, embeddings):
+    retriever = CachedRetriever(store)
+    retriever.similarity_search_batch(["castle1 ship2", "chapter3", "castle1  ship2 "], k=4)
+    assert embeddings.calls == 1 and store._collection.queries == 1  # one batch, one Chroma query
+
+    retriever.similarity_search(" castle1\nship2", k=4)
+    retriever.similarity_search_batch(["chapter3", "castle1 ship2"], k=4)
+    assert embeddings.calls == 1 and store._collection.queries == 1
+    stats = retriever.stats()
+    assert stats["results"]["hits"] == 3 and stats["embeddings"]["entries"] == 2
+
+    # k and the filter are part of the key; the vector is not embedded again
+    retriever.similarity_search("chapter3", k=5)
+    retriever.similarity_search("chapter3", k=4, filter={"even": False})
+    assert embeddings.calls == 1 and store._collection.queries == 3
+
+
+def test_writes_drop_the_cached_results(store, embeddings):
+    retriever = CachedRetriever(store)
+    query = "dracula arrives in whitby"
+    before = retriever.similarity_search(query, k=3)
+    assert query not in [doc.page_content for doc in before]
+
+    fill(store._collection.collection, embeddings, [query], start=1_000)
+    after = retriever.similarity_search(query, k=3)
+    assert after[0].page_content == query
+    assert retriever.invalidations == 1 and store._collection.queries == 2
+
+
+def test_persistent_store_notices_a_delete_plus_an_add(tmp_path, embeddings):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.create_collection("books")
+    fill(collection, embeddings)
+    store = SimpleNamespace(embeddings=embeddings, _collection=collection)
+    retriever = CachedRetriever(store)
+    assert collection_version(collection) == collection_version(store)
+    assert len(collection_version(store)) > 1  # the size and the file times
+    first = retriever.similarity_search("castle2", k=1)
+
+    collection.delete(ids=[first[0].id])
+    fill(collection, embeddings, ["castle2 castle2 castle2"], start=1_000)
+    assert collection.count() == len(TEXTS)
+    assert retriever.similarity_search("castle2", k=1)[0].id != first[0].id
+    assert retriever.invalidations == 1
+    SharedSystemClient.clear_system_cache()
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(retrieval_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=2, ttl=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # "b" is the least recently used
+    assert cache.get("b") is None and cache.get("c") == 3
+    now[0] = 10.0
+    assert cache.get("a") is None and len(cache) == 1
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_rate": 0.5, "entries": 1}
+
+    forever = TTLCache(max_entries=1)
+    forever.put("a", np.zeros(2))
+    now[0] = 1e9
+    assert forever.get("a") is not None
@@ -0,0 +1,114 @@
+# test_semantic_chunking.py
+import random
+import re
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from utils.embedding_cache import CachedEmbeddings
+from utils.semantic_chunking import SENTENCE_SPLIT, BatchedSemanticChunker, token_batches
+
+THRESHOLD_TYPES = ["percentile", "standard_deviation", "interquartile", "gradient"]
+DEFAULT_AMOUNTS = {"percentile": 95, "standard_deviation": 3, "interquartile": 1.5, "gradient": 95}
+TOPICS = [["castle", "count", "night", "blood"], ["ship", "sea", "storm", "sail"], ["lab", "spark", "life", "body"]]
+
+
+def semantic_chunker_split(embeddings, text, threshold_type, min_chunk_size=None, buffer_size=1):
+    """langchain_experimental's SemanticChunker.split_text, step by step."""
+    sentences = re.split(SENTENCE_SPLIT, text)
+    if len(sentences) == 1:
+        return sentences
+    if threshold_type == "gradient" and len(sentences) == 2:
+        return sentences
+    combined = [" ".join(sentences[max(0, i - buffer_size):i + buffer_size + 1]) for i in range(len(sentences))]
+    vectors = np.array(embeddings.embed_documents(combined))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    distances = [1 - float(vectors[i] @ vectors[i + 1]) for i in range(len(sentences) - 1)]
+    amount = DEFAULT_AMOUNTS[threshold_type]
+    values = distances
+    if threshold_type == "percentile":
+        threshold = np.percentile(distances, amount)
+    elif threshold_type == "standard_deviation":
+        threshold = np.mean(distances) + amount * np.std(distances)
+    elif threshold_type == "interquartile":
+        q1, q3 = np.percentile(distances, [25, 75])
+        threshold = np.mean(distances) + amount * (q3 - q1)
+    else:
+        values = np.gradient(distances, range(0, len(distances)))
+        threshold = np.percentile(values, amount)
+
+    chunks = []
+    start = 0
+    for index in [i for i, x in enumerate(values) if x > threshold]:
+        text = " ".join(sentences[start:index + 1])
+        if min_chunk_size is not None and len(text) < min_chunk_size:
+            continue
+        chunks.append(text)
+        start = index + 1
+    if start < len(sentences):
+        chunks.append(" ".join(sentences[start:]))
+    return chunks
+
+
+def random_text(rng, n_sentences):
+    sentences = []
+    for i in range(n_sentences):
+        topic = TOPICS[(i // rng.randint(2, 4)) % len(TOPICS)]
+        words = rng.sample(topic, 3) + [f"w{rng.randrange(10_000)}" for _ in range(rng.randint(1, 4))]
+        sentences.append(" ".join(words).capitalize() + rng.choice([".", "!", "?"]))
+    return " ".join(sentences)
+
+
+@pytest.mark.parametrize("threshold_type", THRESHOLD_TYPES)
+@pytest.mark.parametrize("min_chunk_size", [None, 80])
+def test_chunks_match_semantic_chunker(embeddings, threshold_type, min_chunk_size):
+    rng = random.Random(threshold_type)
+    texts = [random_text(rng, n) for n in [1, 2, 3, 4, 7, 12, 30, 30, 60]]
+    chunker = BatchedSemanticChunker(embeddings, threshold_type, min_chunk_size=min_chunk_size)
+    for text in texts:
+        assert chunker.split_text(text) == semantic_chunker_split(embeddings, text, threshold_type, min_chunk_size)
+
+
+def test_two_sentences_with_gradient_are_two_chunks(embeddings):
+    chunker = BatchedSemanticChunker(embeddings, "gradient", min_chunk_size=1_000)
+    assert chunker.split_text("The count sleeps. The ship sails.") == ["The count sleeps.", "The ship sails."]
+
+
+def test_documents_are_embedded_together(embeddings):
+    rng = random.Random(0)
+    docs = [Document(page_content=random_text(rng, 20), metadata={"page": i}) for i in range(5)]
+    chunker = BatchedSemanticChunker(embeddings, add_start_index=True, max_batch_texts=40)
+    chunks, vectors = chunker.split_documents_with_embeddings(docs)
+
+    assert chunker.embedded_texts == 100
+    assert chunker.embedding_batches == embeddings.calls == 3
+    expected = [chunk for doc in docs for chunk in semantic_chunker_split(embeddings, doc.page_content, "percentile")]
+    assert [chunk.page_content for chunk in chunks] == expected
+    for chunk in chunks:
+        text = docs[chunk.metadata["page"]].page_content
+        assert text[chunk.metadata["start_index"]:].startswith(chunk.page_content)
+    assert vectors.shape == (len(chunks), embeddings.dim)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-5)
+
+
+def test_cached_batches_do_not_reach_the_provider(embeddings, tmp_path):
+    cache = CachedEmbeddings(embeddings, cache_dir=str(tmp_path))
+    text = random_text(random.Random(0), 30)
+    first = BatchedSemanticChunker(cache, max_batch_texts=8)
+    first.split_text(text)
+    assert first.embedding_batches == cache.requests == embeddings.calls == 4
+
+    again = BatchedSemanticChunker(cache, max_batch_texts=8)
+    assert again.split_text(text) == first.split_text(text)
+    assert again.embedding_batches == 4
+    assert cache.requests == embeddings.calls == 4
+    assert cache.stats()["requests"] == 4
+
+
+def test_token_batches_respect_both_limits():
+    texts = ["x" * 40] * 25  # 11 approximate tokens each
+    batches = token_batches(texts, max_tokens=50, max_texts=3)
+    assert [b.stop - b.start for b in batches] == [3] * 8 + [1]
+    assert token_batches(["x" * 400], max_tokens=10) == [slice(0, 1)]
+    assert token_batches([]) == []
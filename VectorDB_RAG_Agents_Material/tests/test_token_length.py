@@ -0,0 +1,69 @@
+# test_token_length.py
+import random
+
+import pytest
+import tiktoken
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.token_length import TokenLengthCounter, TokenRecursiveTextSplitter
+
+# cl100k_base's pre-tokenizer; the real ranks need a download, so a small byte-level BPE stands in
+CL100K_PATTERN = (r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+"""
+                  r"""|\s++$|\s*[\r\n]|\s+(?!\S)|\s""")
+MERGES = ["th", "he", "the", " the", " a", "in", "ing", "'s", "12", ". ", "\n\n", "  ", " \n", "\n ", "  \n"]
+WORDS = ["the", "cat", "it's", "123456", "a", "thing", "!", "...", ",", "é", "ünï"]
+SEPARATORS = [" ", "  ", "\n", "\n\n", " \n", "\n  ", "\t", "   ", ". ", "\n\n\n "]
+
+
+@pytest.fixture(scope="module")
+def encoding():
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in MERGES:
+        ranks.setdefault(merge.encode(), len(ranks))
+    return tiktoken.Encoding("test-bpe", pat_str=CL100K_PATTERN, mergeable_ranks=ranks, special_tokens={})
+
+
+def random_text(rng, words=200):
+    return "".join(rng.choice(WORDS) + rng.choice(SEPARATORS) for _ in range(words))
+
+
+def test_spans_count_like_encode(encoding):
+    rng = random.Random(0)
+    counter = TokenLengthCounter.from_tiktoken(encoding)
+    for _ in range(20):
+        text = random_text(rng)
+        counter.register(text)
+        spans = sorted((rng.randrange(len(text)), rng.randrange(1, 300)) for _ in range(500))
+        for start, size in spans:
+            piece = text[start:start + size]
+            assert counter(piece) == len(encoding.encode(piece)), repr(piece)
+    assert counter.span_hits > 0
+
+
+def test_pieces_ending_in_whitespace_are_encoded(encoding):
+    counter = TokenLengthCounter.from_tiktoken(encoding)
+    text = "it's\n  the cat"  # pre-tokens "\\n", " ", " the"; alone "\\n " is one
+    counter.register(text)
+    assert counter("it's\n ") == len(encoding.encode("it's\n "))
+    assert counter.span_hits == 0 and counter.encodes == 2
+
+
+def test_unrelated_text_becomes_the_document(encoding):
+    counter = TokenLengthCounter.from_tiktoken(encoding)
+    assert counter("the cat") == len(encoding.encode("the cat"))
+    assert counter("the") == len(encoding.encode("the"))
+    assert counter("the cat") == len(encoding.encode("the cat"))
+    assert counter.stats() == {"calls": 3, "memo_hits": 1, "span_hits": 1, "encodes": 1}
+
+
+@pytest.mark.parametrize("keep_separator", [True, "end", False])
+def test_splitter_gives_the_same_chunks(encoding, keep_separator):
+    rng = random.Random(1)
+    texts = [random_text(rng, 2_000) for _ in range(3)]
+    kwargs = dict(chunk_size=64, chunk_overlap=16, keep_separator=keep_separator, strip_whitespace=False)
+    expected = RecursiveCharacterTextSplitter(length_function=lambda t: len(encoding.encode(t)), **kwargs)
+    splitter = TokenRecursiveTextSplitter(TokenLengthCounter.from_tiktoken(encoding), **kwargs)
+    for text in texts:
+        assert splitter.split_text(text) == expected.split_text(text)
+    stats = splitter.token_length.stats()
+    assert stats["span_hits"] + stats["memo_hits"] > stats["encodes"]
@@ -0,0 +1,161 @@
+# answer_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+# ---- Config ----
+SIMILARITY_THRESHOLD = 0.9  # cosine similarity of two questions that may share an answer
+MAX_ENTRIES = 5_000
+ANSWER_TTL = 6 * 3600       # seconds
+
+
+def context_fingerprint(docs: list[Document]) -> str:
+    """Hash of the retrieved context: same chunks in the same order -> same fingerprint."""
+    h = hashlib.sha256()
+    for doc in docs:
+        h.update(str(doc.metadata.get("source", "")).encode("utf-8"))
+        h.update(b"\0")
+        h.update(doc.page_content.encode("utf-8"))
+        h.update(b"\1")
+    return h.hexdigest()
+
+
+def prompt_key(k: int, **prompt: Any) -> str:
+    """Everything besides the question and context that changes the answer (k, style, language)."""
+    return json.dumps({"k": k, **prompt}, sort_keys=True, default=str)
+
+
+class SemanticAnswerCache:
+    """
+    Answers of earlier questions, found again by meaning instead of by text.
+
+    Each entry is (question embedding, context fingerprint, prompt key,
+    answer). The embeddings live in a small in-memory vector index (one
+    normalized matrix, searched with a single matrix-vector product), so a
+    paraphrase such as "What is Dracula's home?" finds the entry of "Where
+    does Dracula live?". A hit needs
+
+    - cosine similarity >= `threshold`,
+    - the same prompt key (k, style, language),
+    - the same context fingerprint: the paraphrase must retrieve the very
+      same chunks, so an answer is never reused for a different context;
+    - an entry younger than its TTL.
+
+    Entries are evicted least recently used when the cache is full, and all
+    of them are dropped when the collection `version` changes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES,
+        ttl: Optional[float] = ANSWER_TTL,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._expires = np.empty(0, dtype=np.float64)
+        self._used = np.empty(0, dtype=np.float64)
+        self._entries: list[tuple[str, str, str]] = []  # (fingerprint, prompt key, answer)
+        self.hits = self.misses = self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self, version: Optional[Hashable]) -> None:
+        if version is not None and version != self.version:
+            if self.version is not None and self._entries:
+                self._clear()
+                self.invalidations += 1
+            self.version = version
+
+    def _clear(self) -> None:
+        self._vectors = self._vectors[:0]
+        self._expires = self._expires[:0]
+        self._used = self._used[:0]
+        self._entries = []
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def _remove(self, rows: np.ndarray) -> None:
+        keep = np.ones(len(self._entries), dtype=bool)
+        keep[rows] = False
+        self._vectors = self._vectors[keep]
+        self._expires = self._expires[keep]
+        self._used = self._used[keep]
+        self._entries = [entry for entry, kept in zip(self._entries, keep) if kept]
+
+    @staticmethod
+    def _normalize(vector: Any) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(
+        self, vector: Any, fingerprint: str, key: str = "", version: Optional[Hashable] = None
+    ) -> Optional[str]:
+        """Cached answer for a question embedding and its retrieved context, or None."""
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_version(version)
+            if self._entries:
+                now = time.monotonic()
+                sims = self._vectors @ query
+                sims[self._expires <= now] = -np.inf
+                candidates = np.flatnonzero(sims >= self.threshold)
+                for row in candidates[np.argsort(-sims[candidates])]:
+                    entry_fingerprint, entry_key, answer = self._entries[row]
+                    if entry_fingerprint == fingerprint and entry_key == key:
+                        self._used[row] = now
+                        self.hits += 1
+                        return answer
+                expired = np.flatnonzero(self._expires <= now)
+                if len(expired):
+                    self._remove(expired)
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        vector: Any,
+        fingerprint: str,
+        answer: str,
+        key: str = "",
+        version: Optional[Hashable] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            if len(self._entries) >= self.max_entries:
+                self._remove(np.argsort(self._used)[:len(self._entries) - self.max_entries + 1])
+            if not self._entries:
+                self._vectors = np.empty((0, len(query)), dtype=np.float32)
+            self._vectors = np.vstack([self._vectors, query[None, :]])
+            self._expires = np.append(self._expires, now + ttl if ttl is not None else np.inf)
+            self._used = np.append(self._used, now)
+            self._entries.append((fingerprint, key, answer))
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+        }
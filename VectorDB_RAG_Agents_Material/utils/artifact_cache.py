@@ -0,0 +1,328 @@
+# artifact_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import types
+import uuid
+import weakref
+import zlib
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+# ---- Config ----
+CACHE_DIR = ".artifact_cache"
+MAX_BYTES = 512 * 2**20   # cache size on disk; least recently used artifacts go first
+HASH_BLOCK = 1 << 20      # bytes read at a time when hashing a source file
+COMPRESS_LEVEL = 1        # zlib level per document record: fast, still ~3x smaller for text
+MAGIC = b"DOCS0001"
+# header: magic, document count, sha256 of the documents
+_HEADER = struct.Struct("<8sQ32s")
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+
+def _encode(doc: Document) -> bytes:
+    """One uncompressed record: 4-byte length of the JSON head, JSON {id, metadata}, UTF-8 text."""
+    head = json.dumps({"id": doc.id, "metadata": doc.metadata}, sort_keys=True, default=str).encode("utf-8")
+    return struct.pack("<I", len(head)) + head + doc.page_content.encode("utf-8")
+
+
+def _decode(record: bytes) -> Document:
+    (head_len,) = struct.unpack_from("<I", record)
+    head = json.loads(record[4:4 + head_len])
+    return Document(id=head["id"], page_content=record[4 + head_len:].decode("utf-8"), metadata=head["metadata"])
+
+
+def documents_digest(docs: Iterable[Document]) -> bytes:
+    """sha256 of the documents (ids, metadata and text, in order)."""
+    digest = getattr(docs, "digest", None)
+    if digest is not None:
+        return digest
+    h = hashlib.sha256()
+    for doc in docs:
+        record = _encode(doc)
+        h.update(struct.pack("<Q", len(record)))
+        h.update(record)
+    return h.digest()
+
+
+def file_digest(path: str) -> bytes:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(HASH_BLOCK):
+            h.update(block)
+    return h.digest()
+
+
+def _const_repr(const: Any) -> str:
+    if isinstance(const, frozenset):  # set order depends on hash randomization
+        return repr(sorted(const, key=repr))
+    return repr(const)
+
+
+def code_digest(fn: Any) -> str:
+    """
+    Short sha256 of the bytecode of a function, method or callable object
+    (its class's `__call__`): constants, names and nested functions included.
+    Empty for builtins, which have no bytecode.
+    """
+    fn = getattr(fn, "__func__", fn)
+    code = getattr(fn, "__code__", None) or getattr(getattr(type(fn), "__call__", None), "__code__", None)
+    if code is None:
+        return ""
+    h = hashlib.sha256()
+
+    def add(code: types.CodeType) -> None:
+        h.update(code.co_code)
+        h.update(repr(code.co_names).encode("utf-8"))
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                add(const)
+            else:
+                h.update(_const_repr(const).encode("utf-8"))
+
+    add(code)
+    h.update(repr([_const_repr(v) for v in getattr(fn, "__defaults__", None) or ()]).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def config_of(obj: Any, depth: int = 2) -> dict[str, Any]:
+    """
+    Class and plain settings (strings, numbers, lists and dicts of them) of a
+    loader or splitter, including those of the objects it holds (a loader's
+    parser). Callables such as length_function are identified by name and
+    `code_digest`, plus their `name` attribute if they have one
+    (TokenLengthCounter: tokenizer), so editing a length function changes
+    the key.
+    """
+    config: dict[str, Any] = {"class": f"{type(obj).__module__}.{type(obj).__qualname__}"}
+    for name, value in sorted(getattr(obj, "__dict__", {}).items()):
+        if isinstance(value, _PRIMITIVES):
+            config[name] = value
+        elif isinstance(value, (list, tuple, dict)):
+            config[name] = json.loads(json.dumps(value, sort_keys=True, default=lambda v: type(v).__qualname__))
+        elif callable(value):
+            label = getattr(value, "__qualname__", type(value).__qualname__)
+            if isinstance(getattr(value, "name", None), str):
+                label = f"{label}:{value.name}"
+            digest = code_digest(value)
+            config[name] = f"{label}@{digest}" if digest else label
+        elif hasattr(value, "__dict__") and depth > 0:
+            config[name] = config_of(value, depth - 1)
+    return config
+
+
+class CachedDocuments(Sequence):
+    """
+    Documents of one cache file, decoded lazily: the file is memory-mapped
+    and a document is only decompressed when it is accessed.
+
+    `close()` (or a `with` block) unmaps the file; until then it cannot be
+    deleted on Windows. Copy the documents out (`list(docs)`) to keep them.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, n, self.digest = _HEADER.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a document cache file.")
+            # a copy: a view would keep the mapping from being closed
+            self._offsets = np.frombuffer(self._mmap, dtype="<u8", count=n + 1, offset=_HEADER.size).copy()
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __repr__(self) -> str:
+        state = ", closed" if self.closed else ""
+        return f"CachedDocuments({len(self)} documents{state})"
+
+    @property
+    def closed(self) -> bool:
+        return self._mmap.closed
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> "CachedDocuments":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _get(self, i: int) -> Document:
+        if self.closed:
+            raise ValueError("I/O operation on closed CachedDocuments.")
+        start, stop = int(self._offsets[i]), int(self._offsets[i + 1])
+        return _decode(zlib.decompress(self._mmap[start:stop]))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._get(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._get(i)
+
+    def __iter__(self) -> Iterator[Document]:
+        for i in range(len(self)):
+            yield self._get(i)
+
+
+def write_documents(path: Path, docs: Iterable[Document]) -> int:
+    """
+    Write documents as: header, n+1 uint64 record offsets, zlib-compressed
+    records. Written to a temporary file and renamed, so readers never see a
+    partial file. Returns the file size.
+    """
+    records = []
+    h = hashlib.sha256()
+    for doc in docs:
+        record = _encode(doc)
+        h.update(struct.pack("<Q", len(record)))
+        h.update(record)
+        records.append(zlib.compress(record, COMPRESS_LEVEL))
+    offsets = np.empty(len(records) + 1, dtype="<u8")
+    offsets[0] = _HEADER.size + offsets.nbytes
+    offsets[1:] = offsets[0] + np.cumsum([len(r) for r in records], dtype=np.uint64)
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(records), h.digest()))
+        f.write(offsets.tobytes())
+        for record in records:
+            f.write(record)
+    os.replace(tmp, path)
+    return int(offsets[-1])
+
+
+class ArtifactCache:
+    """
+    Content-addressed cache for the outputs of loaders and splitters.
+
+    - `load(loader)`: parsed Documents, keyed by (hash of the file content,
+      loader class and settings, file path, which loaders put in `source`).
+    - `split(text_splitter, docs)`: chunks, keyed by (hash of the documents,
+      splitter class and settings).
+
+    Hits come back as `CachedDocuments` (memory-mapped, decoded on access);
+    `close()` the cache (or use it in a `with` block) to unmap every one it
+    returned, or close them one by one. A changed file, setting or length function (its bytecode) is a new key.
+    Changes the key cannot see, such as a new version of a parser library or
+    of code a callable calls into, leave stale entries: `clear()` the cache
+    after upgrading them. The directory is kept under `max_bytes` by
+    deleting the least recently used artifacts.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.path = Path(cache_dir)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._open: weakref.WeakSet[CachedDocuments] = weakref.WeakSet()
+        self.hits = self.misses = self.evictions = 0
+
+    def __enter__(self) -> "ArtifactCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap every CachedDocuments this cache returned."""
+        with self._lock:
+            open_docs, self._open = list(self._open), weakref.WeakSet()
+        for docs in open_docs:
+            docs.close()
+
+    def _key(self, kind: str, digest: bytes, config: dict[str, Any]) -> str:
+        payload = kind.encode() + digest + json.dumps(config, sort_keys=True, default=str).encode("utf-8")
+        return f"{kind}-{hashlib.sha256(payload).hexdigest()[:32]}"
+
+    def get(self, key: str) -> Optional[CachedDocuments]:
+        path = self.path / f"{key}.docs"
+        try:
+            os.utime(path)  # mtime = last use, for eviction
+            docs = CachedDocuments(path)
+        except (FileNotFoundError, ValueError, struct.error):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._open.add(docs)
+        return docs
+
+    def put(self, key: str, docs: Iterable[Document]) -> None:
+        write_documents(self.path / f"{key}.docs", docs)
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".docs"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)  # open CachedDocuments keep their mapping (POSIX)
+                except OSError:      # still mapped on Windows: try again next time
+                    continue
+                total -= size
+                self.evictions += 1
+
+    def load(self, loader: Any, file_path: Optional[str] = None) -> Sequence[Document]:
+        """`loader.load()`, unless this file content was loaded with the same loader settings before."""
+        file_path = file_path or str(getattr(loader, "file_path"))
+        config = {**config_of(loader), "file_path": os.path.abspath(file_path)}
+        key = self._key("load", file_digest(file_path), config)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        docs = loader.load()
+        self.put(key, docs)
+        return docs
+
+    def split(self, text_splitter: Any, docs: Sequence[Document]) -> Sequence[Document]:
+        """`text_splitter.split_documents(docs)`, cached by document content and splitter settings."""
+        key = self._key("split", documents_digest(docs), config_of(text_splitter))
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        chunks = text_splitter.split_documents(list(docs))
+        self.put(key, chunks)
+        return chunks
+
+    def clear(self) -> None:
+        self.close()
+        with self._lock:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".docs"):
+                    os.remove(entry.path)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        size = sum(e.stat().st_size for e in os.scandir(self.path) if e.name.endswith(".docs"))
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "bytes": size,
+        }
@@ -0,0 +1,183 @@
+# bm25.py
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+# ---- Config ----
+K1 = 1.5
+B = 0.75
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    BM25 inverted index over chunk texts, keyed by the same ids as the
+    vector store. Postings are stored CSR-style: for term t, rows
+    rows[offsets[t]:offsets[t+1]] with term frequencies tfs[...] (uint32 and
+    uint16 arrays, memory-mapped when loaded from disk).
+
+    Files in `path`: offsets.npy, rows.npy, tfs.npy, doc_len.npy,
+    vocab.json (terms in term-id order) and ids.json (row -> chunk id).
+
+    New texts wait in a small in-memory buffer and are merged into the
+    arrays before the next search or save; deleted rows are dropped from
+    the postings at that merge and renumbered on save.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = K1, b: float = B):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self.vocab: dict[str, int] = {}
+        self.ids: list[str] = []
+        self.rows_by_id: dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.empty(0, dtype=np.uint32)
+        self.tfs = np.empty(0, dtype=np.uint16)
+        self.doc_len = np.empty(0, dtype=np.uint32)
+        self.alive = np.empty(0, dtype=bool)
+        self._pending: list[tuple[int, Counter]] = []
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str, **kwargs: float) -> "BM25Index":
+        """Load the index saved in `path`, or start an empty one there."""
+        index = cls(path, **kwargs)
+        if (index.path / "ids.json").exists():
+            index.vocab = {term: i for i, term in enumerate(json.loads((index.path / "vocab.json").read_text()))}
+            index.ids = json.loads((index.path / "ids.json").read_text())
+            index.rows_by_id = {chunk_id: row for row, chunk_id in enumerate(index.ids)}
+            index.offsets = np.load(index.path / "offsets.npy")
+            index.rows = np.load(index.path / "rows.npy", mmap_mode="r")
+            index.tfs = np.load(index.path / "tfs.npy", mmap_mode="r")
+            index.doc_len = np.load(index.path / "doc_len.npy")
+            index.alive = np.ones(len(index.ids), dtype=bool)
+        return index
+
+    @classmethod
+    def from_chroma(cls, collection, path: Optional[str] = None, page: int = 5_000) -> "BM25Index":
+        """Index the documents already stored in a chromadb collection."""
+        index = cls(path)
+        for offset in range(0, collection.count(), page):
+            batch = collection.get(include=["documents"], limit=page, offset=offset)
+            index.add(batch["ids"], batch["documents"])
+        return index
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def __contains__(self, chunk_id: str) -> bool:
+        row = self.rows_by_id.get(chunk_id)
+        return row is not None and bool(self.alive[row])
+
+    # ---- Updates ----
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        """Add (or replace) texts under their chunk ids."""
+        ids, texts = list(ids), list(texts)
+        self.delete(ids)
+        start = len(self.ids)
+        counts = [Counter(tokenize(text or "")) for text in texts]
+        for term_counts in counts:
+            for term in term_counts:
+                self.vocab.setdefault(term, len(self.vocab))
+        self.ids += ids
+        self.doc_len = np.concatenate((self.doc_len, [sum(c.values()) for c in counts])).astype(np.uint32)
+        self.alive = np.concatenate((self.alive, np.ones(len(ids), dtype=bool)))
+        self.rows_by_id.update((chunk_id, start + i) for i, chunk_id in enumerate(ids))
+        self._pending += [(start + i, c) for i, c in enumerate(counts)]
+        self._dirty = True
+
+    def delete(self, ids: Iterable[str]) -> None:
+        for chunk_id in ids:
+            row = self.rows_by_id.pop(chunk_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self._dirty = True
+
+    def _merge(self) -> None:
+        """Fold pending texts into the postings arrays and drop deleted rows."""
+        with self._lock:
+            if self._dirty:
+                self._merge_pending()
+
+    def _merge_pending(self) -> None:
+        terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        rows, tfs = np.asarray(self.rows), np.asarray(self.tfs)
+        if self._pending:
+            new_terms = [self.vocab[term] for _, c in self._pending for term in c]
+            new_rows = [row for row, c in self._pending for _ in c]
+            new_tfs = [min(tf, np.iinfo(np.uint16).max) for _, c in self._pending for tf in c.values()]
+            terms = np.concatenate((terms, new_terms)).astype(np.int64)
+            rows = np.concatenate((rows, new_rows)).astype(np.uint32)
+            tfs = np.concatenate((tfs, new_tfs)).astype(np.uint16)
+        keep = self.alive[rows]
+        terms, rows, tfs = terms[keep], rows[keep], tfs[keep]
+        order = np.lexsort((rows, terms))
+        self.rows, self.tfs = rows[order], tfs[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=len(self.vocab))))).astype(np.int64)
+        self._pending = []
+        self._dirty = False
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the compacted index (deleted rows removed, rows renumbered)."""
+        self.path = Path(path) if path else self.path
+        if self.path is None:
+            raise ValueError("No path to save the index to.")
+        self._merge()
+        live = np.flatnonzero(self.alive)
+        renumber = np.full(len(self.alive), -1, dtype=np.int64)
+        renumber[live] = np.arange(len(live))
+        self.rows = renumber[self.rows].astype(np.uint32)
+        self.tfs = np.array(self.tfs)  # never write a file from its own memory map
+        self.ids = [self.ids[i] for i in live]
+        self.rows_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.doc_len = self.doc_len[live]
+        self.alive = np.ones(len(live), dtype=bool)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        np.save(self.path / "offsets.npy", self.offsets)
+        np.save(self.path / "rows.npy", self.rows)
+        np.save(self.path / "tfs.npy", self.tfs)
+        np.save(self.path / "doc_len.npy", self.doc_len)
+        vocab = sorted(self.vocab, key=self.vocab.get)
+        (self.path / "vocab.json").write_text(json.dumps(vocab, ensure_ascii=False), encoding="utf-8")
+        (self.path / "ids.json").write_text(json.dumps(self.ids))
+
+    # ---- Search ----
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        """Top-k (chunk id, BM25 score), best first; only texts sharing a term with the query."""
+        self._merge()
+        n_docs = len(self)
+        if n_docs == 0:
+            return []
+        avg_len = float(self.doc_len[self.alive].mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / avg_len)
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            rows = np.asarray(self.rows[self.offsets[t]:self.offsets[t + 1]])
+            if len(rows) == 0:
+                continue
+            tfs = np.asarray(self.tfs[self.offsets[t]:self.offsets[t + 1]], dtype=np.float32)
+            idf = math.log(1 + (n_docs - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.ids[row], float(scores[row])) for row in top]
@@ -0,0 +1,172 @@
+# context_packing.py
+from __future__ import annotations
+
+import hashlib
+import re
+import warnings
+from typing import Callable, Optional
+
+from langchain_core.documents import Document
+
+from utils.embedding_cache import normalize_text
+from utils.token_length import TokenLengthCounter
+
+# ---- Config ----
+TOKEN_BUDGET = 1_500       # context tokens sent to the LLM
+ENCODING = "cl100k_base"   # tiktoken encoding used to count context tokens
+CHARS_PER_TOKEN = 3        # fallback count; English averages ~4 characters per token, so it overestimates
+NEAR_DUPLICATE = 0.8       # share of a passage's word shingles already in a kept passage that makes it a duplicate
+SHINGLE_WORDS = 5
+_WORDS = re.compile(r"\w+")
+
+
+def char_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def token_counter(encoding_name: str = ENCODING) -> Callable[[str], int]:
+    """
+    `count_tokens` for ContextPacker: a TokenLengthCounter over the tiktoken
+    encoding. tiktoken downloads the encoding on first use; when it is not
+    installed or the download fails, tokens are estimated from characters
+    (rounded up: the estimate errs towards a smaller context).
+    """
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception as e:  # ImportError, or no network for the first download
+        warnings.warn(f"tiktoken encoding {encoding_name!r} unavailable ({e!r}); "
+                      f"counting {CHARS_PER_TOKEN} characters per token")
+        return char_tokens
+    return TokenLengthCounter.from_tiktoken(encoding)
+
+
+def _shingles(text: str) -> set[int]:
+    words = _WORDS.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {hash(tuple(words))}
+    return {hash(tuple(words[i:i + SHINGLE_WORDS])) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def merge_overlapping(docs: list[Document]) -> list[tuple[int, Document]]:
+    """
+    Merge chunks of the same source that overlap or touch, using their
+    start_index: the shared text appears once. Returns (rank, passage) with
+    rank = best (lowest) position among the merged chunks; chunks without
+    start_index are kept as they are.
+    """
+    by_source: dict[str, list[tuple[int, Document]]] = {}
+    passages: list[tuple[int, Document]] = []
+    for rank, doc in enumerate(docs):
+        start = doc.metadata.get("start_index")
+        if start is None or start < 0:
+            passages.append((rank, doc))
+        else:
+            by_source.setdefault(str(doc.metadata.get("source", "")), []).append((rank, doc))
+
+    for chunks in by_source.values():
+        chunks.sort(key=lambda item: item[1].metadata["start_index"])
+        rank, first = chunks[0]
+        start = first.metadata["start_index"]
+        end = start + len(first.page_content)
+        text, metadata, merged = first.page_content, first.metadata, 1
+        for next_rank, doc in chunks[1:]:
+            next_start = doc.metadata["start_index"]
+            next_end = next_start + len(doc.page_content)
+            if next_start <= end:  # overlapping or adjacent: append only the new tail
+                if next_end > end:
+                    text += doc.page_content[end - next_start:]
+                    end = next_end
+                rank = min(rank, next_rank)
+                merged += 1
+                continue
+            passages.append((rank, _passage(text, metadata, start, end, merged)))
+            rank, start, end = next_rank, next_start, next_end
+            text, metadata, merged = doc.page_content, doc.metadata, 1
+        passages.append((rank, _passage(text, metadata, start, end, merged)))
+    return sorted(passages, key=lambda item: item[0])
+
+
+def _passage(text: str, metadata: dict, start: int, end: int, merged: int) -> Document:
+    return Document(page_content=text, metadata={**metadata, "start_index": start, "end_index": end,
+                                                 "merged_chunks": merged})
+
+
+def drop_duplicates(passages: list[tuple[int, Document]], threshold: float = NEAR_DUPLICATE) -> list[tuple[int, Document]]:
+    """
+    Drop exact duplicates (normalized text) and near duplicates: passages
+    whose word shingles are mostly (>= threshold) in one better-ranked
+    passage already kept, which includes chunks contained in a merged one.
+    """
+    kept: list[tuple[int, Document]] = []
+    seen_hashes: set[str] = set()
+    kept_shingles: list[set[int]] = []
+    for rank, doc in passages:
+        digest = hashlib.sha256(normalize_text(doc.page_content).lower().encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            continue
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) >= threshold * len(shingles) for other in kept_shingles):
+            continue
+        seen_hashes.add(digest)
+        kept_shingles.append(shingles)
+        kept.append((rank, doc))
+    return kept
+
+
+class ContextPacker:
+    """
+    Turns retrieved chunks into the context of a RAG prompt: overlapping or
+    adjacent chunks of a source are merged (no text sent twice), exact and
+    near duplicates are dropped, and the best-ranked passages are packed
+    into `budget` tokens counted with the model's tokenizer (`count_tokens`).
+    A passage that does not fit is skipped for smaller ones further down;
+    only a first passage larger than the whole budget is truncated.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], budget: int = TOKEN_BUDGET,
+                 near_duplicate: float = NEAR_DUPLICATE):
+        self.count_tokens = count_tokens
+        self.budget = budget
+        self.near_duplicate = near_duplicate
+        self.last_stats: dict[str, int] = {}
+
+    def __call__(self, docs: list[Document], budget: Optional[int] = None) -> list[Document]:
+        return self.pack(docs, budget)
+
+    def pack(self, docs: list[Document], budget: Optional[int] = None) -> list[Document]:
+        budget = budget or self.budget
+        passages = drop_duplicates(merge_overlapping(docs), self.near_duplicate)
+        packed: list[Document] = []
+        used = 0
+        for _, doc in passages:
+            tokens = self.count_tokens(doc.page_content) + 1  # +1: the "\n" joining passages
+            if used + tokens <= budget:
+                packed.append(doc)
+                used += tokens
+            elif not packed:
+                doc = self._truncate(doc, budget - 1)
+                packed.append(doc)
+                used += self.count_tokens(doc.page_content) + 1
+        self.last_stats = {
+            "chunks": len(docs),
+            "passages": len(passages),
+            "packed": len(packed),
+            "tokens_in": sum(self.count_tokens(doc.page_content) + 1 for doc in docs),
+            "tokens_out": used,
+        }
+        return packed
+
+    def _truncate(self, doc: Document, budget: int) -> Document:
+        """Longest word-aligned prefix that fits, found by binary search on characters."""
+        text = doc.page_content
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.count_tokens(text[:mid]) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        cut = text.rfind(" ", 0, lo + 1) if lo < len(text) else lo
+        return Document(id=doc.id, page_content=text[:cut if cut > 0 else lo], metadata=doc.metadata)
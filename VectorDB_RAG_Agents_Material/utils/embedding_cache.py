@@ -0,0 +1,306 @@
+# embedding_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: the store is only locked within this process
+    fcntl = None
+
+# ---- Config ----
+CACHE_DIR = ".embedding_cache"
+MAX_ENTRIES = 1_000_000  # vectors kept on disk per model
+HOT_ENTRIES = 10_000     # vectors kept in memory (LRU)
+EVICT_FRACTION = 0.1     # share of the disk cache freed when it is full
+KEY_BYTES = 16
+
+_STORES: dict[Path, "_DiskStore"] = {}  # one store per cache directory in this process
+_STORES_LOCK = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _model_name(embeddings: Any) -> str:
+    for attr in ("model_name", "model", "_model_name"):
+        name = getattr(embeddings, attr, None)
+        if isinstance(name, str) and name:
+            return name
+    raise ValueError("Could not infer the model name, pass model_name explicitly.")
+
+
+class _DiskStore:
+    """
+    Fixed-capacity vector store on disk: vectors.f32 holds float32 rows,
+    keys.bin the 16-byte key of each row (all zeros = free slot),
+    last_used.bin a use counter per row for LRU eviction and state.bin a
+    write counter and the use clock.
+
+    There is one store per directory in a process (`shared`). Writes hold
+    an exclusive lock on the `lock` file, so processes can share the
+    directory: each keeps a slot table in memory and re-reads it from
+    keys.bin when the write counter shows another process wrote. A read
+    checks the row's key after copying the vector, so a slot reused by
+    another process meanwhile is a miss, not a wrong vector.
+    """
+
+    def __init__(self, path: Path, capacity: int):
+        self.path = path
+        self.capacity = capacity
+        self.dim: Optional[int] = None
+        self.slots: dict[bytes, int] = {}
+        self.free: list[int] = []
+        self.generation = -1
+        self.lock = threading.RLock()
+        if (path / "meta.json").exists():
+            self._open_existing()
+
+    @classmethod
+    def shared(cls, path: Path, capacity: int) -> "_DiskStore":
+        """The store of `path` in this process; `capacity` only applies to a new directory."""
+        key = path.resolve()
+        with _STORES_LOCK:
+            store = _STORES.get(key)
+            if store is None:
+                store = _STORES[key] = cls(path, capacity)
+            return store
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """This thread alone in the store, and this process alone in the directory."""
+        with self.lock:
+            if fcntl is None:  # Windows: threads of this process only
+                yield
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / "lock", "a+b") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open_existing(self) -> None:
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.capacity = meta["capacity"]
+        self._open(meta["dim"], "r+")
+
+    def _open(self, dim: int, mode: str) -> None:
+        self.dim = dim
+        self.vectors = np.memmap(self.path / "vectors.f32", np.float32, mode, shape=(self.capacity, dim))
+        self.keys = np.memmap(self.path / "keys.bin", np.uint8, mode, shape=(self.capacity, KEY_BYTES))
+        self.last_used = np.memmap(self.path / "last_used.bin", np.uint64, mode, shape=(self.capacity,))
+        self.state = np.memmap(self.path / "state.bin", np.uint64, mode, shape=(2,))  # writes, use clock
+        self.generation = -1
+        self._sync()
+
+    def _create(self, dim: int) -> None:
+        """New files; only called holding the lock, when no meta.json exists (it is written last)."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._open(dim, "w+")
+        tmp = self.path / "meta.json.tmp"
+        tmp.write_text(json.dumps({"dim": dim, "capacity": self.capacity}))
+        os.replace(tmp, self.path / "meta.json")
+
+    def _sync(self) -> None:
+        """Re-read the slot table if another process wrote since it was last read."""
+        generation = int(self.state[0])
+        if generation == self.generation:
+            return
+        used = self.keys.any(axis=1)
+        self.slots = {self.keys[i].tobytes(): int(i) for i in np.flatnonzero(used)}
+        self.free = [int(i) for i in np.flatnonzero(~used)[::-1]]
+        self.generation = generation
+
+    def _touch(self, slot: int) -> None:
+        self.state[1] += 1
+        self.last_used[slot] = self.state[1]
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self.lock:
+            if self.dim is None:
+                if not (self.path / "meta.json").exists():
+                    return None
+                self._open_existing()
+            self._sync()
+            slot = self.slots.get(key)
+            if slot is None:
+                return None
+            vector = np.array(self.vectors[slot])
+            if self.keys[slot].tobytes() != key:  # reused by another process
+                return None
+            self._touch(slot)
+            return vector
+
+    def put_many(self, items: Iterable[tuple[bytes, np.ndarray]]) -> list[bytes]:
+        """Store vectors; returns the keys evicted to make room."""
+        evicted = []
+        with self._exclusive():
+            for key, vector in items:
+                if self.dim is None:
+                    if (self.path / "meta.json").exists():
+                        self._open_existing()
+                    else:
+                        self._create(vector.size)
+                self._sync()
+                if vector.size != self.dim:
+                    raise ValueError(f"Expected vectors of dimension {self.dim}, got {vector.size}.")
+                if key in self.slots:
+                    slot = self.slots[key]
+                else:
+                    if not self.free:
+                        evicted += self._evict()
+                    slot = self.free.pop()
+                    self.slots[key] = slot
+                self.keys[slot] = 0  # readers of this slot miss until the key is back
+                self.vectors[slot] = vector
+                self.keys[slot] = np.frombuffer(key, np.uint8)
+                self._touch(slot)
+                self.state[0] += 1
+                self.generation = int(self.state[0])
+        return evicted
+
+    def _evict(self) -> list[bytes]:
+        n = max(1, int(self.capacity * EVICT_FRACTION))
+        victims = np.argpartition(self.last_used, n - 1)[:n]
+        evicted = [self.keys[i].tobytes() for i in victims]
+        for key in evicted:
+            del self.slots[key]
+        self.keys[victims] = 0
+        self.last_used[victims] = 0
+        self.free.extend(int(i) for i in victims)
+        return evicted
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.dim is not None:
+                self.vectors.flush()
+                self.keys.flush()
+                self.last_used.flush()
+                self.state.flush()
+
+    def __len__(self) -> int:
+        with self.lock:
+            if self.dim is not None:
+                self._sync()
+            return len(self.slots)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in caching wrapper for any LangChain Embeddings (or a chromadb
+    embedding function). Vectors are keyed by (model name, normalized text
+    hash), kept in an mmap'd float32 file on disk with an in-memory LRU on
+    top; cache hits never call the model or the API. Instances and processes
+    using the same cache directory share its disk store.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        cache_dir: str = CACHE_DIR,
+        model_name: Optional[str] = None,
+        max_entries: int = MAX_ENTRIES,
+        hot_entries: int = HOT_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.model_name = model_name or _model_name(embeddings)
+        safe_name = re.sub(r"[^A-Za-z0-9._-]+", "_", self.model_name)
+        self._disk = _DiskStore.shared(Path(cache_dir) / safe_name, max_entries)
+        self._hot: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self.hot_entries = hot_entries
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = 0
+        self.requests = 0  # calls that reached the wrapped model
+
+    def _key(self, text: str, kind: str) -> bytes:
+        payload = f"{self.model_name}\0{kind}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).digest()[:KEY_BYTES]
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._hot[key] = vector
+        self._hot.move_to_end(key)
+        if len(self._hot) > self.hot_entries:
+            self._hot.popitem(last=False)
+
+    def _lookup(self, key: bytes) -> Optional[np.ndarray]:
+        vector = self._hot.get(key)
+        if vector is not None:
+            self._hot.move_to_end(key)
+            self.hits += 1
+            return vector
+        vector = self._disk.get(key)
+        if vector is not None:
+            self._remember(key, vector)
+            self.hits += 1
+            self.disk_hits += 1
+        return vector
+
+    def _embed(self, texts: list[str], kind: str) -> list[list[float]]:
+        keys = [self._key(text, kind) for text in texts]
+        found: dict[bytes, np.ndarray] = {}
+        missing: dict[bytes, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                vector = self._lookup(key)
+                if vector is None:
+                    missing[key] = text
+                else:
+                    found[key] = vector
+
+        if missing:
+            new = self._call_model(list(missing.values()), kind)
+            with self._lock:
+                self.misses += len(missing)
+                self.requests += 1
+                for old in self._disk.put_many(zip(missing, new)):
+                    self._hot.pop(old, None)
+                for key, vector in zip(missing, new):
+                    self._remember(key, vector)
+                    found[key] = vector
+        return [found[key].tolist() for key in keys]
+
+    def _call_model(self, texts: list[str], kind: str) -> np.ndarray:
+        if not isinstance(self.embeddings, Embeddings):
+            vectors = self.embeddings(texts)  # chromadb embedding function
+        elif kind == "query":
+            vectors = [self.embeddings.embed_query(text) for text in texts]
+        else:
+            vectors = self.embeddings.embed_documents(texts)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(list(texts), "document")
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text], "query")[0]
+
+    def flush(self) -> None:
+        self._disk.flush()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "requests": self.requests,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._disk),
+        }
@@ -0,0 +1,87 @@
+# embedding_pool.py
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ---- Config ----
+BATCH_SIZE = 64  # texts per task sent to a worker
+
+# ---- Worker side (one model per process, loaded once) ----
+_MODEL: Any = None
+_ENCODE_KWARGS: dict = {}
+
+
+def _init_worker(model_name: str, threads: int, encode_kwargs: dict) -> None:
+    global _MODEL, _ENCODE_KWARGS
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _MODEL = SentenceTransformer(model_name, device="cpu")
+    _ENCODE_KWARGS = encode_kwargs
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    return _MODEL.encode(texts, batch_size=len(texts), convert_to_numpy=True, **_ENCODE_KWARGS).astype(np.float32)
+
+
+class SentenceTransformerPool(Embeddings):
+    """
+    LangChain Embeddings backed by a pool of CPU worker processes, each with
+    its own copy of a sentence-transformers model. Texts are sorted by length
+    so batches need little padding, batches are spread over the workers and
+    the vectors come back in the original order.
+
+    Workers are started with "spawn": when running a file as a script (not
+    cell by cell), create the pool under `if __name__ == "__main__":`.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        workers: Optional[int] = None,
+        batch_size: int = BATCH_SIZE,
+        threads_per_worker: int = 1,
+        encode_kwargs: Optional[dict] = None,
+    ):
+        self.model_name = model_name
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads_per_worker)
+        self.batch_size = batch_size
+        self._pool = mp.get_context("spawn").Pool(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(model_name, threads_per_worker, encode_kwargs or {}),
+        )
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        # same preprocessing as SentenceTransformerEmbeddings
+        texts = [text.replace("\n", " ") for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = [
+            [texts[i] for i in order[start:start + self.batch_size]]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        vectors = np.concatenate(list(self._pool.imap(_encode, batches)))
+        result = np.empty_like(vectors)
+        result[order] = vectors
+        return result.tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self) -> "SentenceTransformerPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,95 @@
+# fakes.py
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# ---- Config ----
+DIM = 384  # same size as all-MiniLM-L6-v2
+_WORDS = re.compile(r"\w+")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic offline embeddings for tests and benchmarks: a hashed bag
+    of words, L2-normalized. Texts that share words get similar vectors;
+    no model download, no network, microseconds per text.
+    """
+
+    def __init__(self, dim: int = DIM, model_name: str = "hash-embeddings"):
+        self.dim = dim
+        self.model_name = model_name
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORDS.findall(text.lower()):
+            h = zlib.crc32(word.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return np.stack([self._embed(text) for text in texts]).tolist() if texts else []
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text).tolist()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Local stand-in for a hosted chat model: waits `latency` seconds (time to
+    first token), then emits a canned answer word by word, `token_latency`
+    seconds apart. Async calls sleep without blocking the event loop, so
+    orchestration (batching, concurrency, streaming) can be measured offline.
+    """
+
+    latency: float = 0.5
+    token_latency: float = 0.0
+    answer: str = "Based on the provided context, this is a fake answer to: {question}"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        prompt = str(messages[-1].content)
+        match = re.search(r"Question: (.*)", prompt)
+        text = self.answer.format(question=match.group(1) if match else prompt[:80])
+        return re.findall(r"\S+\s*", text)
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency + self.token_latency * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None,
+                         **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency + self.token_latency * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
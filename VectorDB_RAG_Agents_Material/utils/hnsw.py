@@ -0,0 +1,73 @@
+# hnsw.py
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class HNSWParams:
+    """
+    Index parameters of a Chroma collection.
+
+    - `M`: links per node. More links: higher recall, a bigger index and
+      slower inserts. Fixed when the collection is created.
+    - `construction_ef`: candidates kept while inserting. Higher: a better
+      graph and a slower build. Fixed when the collection is created.
+    - `search_ef`: candidates kept while querying. Higher: higher recall and
+      slower queries. Can be changed later with `set_search_ef`.
+
+    The defaults are Chroma's, space included (LangChain's Chroma does not
+    set one), so passing `HNSWParams()` changes nothing.
+    """
+
+    M: int = 16
+    construction_ef: int = 100
+    search_ef: int = 100
+    space: str = "l2"
+
+    def metadata(self) -> dict[str, Any]:
+        """As collection metadata: `Chroma(collection_metadata=...)`, `get_or_create_collection(metadata=...)`."""
+        return {
+            "hnsw:space": self.space,
+            "hnsw:M": self.M,
+            "hnsw:construction_ef": self.construction_ef,
+            "hnsw:search_ef": self.search_ef,
+        }
+
+    def configuration(self) -> dict[str, Any]:
+        """As a collection configuration: `create_collection(configuration=...)`."""
+        return {"hnsw": {
+            "space": self.space,
+            "max_neighbors": self.M,
+            "ef_construction": self.construction_ef,
+            "ef_search": self.search_ef,
+        }}
+
+    @classmethod
+    def of(cls, collection: Any) -> "HNSWParams":
+        """Parameters a collection (chromadb or LangChain Chroma) was created with."""
+        collection = getattr(collection, "_collection", collection)
+        hnsw = collection.configuration.get("hnsw") or {}
+        defaults = asdict(cls())
+        return cls(
+            M=hnsw.get("max_neighbors", defaults["M"]),
+            construction_ef=hnsw.get("ef_construction", defaults["construction_ef"]),
+            search_ef=hnsw.get("ef_search", defaults["search_ef"]),
+            space=hnsw.get("space", defaults["space"]),
+        )
+
+
+def set_search_ef(collection: Any, search_ef: int) -> None:
+    """
+    Change the search ef of an existing collection (chromadb or LangChain
+    Chroma); it is persisted with the collection. Metadata given when an
+    existing collection is opened is ignored, so this is the way to tune
+    queries after creation.
+
+    Chroma reads it when it loads the index: call it before the first query
+    of the process, otherwise it applies from the next process (or after
+    `chromadb.api.client.SharedSystemClient.clear_system_cache()`).
+    """
+    collection = getattr(collection, "_collection", collection)
+    collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
@@ -0,0 +1,74 @@
+# hybrid_search.py
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from langchain_core.documents import Document
+
+from utils.bm25 import BM25Index
+
+# ---- Config ----
+RRF_K = 60       # rank constant of reciprocal rank fusion
+FETCH_K = 20     # results taken from each retriever before fusion
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid")
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], rrf_k: int = RRF_K) -> list[tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (rrf_k + rank), best first."""
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _vector_search(db_client: Any, query: str, k: int, filter: Optional[dict]) -> list[Document]:
+    """Similarity search on the collection itself, so results keep their ids."""
+    res = db_client._collection.query(
+        query_embeddings=[db_client.embeddings.embed_query(query)],
+        n_results=k,
+        where=filter,
+        include=["documents", "metadatas"],
+    )
+    return [
+        Document(id=doc_id, page_content=text, metadata=metadata or {})
+        for doc_id, text, metadata in zip(res["ids"][0], res["documents"][0], res["metadatas"][0])
+    ]
+
+
+def hybrid_search(
+    db_client: Any,
+    bm25_index: BM25Index,
+    query: str,
+    k: int = 4,
+    fetch_k: int = FETCH_K,
+    rrf_k: int = RRF_K,
+    filter: Optional[dict] = None,
+) -> list[tuple[Document, float]]:
+    """
+    Lexical (BM25) and vector retrieval run concurrently on a LangChain
+    Chroma store and its BM25 index; the two rankings are fused with RRF.
+    Rare words and names ("Whitby", "Van Helsing") come from BM25, so a
+    small k is enough. Returns (Document, fused score), best first.
+    """
+    vector_future = _EXECUTOR.submit(_vector_search, db_client, query, fetch_k, filter)
+    lexical_future = _EXECUTOR.submit(bm25_index.search, query, fetch_k)
+    vector_docs = vector_future.result()
+    lexical_ids = [doc_id for doc_id, _ in lexical_future.result()]
+
+    docs = {doc.id: doc for doc in vector_docs}
+    fused = reciprocal_rank_fusion([[doc.id for doc in vector_docs], lexical_ids], rrf_k)
+
+    # lexical-only hits: fetch their text, and apply the metadata filter to them
+    missing = [doc_id for doc_id, _ in fused[:k * 2] if doc_id not in docs]
+    while missing:
+        found = db_client._collection.get(ids=missing, where=filter, include=["documents", "metadatas"])
+        docs.update(
+            (doc_id, Document(id=doc_id, page_content=text, metadata=metadata or {}))
+            for doc_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        )
+        fused = [(doc_id, score) for doc_id, score in fused if doc_id in docs or doc_id not in missing]
+        missing = [doc_id for doc_id, _ in fused[:k] if doc_id not in docs]
+    return [(docs[doc_id], score) for doc_id, score in fused[:k]]
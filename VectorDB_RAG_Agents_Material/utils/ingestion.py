@@ -0,0 +1,405 @@
+# ingestion.py
+from __future__ import annotations
+
+import hashlib
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import numpy as np
+import requests
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# ---- Config ----
+BLOCK_CHARS = 1 << 20        # chars read per block while loading
+WINDOW_CHARS = 200_000       # chars handed to the splitter at once
+BATCH_SIZE = 64              # chunks per embedding / write batch
+MAX_MEMORY_MB = 256          # ceiling for chunks and vectors in flight
+QUEUE_SIZE = 4               # batches buffered between two stages
+DELETE_BATCH = 5_000         # ids per delete call when removing stale chunks
+
+# (chunks, their vectors as an n x dim float32 array)
+Writer = Callable[[list[Document], np.ndarray], None]
+
+
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    batches: int = 0
+    skipped: int = 0
+    reused: int = 0
+    deleted: int = 0
+    seconds: float = 0.0
+    peak_memory_bytes: int = 0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+
+# ---- Load ----
+def stream_text(source: str, block_chars: int = BLOCK_CHARS) -> Iterator[str]:
+    """
+    Yield the text of a local file or URL in blocks, never the whole book.
+    """
+    if os.path.exists(source):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            while block := f.read(block_chars):
+                yield block
+        return
+
+    headers = {"User-Agent": "Mozilla/5.0"}  # Gutenberg sometimes requires it
+    with requests.get(source, headers=headers, timeout=30, stream=True) as r:
+        r.raise_for_status()
+        r.encoding = r.encoding or "utf-8"
+        yield from r.iter_content(chunk_size=block_chars, decode_unicode=True)
+
+
+# ---- Split ----
+def split_stream(
+    blocks: Iterable[str],
+    text_splitter: Any,
+    metadata: Optional[dict] = None,
+    window_chars: int = WINDOW_CHARS,
+) -> Iterator[Document]:
+    """
+    Split text arriving in blocks. The splitter only ever sees a window; its
+    last chunk is carried over into the next window. Chunks near a window
+    boundary can differ from splitting the whole text at once (the splitter
+    picks its separators per window), but the same text with the same
+    window_chars always gives the same chunks, so chunk ids stay stable
+    across runs. start_index is the offset in the full text, as with
+    add_start_index=True.
+    """
+    metadata = metadata or {}
+    buffer = ""
+    base = 0  # offset of buffer[0] in the full text
+
+    overlap = getattr(text_splitter, "_chunk_overlap", 0)
+
+    def locate(chunks: list[str]) -> list[int]:
+        # same search as TextSplitter.create_documents for start_index
+        indexes = []
+        index = previous_len = 0
+        for chunk in chunks:
+            index = buffer.find(chunk, max(0, index + previous_len - overlap))
+            previous_len = len(chunk)
+            indexes.append(index)
+        return indexes
+
+    for block in blocks:
+        buffer += block
+        if len(buffer) < window_chars:
+            continue
+        chunks = text_splitter.split_text(buffer)
+        if len(chunks) < 2:
+            continue
+        indexes = locate(chunks)
+        for chunk, index in zip(chunks[:-1], indexes[:-1]):
+            yield Document(page_content=chunk, metadata={**metadata, "start_index": base + index})
+        buffer = buffer[indexes[-1]:]
+        base += indexes[-1]
+
+    chunks = text_splitter.split_text(buffer)
+    for chunk, index in zip(chunks, locate(chunks)):
+        yield Document(page_content=chunk, metadata={**metadata, "start_index": base + index})
+
+
+def stream_chunks(source: str, text_splitter: Any, metadata: Optional[dict] = None) -> Iterator[Document]:
+    """
+    Load and split a book lazily: source -> blocks -> chunk Documents.
+    """
+    yield from split_stream(stream_text(source), text_splitter, {"source": source, **(metadata or {})})
+
+
+def split_lazily(documents: Iterable[Document], text_splitter: Any) -> Iterator[Document]:
+    """
+    Split documents one at a time as a loader yields them (e.g. PDF pages
+    from `lazy_load`), so chunks flow on before the whole file is loaded.
+    """
+    for doc in documents:
+        yield from text_splitter.split_documents([doc])
+
+
+# ---- Write ----
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_id(doc: Document) -> str:
+    """
+    Deterministic id from source, start_index and a hash of the content:
+    the same chunk always gets the same id, an edited chunk a new one.
+    The content hash is the last "-" field (see `content_digest`).
+    """
+    source = str(doc.metadata.get("source", ""))
+    return f"{_digest(source)}-{doc.metadata.get('start_index', '')}-{_digest(doc.page_content)}"
+
+
+def content_digest(chunk_id: str) -> str:
+    return chunk_id.rsplit("-", 1)[-1]
+
+
+def chroma_writer(db_client: Any) -> Writer:
+    """
+    Writer for a LangChain Chroma store that stores precomputed vectors.
+    Documents with an id are upserted under it, so re-runs never duplicate.
+    """
+    def write(docs: list[Document], vectors: np.ndarray) -> None:
+        db_client._collection.upsert(
+            ids=[doc.id or str(uuid.uuid4()) for doc in docs],
+            embeddings=vectors,
+            documents=[doc.page_content for doc in docs],
+            metadatas=[doc.metadata for doc in docs],
+        )
+
+    return write
+
+
+# ---- Pipeline ----
+class _MemoryBudget:
+    """
+    Bytes in flight (chunk texts and vectors) against a ceiling. The split
+    stage waits for room before it hands on a batch of text, the embed stage
+    before it hands on a batch of vectors. The embed stage only waits while
+    the writer holds bytes it will release: the rest of `used` is text
+    waiting for the embed stage itself, so waiting on it would never end.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.writing = 0  # the part of `used` queued for or inside the writer
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def _take(self, n: int) -> None:
+        self.used += n
+        self.peak = max(self.peak, self.used)
+
+    def acquire(self, n: int, stop: threading.Event) -> None:
+        """Room for `n` bytes of text (split stage)."""
+        with self._cond:
+            # a single batch larger than the ceiling is still let through
+            while self.used and self.used + n > self.limit and not stop.is_set():
+                self._cond.wait(timeout=0.1)
+            self._take(n)
+
+    def acquire_for_writer(self, n: int, batch_bytes: int, stop: threading.Event) -> None:
+        """Room for `n` bytes of vectors; the whole batch (`batch_bytes`, text included) goes to the writer."""
+        with self._cond:
+            while self.writing and self.used + n > self.limit and not stop.is_set():
+                self._cond.wait(timeout=0.1)
+            self._take(n)
+            self.writing += batch_bytes
+
+    def release(self, n: int) -> None:
+        """The writer is done with a batch of `n` bytes."""
+        with self._cond:
+            self.used -= n
+            self.writing -= n
+            self._cond.notify_all()
+
+
+_DONE = object()
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def ingest(
+    chunks: Iterable[Document],
+    embeddings: Embeddings,
+    write: Writer,
+    batch_size: int = BATCH_SIZE,
+    max_memory_mb: float = MAX_MEMORY_MB,
+    queue_size: int = QUEUE_SIZE,
+) -> IngestStats:
+    """
+    Run load/split -> embed -> write as three overlapping stages joined by
+    bounded queues. Only the batches in flight are kept in memory, so any
+    book size ingests with flat memory: chunk texts and their float32
+    vectors (n * dim * 4 bytes) are charged against `max_memory_mb`, and
+    both the split and the embed stage wait while it is used up.
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be greater than 0.")
+
+    budget = _MemoryBudget(int(max_memory_mb * 2**20))
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    to_embed: queue.Queue = queue.Queue(maxsize=queue_size)
+    to_write: queue.Queue = queue.Queue(maxsize=queue_size)
+    stats = IngestStats()
+    t0 = time.perf_counter()
+
+    def run(stage: Callable[[], None], out: queue.Queue) -> None:
+        try:
+            stage()
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(out, _DONE, stop)
+
+    def produce() -> None:
+        batch: list[Document] = []
+        nbytes = 0
+        for doc in chunks:
+            batch.append(doc)
+            nbytes += sys.getsizeof(doc.page_content)
+            if len(batch) == batch_size:
+                budget.acquire(nbytes, stop)
+                _put(to_embed, (batch, nbytes), stop)
+                batch, nbytes = [], 0
+            if stop.is_set():
+                return
+        if batch:
+            budget.acquire(nbytes, stop)
+            _put(to_embed, (batch, nbytes), stop)
+
+    def embed() -> None:
+        while (item := _get(to_embed, stop)) is not _DONE:
+            batch, nbytes = item
+            vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in batch]), dtype=np.float32)
+            budget.acquire_for_writer(vectors.nbytes, nbytes + vectors.nbytes, stop)
+            _put(to_write, (batch, vectors, nbytes + vectors.nbytes), stop)
+
+    threads = [
+        threading.Thread(target=run, args=(produce, to_embed), daemon=True),
+        threading.Thread(target=run, args=(embed, to_write), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while (item := _get(to_write, stop)) is not _DONE:
+            batch, vectors, nbytes = item
+            write(batch, vectors)
+            budget.release(nbytes)
+            stats.chunks += len(batch)
+            stats.batches += 1
+    except BaseException as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    stats.seconds = time.perf_counter() - t0
+    stats.peak_memory_bytes = budget.peak
+    return stats
+
+
+def incremental_ingest(
+    chunks: Iterable[Document],
+    source: str,
+    embeddings: Embeddings,
+    db_client: Any,
+    lexical_index: Optional[Any] = None,
+    **ingest_kwargs: Any,
+) -> IngestStats:
+    """
+    Sync one source with the store: only chunks with new text are embedded,
+    chunks of the source that no longer exist are deleted. Re-ingesting an
+    unchanged source embeds nothing.
+
+    Chunks are diffed on their content hash. An edit shifts the start_index
+    of every later chunk and so their ids; those chunks keep their stored
+    vectors and are only re-keyed (copied to the new id, the old id is
+    deleted at the end).
+
+    `lexical_index` (a BM25Index) is kept in sync with the same chunk ids;
+    call its save() afterwards.
+    """
+    collection = db_client._collection
+    stored = set(collection.get(where={"source": source}, include=[])["ids"])
+    by_digest = {content_digest(stored_id): stored_id for stored_id in stored}
+    seen: set[str] = set()
+    backfill: list[Document] = []  # stored before the lexical index existed
+    rekey: list[Document] = []     # text already embedded under another id
+    batch_size = ingest_kwargs.get("batch_size", BATCH_SIZE)
+    lexical_lock = threading.Lock()  # the index is updated from the split and the write stage
+    write_vectors = chroma_writer(db_client)
+    reused = 0
+
+    def index_lexically(docs: list[Document]) -> None:
+        with lexical_lock:
+            lexical_index.add([doc.id for doc in docs], [doc.page_content for doc in docs])
+
+    def write(docs: list[Document], vectors: np.ndarray) -> None:
+        write_vectors(docs, vectors)
+        if lexical_index is not None:
+            index_lexically(docs)
+
+    def copy_vectors(docs: list[Document]) -> None:
+        nonlocal reused
+        if not docs:
+            return
+        old_ids = list({by_digest[content_digest(doc.id)] for doc in docs})
+        got = collection.get(ids=old_ids, include=["embeddings"])
+        vectors = dict(zip(got["ids"], got["embeddings"]))
+        write(docs, np.asarray([vectors[by_digest[content_digest(doc.id)]] for doc in docs], dtype=np.float32))
+        reused += len(docs)
+
+    def fresh() -> Iterator[Document]:
+        for doc in chunks:
+            doc.id = chunk_id(doc)
+            seen.add(doc.id)
+            if doc.id not in stored:
+                if content_digest(doc.id) not in by_digest:
+                    yield doc
+                    continue
+                rekey.append(doc)
+                if len(rekey) >= batch_size:
+                    copy_vectors(rekey)
+                    rekey.clear()
+                continue
+            if lexical_index is None:
+                continue
+            with lexical_lock:
+                missing = doc.id not in lexical_index
+            if missing:
+                backfill.append(doc)
+                if len(backfill) >= batch_size:
+                    index_lexically(backfill)
+                    backfill.clear()
+
+    stats = ingest(fresh(), embeddings, write, **ingest_kwargs)
+    copy_vectors(rekey)
+
+    # only after a complete run, so a failed ingest never loses chunks
+    stale = list(stored - seen)
+    for i in range(0, len(stale), DELETE_BATCH):
+        collection.delete(ids=stale[i:i + DELETE_BATCH])
+    if lexical_index is not None:
+        index_lexically(backfill)
+        lexical_index.delete(stale)
+    stats.skipped = len(stored & seen)
+    stats.reused = reused
+    stats.deleted = len(stale)
+    return stats
@@ -0,0 +1,361 @@
+# maintenance.py
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: plain copies
+    fcntl = None
+
+from utils.hnsw import HNSWParams
+
+# ---- Config ----
+SQLITE_FILE = "chroma.sqlite3"
+MANIFEST = "manifest.json"
+EXTRA_DIR = "extra"    # folder of a snapshot holding the directories kept next to the database (db_bm25)
+COPY_PAGE = 5000       # records read and written at a time when a collection is rebuilt
+SNAPSHOT_RETRIES = 5   # attempts at a snapshot while index files keep changing under it
+FICLONE = 0x40049409   # Linux ioctl: copy-on-write clone of a whole file (btrfs, XFS, ...)
+REBUILD_SUFFIX = "__rebuild"
+KEEP_SNAPSHOTS = 5     # snapshots kept by the maintenance script; older ones are deleted
+
+
+def dir_size(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def clone_file(src: str, dst: str) -> str:
+    """
+    Copy a file, as a copy-on-write clone when the filesystem supports it
+    (instant, no extra space until one side changes). Returns "clone" or "copy".
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            if fcntl is None:
+                raise OSError
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            method = "clone"
+        except OSError:
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+            method = "copy"
+    shutil.copystat(src, dst)
+    return method
+
+
+def _index_files(persist_dir: Path) -> dict[str, tuple[int, int]]:
+    """relative path -> (size, mtime_ns) of every file except the SQLite database."""
+    files = {}
+    for path in sorted(persist_dir.rglob("*")):
+        if path.is_file() and not path.name.startswith(SQLITE_FILE):
+            stat = path.stat()
+            files[path.relative_to(persist_dir).as_posix()] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def _backup_sqlite(src: Path, dst: Path) -> None:
+    """Consistent copy of a live SQLite database (pending journal or WAL included)."""
+    source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    target = sqlite3.connect(dst)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def collection_names(persist_dir: str) -> list[str]:
+    """Collections of a persisted Chroma database, read straight from SQLite (no client is opened)."""
+    db = sqlite3.connect(f"file:{Path(persist_dir) / SQLITE_FILE}?mode=ro", uri=True)
+    try:
+        return [name for (name,) in db.execute("SELECT name FROM collections ORDER BY name")]
+    finally:
+        db.close()
+
+
+def list_snapshots(snapshot_dir: str) -> list[dict[str, Any]]:
+    """Manifests of the snapshots in `snapshot_dir`, oldest first."""
+    manifests = []
+    for path in sorted(Path(snapshot_dir).glob(f"*/{MANIFEST}")):
+        with open(path, encoding="utf-8") as f:
+            manifests.append({**json.load(f), "path": str(path.parent)})
+    return sorted(manifests, key=lambda m: m["created"])
+
+
+def prune_snapshots(snapshot_dir: str, keep: int) -> list[str]:
+    """
+    Delete all but the `keep` newest snapshots of `snapshot_dir`; returns
+    the names deleted. Snapshots are deleted whole: a file hard-linked into
+    a newer snapshot stays there, only its link in the old one goes.
+    """
+    if keep < 1:
+        raise ValueError("keep must be at least 1.")
+    snapshots = list_snapshots(snapshot_dir)
+    removed = []
+    for manifest in snapshots[:-keep]:
+        # the manifest goes first: a half-deleted snapshot is no longer listed
+        os.remove(Path(manifest["path"]) / MANIFEST)
+        shutil.rmtree(manifest["path"])
+        removed.append(manifest["name"])
+    return removed
+
+
+def _copy_files(
+    source: Path, target: Path, files: dict[str, tuple[int, int]], prefix: str,
+    previous: Optional[dict[str, Any]], copied: dict[str, dict[str, Any]],
+) -> None:
+    """Copy `files` of `source` into `target`, hard-linking those unchanged in `previous` (keys are `prefix` + path)."""
+    for rel, (size, mtime_ns) in files.items():
+        key = f"{prefix}{rel}"
+        dst = target / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        old = previous["files"].get(key) if previous else None
+        if old and (old["size"], old["mtime_ns"]) == (size, mtime_ns):
+            os.link(Path(previous["path"]) / key, dst)
+            method = "link"
+        else:
+            method = clone_file(str(source / rel), str(dst))
+        copied[key] = {"size": size, "mtime_ns": mtime_ns, "method": method}
+
+
+def snapshot(
+    persist_dir: str,
+    snapshot_dir: str,
+    label: Optional[str] = None,
+    extra_dirs: Optional[list[str]] = None,
+    keep: Optional[int] = None,
+) -> dict[str, Any]:
+    """
+    Consistent snapshot of a persisted Chroma directory in a new folder of
+    `snapshot_dir`; returns its manifest.
+
+    The HNSW segment files are copied first and the SQLite database last,
+    with SQLite's backup API, so the database is never older than the index
+    (Chroma replays newer log entries into the index when it opens). If an
+    index file changed while it was copied (a flush), the snapshot is taken
+    again. Files unchanged since the previous snapshot are hard-linked to it
+    rather than copied: snapshots are never written to, so sharing is safe,
+    and an incremental snapshot costs only what changed.
+
+    `extra_dirs` are directories derived from the database that must stay
+    in step with it (the BM25 index of M07, `db_bm25`). Those that exist
+    are copied the same way into `extra/<name>` and listed in the manifest,
+    so `restore` puts them back together with the database.
+
+    The snapshot is written to a temporary folder and renamed, so a
+    half-written snapshot never shows up in `list_snapshots`. With `keep`,
+    only the `keep` newest snapshots (this one included) are kept afterwards
+    (`prune_snapshots`); the deleted names are in the manifest's "pruned".
+    """
+    source = Path(persist_dir)
+    if not (source / SQLITE_FILE).exists():
+        raise FileNotFoundError(f"{persist_dir} is not a persisted Chroma directory.")
+    if keep is not None and keep < 1:
+        raise ValueError("keep must be at least 1.")
+    extras = {Path(d).name: Path(d) for d in extra_dirs or () if Path(d).is_dir()}
+    root = Path(snapshot_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    previous = list_snapshots(snapshot_dir)
+    previous = previous[-1] if previous else None
+    t0 = time.perf_counter()
+
+    for _ in range(SNAPSHOT_RETRIES):
+        tmp = root / f".tmp-{uuid.uuid4().hex}"
+        tmp.mkdir()
+        before = _index_files(source)
+        before_extras = {name: _index_files(path) for name, path in extras.items()}
+        files: dict[str, dict[str, Any]] = {}
+        _copy_files(source, tmp, before, "", previous, files)
+        for name, path in extras.items():
+            _copy_files(path, tmp / EXTRA_DIR / name, before_extras[name], f"{EXTRA_DIR}/{name}/", previous, files)
+        _backup_sqlite(source / SQLITE_FILE, tmp / SQLITE_FILE)
+        if _index_files(source) == before and all(
+            _index_files(path) == before_extras[name] for name, path in extras.items()
+        ):
+            break
+        shutil.rmtree(tmp)
+    else:
+        raise RuntimeError(f"The index files of {persist_dir} kept changing; stop the writers and retry.")
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"{stamp}-{label}" if label else stamp
+    while (root / name).exists():
+        name = f"{name}-{uuid.uuid4().hex[:4]}"
+    manifest = {
+        "name": name,
+        "created": time.time(),
+        "source": str(source.resolve()),
+        "extra_dirs": {extra: str(path.resolve()) for extra, path in extras.items()},
+        "collections": collection_names(str(tmp)),
+        "files": files,
+        "bytes": dir_size(str(tmp)),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    with open(tmp / MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, root / name)
+    pruned = prune_snapshots(snapshot_dir, keep) if keep is not None else []
+    return {**manifest, "path": str(root / name), "pruned": pruned}
+
+
+def _restore_dir(source: Path, target: Path, methods: dict[str, int], skip: Optional[str] = None) -> None:
+    """Clone the files of `source` (but its top-level `skip` folder) into a new folder that replaces `target`."""
+    tmp = target.with_name(f".{target.name}.restore-{uuid.uuid4().hex}")
+    tmp.mkdir(parents=True)
+    for path in source.rglob("*"):
+        rel = path.relative_to(source)
+        if not path.is_file() or path.name == MANIFEST or rel.parts[0] == skip:
+            continue
+        dst = tmp / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        method = clone_file(str(path), str(dst))
+        methods[method] = methods.get(method, 0) + 1
+    old = target.with_name(f".{target.name}.old-{uuid.uuid4().hex}")
+    if target.exists():
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def restore(snapshot_path: str, persist_dir: str, extra_dirs: Optional[list[str]] = None) -> dict[str, Any]:
+    """
+    Put a snapshot back in `persist_dir`. The files are cloned (copy-on-write
+    where possible, never hard-linked: Chroma rewrites index files in place
+    and that would change the snapshot) into a folder next to `persist_dir`,
+    which then replaces it with two renames.
+
+    The extra directories of the snapshot are put back the same way, where
+    they were taken from or, with `extra_dirs`, at the path of that list
+    with the same folder name. Directories of `extra_dirs` that exist but
+    are not in the snapshot are left alone and returned in `stale`: they no
+    longer match the database.
+
+    Close the Chroma clients of `persist_dir` first; in the same process,
+    `chromadb.api.client.SharedSystemClient.clear_system_cache()` drops them.
+    """
+    snapshot_root = Path(snapshot_path)
+    if not (snapshot_root / MANIFEST).exists():
+        raise FileNotFoundError(f"{snapshot_path} is not a snapshot.")
+    with open(snapshot_root / MANIFEST, encoding="utf-8") as f:
+        saved = json.load(f).get("extra_dirs", {})
+    targets = {name: Path(path) for name, path in saved.items()}
+    if extra_dirs is not None:
+        targets = {Path(d).name: Path(d) for d in extra_dirs}
+    t0 = time.perf_counter()
+    methods: dict[str, int] = {}
+    _restore_dir(snapshot_root, Path(persist_dir), methods, skip=EXTRA_DIR)
+    restored = []
+    for name, target in targets.items():
+        if name in saved:
+            _restore_dir(snapshot_root / EXTRA_DIR / name, target, methods)
+            restored.append(str(target))
+    return {
+        "snapshot": str(snapshot_root),
+        "files": methods,
+        "extra_dirs": restored,
+        "stale": [str(target) for name, target in targets.items() if name not in saved and target.exists()],
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+
+
+def rebuild_collection(
+    client: Any, name: str, page_size: int = COPY_PAGE, hnsw: Optional[HNSWParams] = None
+) -> dict[str, Any]:
+    """
+    Rebuild the HNSW index of a collection from the vectors Chroma already
+    stores: records are copied page by page (ids, embeddings, documents,
+    metadata; nothing is re-embedded) into a new collection with the same
+    configuration, which then takes the old one's name. Deleted records are
+    left behind, so this also compacts the index. With `hnsw`, the new index
+    is built with those parameters instead (the only way to change M and
+    construction ef of an existing collection).
+
+    The collection id changes; LangChain's Chroma finds collections by name.
+    If the copy fails, the original collection is untouched.
+    """
+    t0 = time.perf_counter()
+    collection = client.get_collection(name)
+    configuration = collection.configuration
+    metadata = collection.metadata
+    index = {"hnsw": configuration.get("hnsw"), "spann": configuration.get("spann")}
+    if hnsw is not None:
+        metadata = {**{k: v for k, v in (metadata or {}).items() if not k.startswith("hnsw:")}, **hnsw.metadata()}
+        index = hnsw.configuration()
+    new = client.create_collection(
+        f"{name}{REBUILD_SUFFIX}",
+        metadata=metadata,
+        configuration=index,
+        embedding_function=configuration.get("embedding_function"),
+    )
+    try:
+        count = collection.count()
+        for offset in range(0, count, page_size):
+            page = collection.get(include=["embeddings", "documents", "metadatas", "uris"],
+                                  limit=page_size, offset=offset)
+            new.add(ids=page["ids"], embeddings=page["embeddings"], documents=page["documents"],
+                    metadatas=page["metadatas"], uris=page["uris"] if any(page["uris"] or []) else None)
+    except BaseException:
+        client.delete_collection(new.name)
+        raise
+    client.delete_collection(name)
+    new.modify(name=name)
+    return {"collection": name, "records": count, "hnsw": HNSWParams.of(new),
+            "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def remove_orphan_segments(persist_dir: str) -> list[str]:
+    """Delete segment folders of collections that no longer exist (Chroma leaves them behind)."""
+    root = Path(persist_dir)
+    db = sqlite3.connect(f"file:{root / SQLITE_FILE}?mode=ro", uri=True)
+    try:
+        segments = {segment_id for (segment_id,) in db.execute("SELECT id FROM segments")}
+    finally:
+        db.close()
+    removed = []
+    for path in root.iterdir():
+        if path.is_dir() and path.name not in segments:
+            shutil.rmtree(path)
+            removed.append(path.name)
+    return removed
+
+
+def vacuum(persist_dir: str) -> None:
+    """Give the pages freed by deletes back to the filesystem. No client may have the database open."""
+    db = sqlite3.connect(Path(persist_dir) / SQLITE_FILE)
+    try:
+        db.execute("VACUUM")
+    finally:
+        db.close()
+
+
+def compact(persist_dir: str, collections: Optional[list[str]] = None) -> dict[str, Any]:
+    """
+    Reclaim the space left by deletes: rebuild the index of `collections`
+    (all by default), delete orphaned segment folders and VACUUM SQLite.
+    Take a snapshot first; no other client may use the database meanwhile.
+    """
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+
+    t0 = time.perf_counter()
+    bytes_before = dir_size(persist_dir)
+    client = chromadb.PersistentClient(path=persist_dir)
+    rebuilt = [rebuild_collection(client, name) for name in collections or collection_names(persist_dir)]
+    del client
+    SharedSystemClient.clear_system_cache()  # closes the database before VACUUM
+    removed = remove_orphan_segments(persist_dir)
+    vacuum(persist_dir)
+    return {
+        "collections": rebuilt,
+        "orphan_segments": removed,
+        "bytes_before": bytes_before,
+        "bytes_after": dir_size(persist_dir),
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
@@ -0,0 +1,261 @@
+# metadata_index.py
+from __future__ import annotations
+
+import operator
+from collections import defaultdict
+from functools import reduce
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from utils.retrieval_cache import collection_version
+
+# ---- Config ----
+ARRAY_LIMIT = 4_096   # a container switches from sorted array to bitset above this many ids
+EXPORT_PAGE = 5_000   # metadatas read per call when indexing a Chroma collection
+RANGE_OPS = ("$gt", "$gte", "$lt", "$lte")
+
+
+def _bits(container: np.ndarray) -> np.ndarray:
+    """Container as a 65536-bit bitset (8192 uint8, little bit order)."""
+    if container.dtype == np.uint8:
+        return container
+    dense = np.zeros(1 << 16, dtype=bool)
+    dense[container] = True
+    return np.packbits(dense, bitorder="little")
+
+
+def _contains(container: np.ndarray, values: np.ndarray) -> np.ndarray:
+    if container.dtype == np.uint8:
+        return ((container[values >> 3] >> (values & 7).astype(np.uint8)) & 1).astype(bool)
+    return np.isin(values, container, assume_unique=True)
+
+
+def _compact(container: np.ndarray) -> np.ndarray:
+    """Sorted uint16 array while sparse, bitset when dense."""
+    if container.dtype == np.uint8:
+        values = np.flatnonzero(np.unpackbits(container, bitorder="little")).astype(np.uint16)
+        return values if len(values) <= ARRAY_LIMIT else container
+    return container if len(container) <= ARRAY_LIMIT else _bits(container)
+
+
+def _term(value: Any) -> tuple[bool, Any]:
+    """
+    Posting key of a metadata value. Booleans are kept apart from numbers
+    (True == 1 in Python, not in Chroma); 1 and 1.0 stay equal, as in Chroma.
+    """
+    return isinstance(value, bool), value
+
+
+def _cardinality(container: np.ndarray) -> int:
+    if container.dtype == np.uint8:
+        return int(np.unpackbits(container).sum())
+    return len(container)
+
+
+class Bitmap:
+    """
+    Roaring-style compressed set of row ids: ids are grouped by their high
+    16 bits and each group (container) is a sorted uint16 array while it has
+    at most 4096 ids, or a 65536-bit bitset (8 KB) when denser. Set algebra
+    works container by container.
+    """
+
+    __slots__ = ("containers",)
+
+    def __init__(self, containers: Optional[dict[int, np.ndarray]] = None):
+        self.containers = containers or {}
+
+    @classmethod
+    def from_sorted(cls, ids: Iterable[int] | np.ndarray) -> "Bitmap":
+        ids = np.asarray(ids, dtype=np.uint32)
+        if len(ids) == 0:
+            return cls()
+        high = ids >> 16
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(high)) + 1))
+        ends = np.append(starts[1:], len(ids))
+        return cls({
+            int(high[s]): _compact((ids[s:e] & 0xFFFF).astype(np.uint16)) for s, e in zip(starts, ends)
+        })
+
+    @classmethod
+    def from_range(cls, n: int) -> "Bitmap":
+        return cls.from_sorted(np.arange(n, dtype=np.uint32))
+
+    def to_array(self) -> np.ndarray:
+        """Sorted int64 row ids."""
+        parts = [
+            (high << 16) + (np.flatnonzero(np.unpackbits(c, bitorder="little")) if c.dtype == np.uint8
+                            else c.astype(np.int64))
+            for high, c in sorted(self.containers.items())
+        ]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return sum(_cardinality(c) for c in self.containers.values())
+
+    def __contains__(self, row: int) -> bool:
+        container = self.containers.get(row >> 16)
+        return container is not None and bool(_contains(container, np.array([row & 0xFFFF], np.uint16))[0])
+
+    def _merge(self, other: "Bitmap", keys: Iterable[int], fn) -> "Bitmap":
+        result = {}
+        for high in keys:
+            container = fn(self.containers.get(high), other.containers.get(high))
+            if container is not None and _cardinality(container):
+                result[high] = container
+        return Bitmap(result)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        def both(a, b):
+            if a.dtype == np.uint8 and b.dtype == np.uint8:
+                return _compact(a & b)
+            if a.dtype == np.uint8:
+                a, b = b, a
+            return a[_contains(b, a)]  # a is a sorted array
+        return self._merge(other, self.containers.keys() & other.containers.keys(), both)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        def either(a, b):
+            if a is None or b is None:
+                return a if b is None else b
+            if a.dtype == np.uint16 and b.dtype == np.uint16:
+                return _compact(np.union1d(a, b))
+            return _bits(a) | _bits(b)
+        return self._merge(other, self.containers.keys() | other.containers.keys(), either)
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        def minus(a, b):
+            if b is None:
+                return a
+            if a.dtype == np.uint16:
+                return a[~_contains(b, a)]
+            return _compact(a & ~_bits(b))
+        return self._merge(other, self.containers.keys(), minus)
+
+    def __repr__(self) -> str:
+        return f"Bitmap({len(self)} ids, {len(self.containers)} containers)"
+
+
+class MetadataIndex:
+    """
+    Inverted index over chunk metadata, built once: a Bitmap of row
+    positions per (key, value) and, for numeric keys, the values sorted once
+    together with their rows so a range is two binary searches.
+
+    `where` evaluates a Chroma-style filter ({"key": value}, $eq, $ne, $gt,
+    $gte, $lt, $lte, $in, $nin, $and, $or) to the matching rows, so a store
+    scores only those rows and a selective filter is cheap.
+    """
+
+    def __init__(self, metadatas: list[Optional[dict]], ids: Optional[list[str]] = None, version: Any = None):
+        self.ids = ids
+        self.version = version
+        self.size = len(metadatas)
+        postings: dict[str, dict[Any, list[int]]] = defaultdict(lambda: defaultdict(list))
+        numeric: dict[str, tuple[list[float], list[int]]] = defaultdict(lambda: ([], []))
+        for row, metadata in enumerate(metadatas):
+            for key, value in (metadata or {}).items():
+                postings[key][_term(value)].append(row)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numeric[key][0].append(value)
+                    numeric[key][1].append(row)
+        self.bitmaps = {
+            key: {value: Bitmap.from_sorted(rows) for value, rows in values.items()}
+            for key, values in postings.items()
+        }
+        self.present = {
+            key: Bitmap.from_sorted(np.sort(np.concatenate([np.asarray(rows) for rows in values.values()])))
+            for key, values in postings.items()
+        }
+        self.numeric = {}
+        for key, (values, rows) in numeric.items():
+            values = np.asarray(values, dtype=np.float64)
+            order = np.argsort(values, kind="stable")
+            self.numeric[key] = (values[order], np.asarray(rows, dtype=np.int64)[order])
+
+    @classmethod
+    def from_chroma(cls, collection: Any) -> "MetadataIndex":
+        """Index the metadatas of a chromadb collection, page by page; row i is ids[i]."""
+        version = collection_version(collection)  # before reading: a write meanwhile makes the index stale
+        ids, metadatas = [], []
+        for offset in range(0, collection.count(), EXPORT_PAGE):
+            page = collection.get(include=["metadatas"], limit=EXPORT_PAGE, offset=offset)
+            ids += page["ids"]
+            metadatas += page["metadatas"]
+        return cls(metadatas, ids, version)
+
+    # ---- Filters ----
+    def where(self, where: Optional[dict]) -> Bitmap:
+        """Rows matching a Chroma-style `where` filter; all rows for an empty filter."""
+        if not where:
+            return Bitmap.from_range(self.size)
+        parts = []
+        for key, condition in where.items():
+            if key == "$and":
+                parts.append(reduce(operator.and_, [self.where(c) for c in condition]))
+            elif key == "$or":
+                parts.append(reduce(operator.or_, [self.where(c) for c in condition]))
+            else:
+                parts.append(self._condition(key, condition))
+        return reduce(operator.and_, parts)
+
+    def rows(self, where: Optional[dict]) -> np.ndarray:
+        return self.where(where).to_array()
+
+    def _equal(self, key: str, value: Any) -> Bitmap:
+        return self.bitmaps.get(key, {}).get(_term(value), Bitmap())
+
+    def _condition(self, key: str, condition: Any) -> Bitmap:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        parts = []
+        for op, value in condition.items():
+            if op == "$eq":
+                parts.append(self._equal(key, value))
+            elif op == "$ne":
+                parts.append(self.present.get(key, Bitmap()) - self._equal(key, value))
+            elif op == "$in":
+                parts.append(reduce(operator.or_, [self._equal(key, v) for v in value], Bitmap()))
+            elif op == "$nin":
+                excluded = reduce(operator.or_, [self._equal(key, v) for v in value], Bitmap())
+                parts.append(self.present.get(key, Bitmap()) - excluded)
+            elif op in RANGE_OPS:
+                parts.append(self._range(key, op, value))
+            else:
+                raise ValueError(f"Unsupported operator {op!r} for key {key!r}.")
+        return reduce(operator.and_, parts)
+
+    def _range(self, key: str, op: str, value: float) -> Bitmap:
+        if key not in self.numeric:
+            return Bitmap()
+        values, rows = self.numeric[key]
+        if op in ("$gt", "$gte"):
+            start = np.searchsorted(values, value, side="right" if op == "$gt" else "left")
+            selected = rows[start:]
+        else:
+            end = np.searchsorted(values, value, side="left" if op == "$lt" else "right")
+            selected = rows[:end]
+        return Bitmap.from_sorted(np.sort(selected))
+
+    # ---- Chroma ----
+    def query(self, collection: Any, where: Optional[dict] = None, n_results: int = 10, **kwargs: Any) -> dict:
+        """
+        collection.query() restricted to the ids matching `where`, resolved
+        here instead of by Chroma's generic metadata filter. The index is
+        rebuilt first if the collection was written to since it was built
+        (`collection_version`: for an in-memory collection only a change of
+        size is seen, rebuild with `from_chroma` after other writes).
+        """
+        if self.ids is None:
+            raise ValueError("Build the index with MetadataIndex.from_chroma() to query a collection.")
+        if not where:
+            return collection.query(n_results=n_results, **kwargs)
+        if collection_version(collection) != self.version:
+            self.__dict__.update(MetadataIndex.from_chroma(collection).__dict__)
+        rows = self.rows(where)
+        if len(rows) == 0:
+            queries = kwargs.get("query_embeddings", kwargs.get("query_texts"))
+            n_queries = 1 if isinstance(queries, str) else len(queries)
+            return {key: [[] for _ in range(n_queries)] for key in ("ids", "documents", "metadatas", "distances")}
+        return collection.query(ids=[self.ids[i] for i in rows], n_results=min(n_results, len(rows)), **kwargs)
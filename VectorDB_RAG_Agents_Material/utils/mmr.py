@@ -0,0 +1,114 @@
+# mmr.py
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+def mmr_batch(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    k: int = 4,
+    lambda_mult: float = 0.5,
+    valid: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Maximal marginal relevance for m queries at once, same scoring as
+    LangChain: lambda_mult * sim(query) - (1 - lambda_mult) * max sim(selected),
+    cosine similarities; lambda_mult=1 is pure relevance, 0 pure diversity.
+
+    queries (m, d), candidates (m, n, d), valid (m, n) marks real candidates.
+    Returns (m, k) positions into each candidate list, -1 where none is left.
+
+    Each pick costs one batched matrix-vector product (similarity of all
+    candidates to the new pick) and an O(n) update of a running
+    max-similarity vector; the full candidate x candidate matrix is never
+    needed since only k of its n columns are ever read.
+    """
+    q = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+    c = np.asarray(candidates, dtype=np.float32)
+    c = _normalize(c if c.ndim == 3 else c[None])
+    m, n, _ = c.shape
+    k = min(k, n)
+    rows = np.arange(m)
+    taken = np.zeros((m, n), dtype=bool) if valid is None else ~np.asarray(valid, dtype=bool)
+
+    relevance = np.matmul(c, q[:, :, None])[..., 0]
+    chosen = np.full((m, k), -1, dtype=np.int64)
+    max_sim = None
+    for step in range(k):
+        score = relevance if max_sim is None else lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        score = np.where(taken, -np.inf, score)
+        pick = np.argmax(score, axis=1)
+        found = np.isfinite(score[rows, pick])
+        chosen[found, step] = pick[found]
+        taken[rows, pick] = True
+        # similarity of every candidate to the new pick (one column per query)
+        column = np.matmul(c, c[rows, pick][:, :, None])[..., 0]
+        max_sim = column if max_sim is None else np.maximum(max_sim, column)
+    return chosen
+
+
+def mmr(query: np.ndarray, candidates: np.ndarray, k: int = 4, lambda_mult: float = 0.5) -> list[int]:
+    """MMR for a single query: positions into `candidates` (n, d), in pick order."""
+    chosen = mmr_batch(np.asarray(query)[None], np.asarray(candidates)[None], k, lambda_mult)[0]
+    return chosen[chosen >= 0].tolist()
+
+
+def max_marginal_relevance_search_batch(
+    db_client: Any,
+    queries: list[str],
+    k: int = 4,
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+    filter: Optional[dict] = None,
+) -> list[list[Document]]:
+    """
+    MMR over a LangChain Chroma store for many queries: a single Chroma
+    query fetches the fetch_k candidates of every query with their
+    embeddings, then all queries are re-ranked together in NumPy.
+    """
+    if not queries:
+        return []
+    query_vectors = np.asarray([db_client.embeddings.embed_query(query) for query in queries], dtype=np.float32)
+    res = db_client._collection.query(
+        query_embeddings=query_vectors,
+        n_results=fetch_k,
+        where=filter,
+        include=["embeddings", "documents", "metadatas"],
+    )
+    n = max((len(ids) for ids in res["ids"]), default=0)
+    if n == 0:
+        return [[] for _ in queries]
+    candidates = np.zeros((len(queries), n, query_vectors.shape[1]), dtype=np.float32)
+    valid = np.zeros((len(queries), n), dtype=bool)
+    for i, vectors in enumerate(res["embeddings"]):
+        candidates[i, :len(vectors)] = vectors
+        valid[i, :len(vectors)] = True
+
+    chosen = mmr_batch(query_vectors, candidates, k, lambda_mult, valid)
+    return [
+        [
+            Document(id=res["ids"][i][j], page_content=res["documents"][i][j], metadata=res["metadatas"][i][j] or {})
+            for j in picks.tolist()
+            if j >= 0
+        ]
+        for i, picks in enumerate(chosen)
+    ]
+
+
+def max_marginal_relevance_search(
+    db_client: Any,
+    query: str,
+    k: int = 4,
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+    filter: Optional[dict] = None,
+) -> list[Document]:
+    return max_marginal_relevance_search_batch(db_client, [query], k, fetch_k, lambda_mult, filter)[0]
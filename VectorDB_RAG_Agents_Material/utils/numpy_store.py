@@ -0,0 +1,346 @@
+# numpy_store.py
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from utils.metadata_index import MetadataIndex
+from utils.mmr import mmr_batch
+
+# ---- Config ----
+METRICS = ("l2", "cosine", "ip")  # same meaning as Chroma's hnsw:space
+BLOCK_ROWS = 65_536               # rows scored at once
+EXPORT_PAGE = 5_000               # rows read per call when exporting from Chroma
+
+
+def distances(queries: np.ndarray, vectors: np.ndarray, norms: np.ndarray, metric: str) -> np.ndarray:
+    """
+    Distances (queries x rows) as Chroma reports them, from one GEMM.
+    """
+    dots = vectors @ queries.T
+    if metric == "l2":
+        return (norms[:, None] ** 2 - 2 * dots + np.sum(queries**2, axis=-1)).T
+    if metric == "cosine":
+        return (1 - dots / np.maximum(norms[:, None] * np.linalg.norm(queries, axis=-1), 1e-12)).T
+    return (1 - dots).T
+
+
+def blocks(n: int) -> Iterable[slice]:
+    for start in range(0, n, BLOCK_ROWS):
+        yield slice(start, min(start + BLOCK_ROWS, n))
+
+
+def row_ids(rows: slice | np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Map positions within a block of rows back to row indices."""
+    return rows[positions] if isinstance(rows, np.ndarray) else positions + rows.start
+
+
+def is_file_array(vectors: Any, path: Path) -> bool:
+    """
+    True if `vectors` is the whole float32 array of the .npy file at `path`
+    (a memmap of it, under any path: symlinks and relative paths included).
+    """
+    filename = getattr(vectors, "filename", None)
+    if not filename or not path.exists() or not os.path.exists(filename) or not os.path.samefile(filename, path):
+        return False
+    on_disk = np.load(path, mmap_mode="r")
+    return vectors.shape == on_disk.shape and vectors.dtype == np.float32 and vectors.flags.c_contiguous
+
+
+def smallest(values: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k smallest values along the last axis, sorted."""
+    k = min(k, values.shape[-1])
+    if k == 0:
+        return np.empty(values.shape[:-1] + (0,), dtype=np.int64)
+    idx = np.argpartition(values, k - 1, axis=-1)[..., :k]
+    order = np.argsort(np.take_along_axis(values, idx, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(idx, order, axis=-1)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact vector store: all embeddings in one contiguous float32 .npy file,
+    memory-mapped (opening it is instant), searched with a blocked matrix
+    multiply plus argpartition top-k. Many queries are answered in one pass.
+
+    Files in `path`: vectors.npy, norms.npy, docs.json, meta.json.
+    """
+
+    default_path = "db_numpy"
+
+    def __init__(self, path: str, embedding: Embeddings):
+        self.path = Path(path)
+        self.embedding = embedding
+        self._load()
+
+    def _load(self) -> None:
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.metric = meta["metric"]
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")  # stays on disk
+        self.norms = np.load(self.path / "norms.npy")
+        docs = json.loads((self.path / "docs.json").read_text(encoding="utf-8"))
+        self.ids = [doc["id"] for doc in docs]
+        self.texts = [doc["text"] for doc in docs]
+        self.metadatas = [doc["metadata"] for doc in docs]
+        self.metadata_index = MetadataIndex(self.metadatas)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    # ---- Build ----
+    @classmethod
+    def _write_files(
+        cls,
+        path: str,
+        vectors: np.ndarray,
+        texts: list[str],
+        metadatas: list[dict],
+        ids: list[str],
+        metric: str,
+        **meta: Any,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Write vectors.npy, norms.npy, docs.json and meta.json; returns (vectors memmap, norms)."""
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {METRICS}, got {metric!r}.")
+        out = Path(path)
+        out.mkdir(parents=True, exist_ok=True)
+        vectors_file = out / "vectors.npy"
+        if not is_file_array(vectors, vectors_file):
+            # written aside and renamed: `vectors` may be a memmap of part of the file being replaced
+            tmp = out / f"vectors.{uuid.uuid4().hex}.tmp.npy"
+            np.save(tmp, np.asarray(vectors, dtype=np.float32))
+            os.replace(tmp, vectors_file)
+        vectors = np.load(vectors_file, mmap_mode="r")
+
+        norms = np.empty(len(vectors), dtype=np.float32)
+        for rows in blocks(len(vectors)):
+            norms[rows] = np.linalg.norm(vectors[rows], axis=1)
+        np.save(out / "norms.npy", norms)
+        docs = [{"id": i, "text": t, "metadata": m or {}} for i, t, m in zip(ids, texts, metadatas)]
+        (out / "docs.json").write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+        (out / "meta.json").write_text(json.dumps({"metric": metric, "dim": vectors.shape[1], **meta}))
+        return vectors, norms
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        vectors: np.ndarray,
+        texts: list[str],
+        metadatas: list[dict],
+        ids: list[str],
+        embedding: Embeddings,
+        metric: str = "l2",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        """
+        Write the store from float32 vectors (an array or a .npy memmap) and open it.
+        """
+        cls._write_files(path, vectors, texts, metadatas, ids, metric)
+        return cls(path, embedding, **kwargs)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        path: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        vectors = np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        return cls.build(
+            path or cls.default_path, vectors, list(texts), metadatas or [{}] * len(texts), ids, embedding, **kwargs
+        )
+
+    @classmethod
+    def from_chroma(cls, db_client: Any, path: str, **kwargs: Any) -> "NumpyVectorStore":
+        """
+        Copy the vectors already stored in a LangChain Chroma store, page by
+        page, straight into vectors.npy: nothing is re-embedded.
+        """
+        collection = db_client._collection
+        metric = (collection.metadata or {}).get("hnsw:space", "l2")
+        n = collection.count()
+        Path(path).mkdir(parents=True, exist_ok=True)
+        vectors = None
+        ids, texts, metadatas = [], [], []
+        for offset in range(0, n, EXPORT_PAGE):
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=EXPORT_PAGE, offset=offset)
+            block = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(
+                    Path(path) / "vectors.npy", mode="w+", dtype=np.float32, shape=(n, block.shape[1])
+                )
+            vectors[offset:offset + len(block)] = block
+            ids += page["ids"]
+            texts += page["documents"]
+            metadatas += page["metadatas"]
+        if vectors is None:
+            raise ValueError("The Chroma collection is empty.")
+        vectors.flush()
+        return cls.build(path, vectors, texts, metadatas, ids, db_client.embeddings, metric=metric, **kwargs)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """
+        Append rows: vectors.npy is rewritten block by block into a new file,
+        fine for the small and medium collections this store is meant for.
+        """
+        texts = list(texts)
+        new = np.asarray(self.embedding.embed_documents(texts), dtype=np.float32)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        n = len(self.vectors)
+        tmp_file = self.path / "vectors.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_file, mode="w+", dtype=np.float32, shape=(n + len(new), new.shape[1]))
+        for rows in blocks(n):
+            grown[rows] = self.vectors[rows]
+        grown[n:] = new
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp_file, self.path / "vectors.npy")
+        np.save(self.path / "norms.npy", np.concatenate((self.norms, np.linalg.norm(new, axis=1))))
+        docs = [
+            {"id": i, "text": t, "metadata": m or {}}
+            for i, t, m in zip(self.ids + ids, self.texts + texts, self.metadatas + (metadatas or [{}] * len(texts)))
+        ]
+        (self.path / "docs.json").write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+        self._load()
+        return ids
+
+    # ---- Search ----
+    def _row_blocks(self, filter: Optional[dict]) -> Iterable[slice | np.ndarray]:
+        """
+        Rows to score, block by block: every row, or only the rows the
+        metadata index matches for `filter`, so cost follows selectivity.
+        """
+        if not filter:
+            yield from blocks(len(self.vectors))
+            return
+        rows = self.metadata_index.rows(filter)
+        for part in blocks(len(rows)):
+            yield rows[part]
+
+    def search_vectors(
+        self, queries: np.ndarray, k: int, filter: Optional[dict] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k for a batch of query vectors (m x d): row indices and
+        distances, both m x k and sorted. Missing results (filter) are inf.
+        `filter` is a Chroma-style where clause.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        best_idx = np.zeros((len(queries), 0), dtype=np.int64)
+        best = np.zeros((len(queries), 0), dtype=np.float32)
+        for rows in self._row_blocks(filter):
+            scores = distances(queries, np.asarray(self.vectors[rows]), self.norms[rows], self.metric)
+            top = smallest(scores, k)
+            best_idx = np.concatenate((best_idx, row_ids(rows, top)), axis=1)
+            best = np.concatenate((best, np.take_along_axis(scores, top, axis=1)), axis=1)
+            keep = smallest(best, k)
+            best_idx = np.take_along_axis(best_idx, keep, axis=1)
+            best = np.take_along_axis(best, keep, axis=1)
+        missing = k - best.shape[1]
+        if missing > 0:
+            best_idx = np.pad(best_idx, ((0, 0), (0, missing)))
+            best = np.pad(best, ((0, 0), (0, missing)), constant_values=np.inf)
+        return best_idx, best
+
+    def _documents(self, rows: np.ndarray, scores: np.ndarray) -> list[tuple[Document, float]]:
+        return [
+            (Document(id=self.ids[i], page_content=self.texts[i], metadata=self.metadatas[i]), float(score))
+            for i, score in zip(rows.tolist(), scores.tolist())
+            if np.isfinite(score)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        idx, scores = self.search_vectors(np.asarray(self.embedding.embed_query(query)), k, filter)
+        return self._documents(idx[0], scores[0])
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> list[Document]:
+        idx, scores = self.search_vectors(np.asarray(embedding), k, filter)
+        return [doc for doc, _ in self._documents(idx[0], scores[0])]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> list[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search_with_score_batch(
+        self, queries: list[str], k: int = 4, filter: Optional[dict] = None
+    ) -> list[list[tuple[Document, float]]]:
+        """Many queries, one pass over the matrix."""
+        vectors = np.asarray([self.embedding.embed_query(query) for query in queries])
+        idx, scores = self.search_vectors(vectors, k, filter)
+        return [self._documents(i, s) for i, s in zip(idx, scores)]
+
+    def similarity_search_batch(
+        self, queries: list[str], k: int = 4, filter: Optional[dict] = None
+    ) -> list[list[Document]]:
+        return [[doc for doc, _ in res] for res in self.similarity_search_with_score_batch(queries, k, filter)]
+
+    def max_marginal_relevance_search_batch(
+        self,
+        queries: list[str],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+    ) -> list[list[Document]]:
+        """MMR for many queries: one exact search for the candidates, one vectorized re-rank."""
+        vectors = np.asarray([self.embedding.embed_query(query) for query in queries])
+        return self._mmr(vectors, k, fetch_k, lambda_mult, filter)
+
+    def _mmr(
+        self, queries: np.ndarray, k: int, fetch_k: int, lambda_mult: float, filter: Optional[dict]
+    ) -> list[list[Document]]:
+        idx, scores = self.search_vectors(queries, fetch_k, filter)
+        valid = np.isfinite(scores)
+        chosen = mmr_batch(queries, np.asarray(self.vectors[idx]), k, lambda_mult, valid)
+        return [
+            [doc for doc, _ in self._documents(rows[picks[picks >= 0]], dist[picks[picks >= 0]])]
+            for rows, dist, picks in zip(idx, scores, chosen)
+        ]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return self._mmr(np.atleast_2d(np.asarray(embedding)), k, fetch_k, lambda_mult, filter)[0]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return self.max_marginal_relevance_search_batch([query], k, fetch_k, lambda_mult, filter)[0]
@@ -0,0 +1,176 @@
+# parallel_loader.py
+from __future__ import annotations
+
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+# ---- Config ----
+# file extension -> loader; anything else goes to UnstructuredLoader
+LOADER_BY_EXTENSION = {
+    ".pdf": "pypdf",
+    ".docx": "docx2txt",
+    ".md": "text",
+    ".txt": "text",
+}
+DEFAULT_LOADER = "unstructured"
+IN_FLIGHT_PER_WORKER = 2  # files queued per worker: keeps workers busy without listing results up front
+
+
+@dataclass
+class FileLoadResult:
+    """Outcome of loading one file: its documents, or the error that stopped it."""
+
+    path: str
+    loader: str
+    seconds: float = 0.0
+    documents: list[Document] = field(default_factory=list, repr=False)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _make_loader(loader: str, path: str) -> BaseLoader:
+    # imported in the worker, so optional loaders only matter for files that need them
+    if loader == "pypdf":
+        from langchain_community.document_loaders import PyPDFLoader
+        return PyPDFLoader(path)
+    if loader == "docx2txt":
+        from langchain_community.document_loaders import Docx2txtLoader
+        return Docx2txtLoader(path)
+    if loader == "text":
+        from langchain_community.document_loaders import TextLoader
+        return TextLoader(path, autodetect_encoding=True)
+    if loader == "unstructured":
+        from langchain_unstructured import UnstructuredLoader
+        return UnstructuredLoader(path)
+    raise ValueError(f"Unknown loader {loader!r}.")
+
+
+def load_file(path: str, loader: str) -> FileLoadResult:
+    """Load one file; never raises, a failure is returned in `error`."""
+    t0 = time.perf_counter()
+    try:
+        documents = _make_loader(loader, path).load()
+    except Exception as e:
+        return FileLoadResult(path, loader, time.perf_counter() - t0, error=f"{type(e).__name__}: {e}")
+    return FileLoadResult(path, loader, time.perf_counter() - t0, documents)
+
+
+class ParallelDirectoryLoader(BaseLoader):
+    """
+    Loads every file under `path` that matches `glob` on a process pool,
+    choosing the loader by extension (PyPDF, Docx2txt, Text, Unstructured).
+    Parsing PDFs and Office files is CPU-bound, so throughput grows with the
+    number of worker processes.
+
+    `lazy_load` yields each file's documents as soon as that file is done
+    (completion order, not directory order); only a few files per worker
+    are in flight. A file that fails is recorded in `results` with its
+    error and the other files go on loading. When a worker process dies
+    (e.g. a parser crash) the whole pool is broken and every file in flight
+    fails with it, so the pool is rebuilt and those files are retried one
+    at a time: only a file that breaks the pool again on its own gets the
+    error. `results` also has the load time of every file.
+
+    With `max_workers=1` the files are loaded in this process, no pool is
+    started. A pool re-imports the main module in every worker under the
+    spawn and forkserver start methods (Windows, macOS, newer Pythons), so
+    scripts that use more workers must create the loader under an
+    `if __name__ == "__main__":` guard.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        glob: str = "**/*",
+        max_workers: Optional[int] = None,
+        loaders: Optional[dict[str, str]] = None,
+        default_loader: Optional[str] = DEFAULT_LOADER,
+    ):
+        self.path = path
+        self.glob = glob
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.loaders = {**LOADER_BY_EXTENSION, **(loaders or {})}
+        self.default_loader = default_loader
+        self.results: list[FileLoadResult] = []
+
+    def files(self) -> Iterator[tuple[str, str]]:
+        """(path, loader) of every file to load; files without a loader are skipped."""
+        for path in sorted(Path(self.path).glob(self.glob)):
+            if not path.is_file():
+                continue
+            loader = self.loaders.get(path.suffix.lower(), self.default_loader)
+            if loader:
+                yield str(path), loader
+
+    @property
+    def errors(self) -> list[FileLoadResult]:
+        return [result for result in self.results if not result.ok]
+
+    def lazy_load_results(self) -> Iterator[FileLoadResult]:
+        """One FileLoadResult per file, as files finish."""
+        self.results = []
+        todo = self.files()
+        if self.max_workers <= 1:
+            for path, loader in todo:
+                result = load_file(path, loader)
+                self.results.append(FileLoadResult(result.path, result.loader, result.seconds, error=result.error))
+                yield result
+            return
+        max_in_flight = self.max_workers * IN_FLIGHT_PER_WORKER
+        executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        pending: dict[Future, tuple[str, str]] = {}
+        suspects: deque[tuple[str, str]] = deque()  # in flight when the pool broke: retried one at a time
+        try:
+            while True:
+                alone = bool(suspects)
+                broken = False
+                for path, loader in ([suspects.popleft()] if alone else todo):
+                    try:
+                        pending[executor.submit(load_file, path, loader)] = (path, loader)
+                    except BrokenProcessPool:  # a worker died since the last wait
+                        suspects.append((path, loader))
+                        broken = True
+                        break
+                    if len(pending) >= max_in_flight:
+                        break
+                if pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                elif broken:
+                    done = set()
+                else:
+                    return
+                for future in done:
+                    path, loader = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:  # a worker died (e.g. a parser crash)
+                        broken = True
+                        if not alone:  # any file in flight may be the culprit
+                            suspects.append((path, loader))
+                            continue
+                        result = FileLoadResult(path, loader, error=f"{type(e).__name__}: {e}")
+                    self.results.append(FileLoadResult(result.path, result.loader, result.seconds, error=result.error))
+                    yield result
+                if broken:  # the futures still pending fail too: retry them on a new pool
+                    suspects.extend(pending.values())
+                    pending.clear()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def lazy_load(self) -> Iterator[Document]:
+        for result in self.lazy_load_results():
+            yield from result.documents
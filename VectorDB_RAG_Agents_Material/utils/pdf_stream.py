@@ -0,0 +1,121 @@
+# pdf_stream.py
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterator, Optional
+
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
+
+# ---- Config ----
+PAGES_PER_RANGE = 32      # pages parsed by one PdfReader before it is dropped
+IN_FLIGHT_PER_WORKER = 2  # page ranges queued per worker
+
+
+def page_count(path: str, password: Optional[str] = None) -> int:
+    import pypdf
+
+    return len(pypdf.PdfReader(path, password=password).pages)
+
+
+def iter_pages(
+    path: str, start: int, stop: int, password: Optional[str] = None, extraction_mode: str = "plain"
+) -> Iterator[tuple[int, str]]:
+    """
+    (page number, text) of pages start..stop-1, read with a fresh PdfReader:
+    the objects it resolves are released with it, so memory depends on the
+    range size and not on the length of the file.
+    """
+    import pypdf
+
+    reader = pypdf.PdfReader(path, password=password)
+    for i in range(start, stop):
+        yield i, reader.pages[i].extract_text(extraction_mode=extraction_mode).strip()
+
+
+def extract_pages(
+    path: str, start: int, stop: int, password: Optional[str] = None, extraction_mode: str = "plain"
+) -> list[tuple[int, str]]:
+    return list(iter_pages(path, start, stop, password, extraction_mode))
+
+
+class PDFPageStreamLoader(BaseLoader):
+    """
+    Lazy replacement for `PyPDFLoader(path).load()`: pages are yielded in
+    order as they are parsed, with a fresh PdfReader every `pages_per_range`
+    pages, so the splitter and embedder get the first chunks right away and
+    memory stays flat for any page count.
+
+    With `max_workers` > 1 the ranges are extracted in parallel by worker
+    processes (a few ranges per worker in flight) while this process streams
+    the first range itself. `mode="range"` yields one Document per page
+    range instead of one per page.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        pages_per_range: int = PAGES_PER_RANGE,
+        max_workers: int = 1,
+        mode: str = "page",
+        password: Optional[str] = None,
+        extraction_mode: str = "plain",
+    ):
+        if pages_per_range <= 0:
+            raise ValueError("pages_per_range must be greater than 0.")
+        if mode not in ("page", "range"):
+            raise ValueError("mode must be 'page' or 'range'.")
+        self.path = path
+        self.pages_per_range = pages_per_range
+        self.max_workers = max_workers
+        self.mode = mode
+        self.password = password
+        self.extraction_mode = extraction_mode
+
+    def _ranges(self, total_pages: int) -> Iterator[tuple[int, int]]:
+        for start in range(0, total_pages, self.pages_per_range):
+            yield start, min(start + self.pages_per_range, total_pages)
+
+    def _extracted_ranges(self, total_pages: int) -> Iterator[Iterator[tuple[int, str]]]:
+        """Page ranges in order, each an iterator of (page, text)."""
+        ranges = self._ranges(total_pages)
+        if self.max_workers <= 1:
+            for start, stop in ranges:
+                yield iter_pages(self.path, start, stop, self.password, self.extraction_mode)
+            return
+        first = next(ranges, None)
+        if first is None:
+            return
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            pending: deque[Future] = deque()
+
+            def submit() -> None:
+                for start, stop in ranges:
+                    pending.append(executor.submit(
+                        extract_pages, self.path, start, stop, self.password, self.extraction_mode
+                    ))
+                    if len(pending) >= self.max_workers * IN_FLIGHT_PER_WORKER:
+                        return
+
+            submit()
+            # the workers start on the next ranges while the first one streams from here
+            yield iter_pages(self.path, *first, self.password, self.extraction_mode)
+            while pending:
+                pages = pending.popleft().result()
+                submit()
+                yield iter(pages)
+
+    def lazy_load(self) -> Iterator[Document]:
+        total_pages = page_count(self.path, self.password)
+        metadata = {"source": self.path, "total_pages": total_pages}
+        for pages in self._extracted_ranges(total_pages):
+            if self.mode == "range":
+                pages = list(pages)
+                yield Document(
+                    page_content="\n".join(text for _, text in pages),
+                    metadata={**metadata, "page": pages[0][0], "last_page": pages[-1][0]},
+                )
+                continue
+            for page, text in pages:
+                yield Document(page_content=text, metadata={**metadata, "page": page})
@@ -0,0 +1,190 @@
+# quantized_store.py
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.numpy_store import NumpyVectorStore, blocks, distances, row_ids, smallest
+
+# ---- Config ----
+MODES = ("int8", "binary")
+OVERSAMPLE = {"int8": 4, "binary": 16}    # candidates per result re-scored in float32
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class QuantizedVectorStore(NumpyVectorStore):
+    """
+    Read-mostly vector store that keeps only compact codes in memory:
+    int8 scalar-quantized rows (4x smaller) or 1-bit sign codes (32x smaller).
+    Codes select `k * oversample` candidates, which are then re-scored with
+    the full-precision float32 vectors memory-mapped from disk.
+
+    Files in `path`: those of NumpyVectorStore plus codes.npy and quant.npz
+    (int8 scale/offset or binary thresholds).
+    """
+
+    default_path = "db_quantized"
+
+    def __init__(self, path: str, embedding: Embeddings, oversample: Optional[int] = None):
+        super().__init__(path, embedding)
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.mode = meta["mode"]
+        self.oversample = oversample or OVERSAMPLE[self.mode]
+        self.codes = np.load(self.path / "codes.npy")
+        self.quant = dict(np.load(self.path / "quant.npz"))
+
+    # ---- Build ----
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        vectors: np.ndarray,
+        texts: list[str],
+        metadatas: list[dict],
+        ids: list[str],
+        embedding: Embeddings,
+        mode: str = "int8",
+        metric: str = "l2",
+        **kwargs: Any,
+    ) -> "QuantizedVectorStore":
+        """
+        Write the store from float32 vectors (an array or a .npy memmap) and open it.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}.")
+        vectors, _ = cls._write_files(path, vectors, texts, metadatas, ids, metric, mode=mode)
+
+        n, dim = vectors.shape
+        low = np.full(dim, np.inf, dtype=np.float32)
+        high = np.full(dim, -np.inf, dtype=np.float32)
+        total = np.zeros(dim, dtype=np.float64)
+        for rows in blocks(n):
+            block = np.asarray(vectors[rows])
+            low = np.minimum(low, block.min(axis=0))
+            high = np.maximum(high, block.max(axis=0))
+            total += block.sum(axis=0)
+
+        if mode == "int8":
+            scale = np.where(high > low, (high - low) / 255, 1).astype(np.float32)
+            quant = {"scale": scale, "offset": (low + 128 * scale).astype(np.float32)}
+            codes = np.empty((n, dim), dtype=np.int8)
+        else:
+            quant = {"threshold": (total / max(n, 1)).astype(np.float32)}
+            codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+        for rows in blocks(n):
+            codes[rows] = cls._encode(np.asarray(vectors[rows]), mode, quant)
+
+        np.save(f"{path}/codes.npy", codes)
+        np.savez(f"{path}/quant.npz", **quant)
+        return cls(path, embedding, **kwargs)
+
+    @staticmethod
+    def _encode(block: np.ndarray, mode: str, quant: dict) -> np.ndarray:
+        if mode == "int8":
+            codes = np.rint((block - quant["offset"]) / quant["scale"])
+            return np.clip(codes, -128, 127).astype(np.int8)
+        return np.packbits(block > quant["threshold"], axis=1)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """
+        Append rows as NumpyVectorStore does, then quantize them with the
+        existing scale/offset (or thresholds) and append their codes. Values
+        outside the range seen at build time are clipped; after many adds
+        rebuild with build() or from_chroma() to refit the quantization.
+        """
+        n = len(self.vectors)
+        ids = super().add_texts(texts, metadatas, ids=ids, **kwargs)
+        new_codes = self._encode(np.asarray(self.vectors[n:]), self.mode, self.quant)
+        self.codes = np.concatenate((self.codes, new_codes))
+        np.save(self.path / "codes.npy", self.codes)
+        return ids
+
+    # ---- Search ----
+    def _candidate_scores(self, query: np.ndarray, rows: slice | np.ndarray) -> np.ndarray:
+        """Approximate distance (lower is better) from the in-memory codes."""
+        codes = self.codes[rows]
+        if self.mode == "binary":
+            qbits = self._encode(query[None, :], "binary", self.quant)[0]
+            return _POPCOUNT[codes ^ qbits].sum(axis=1, dtype=np.int32).astype(np.float32)
+        scaled = query * self.quant["scale"]
+        dots = codes.astype(np.float32) @ scaled + query @ self.quant["offset"]
+        norms = self.norms[rows]
+        if self.metric == "l2":
+            return norms**2 - 2 * dots
+        if self.metric == "cosine":
+            return -dots / np.maximum(norms, 1e-12)
+        return -dots
+
+    def search_vector(self, query: np.ndarray, k: int, filter: Optional[dict] = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Row indices and exact distances of the k nearest rows: candidates from
+        the codes, then float32 re-scoring of those candidates only.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        n_candidates = k * self.oversample
+        best_idx, best_score = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        for rows in self._row_blocks(filter):
+            scores = self._candidate_scores(query, rows)
+            top = smallest(scores, n_candidates)
+            best_idx = np.concatenate((best_idx, row_ids(rows, top)))
+            best_score = np.concatenate((best_score, scores[top]))
+            keep = smallest(best_score, n_candidates)
+            best_idx, best_score = best_idx[keep], best_score[keep]
+
+        candidates = np.sort(best_idx)  # sorted rows read the memmap sequentially
+        exact = distances(query[None, :], np.asarray(self.vectors[candidates]), self.norms[candidates], self.metric)[0]
+        top = smallest(exact, k)
+        return candidates[top], exact[top]
+
+    def search_vectors(
+        self, queries: np.ndarray, k: int, filter: Optional[dict] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Quantized search for each query; rows without a result are padded with inf."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        idx = np.zeros((len(queries), k), dtype=np.int64)
+        scores = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            rows, dist = self.search_vector(query, k, filter)
+            idx[i, :len(rows)], scores[i, :len(rows)] = rows, dist
+        return idx, scores
+
+    # ---- Reports ----
+    def memory_report(self) -> dict[str, Any]:
+        """Bytes kept in RAM for search vs. keeping all float32 vectors in RAM."""
+        float_bytes = self.vectors.size * 4
+        resident = self.codes.nbytes + self.norms.nbytes + sum(v.nbytes for v in self.quant.values())
+        return {
+            "mode": self.mode,
+            "vectors": len(self.codes),
+            "float32_bytes": float_bytes,
+            "resident_bytes": resident,
+            "saved_bytes": float_bytes - resident,
+            "compression": float_bytes / resident if resident else 0.0,
+        }
+
+    def exact_search(self, queries: np.ndarray, k: int) -> np.ndarray:
+        """Ground truth: the exact float32 top-k rows of each query."""
+        return NumpyVectorStore.search_vectors(self, queries, k)[0]
+
+    def recall_at_k(self, queries: list[str] | np.ndarray, k: int = 5) -> float:
+        """Mean share of the exact float32 top-k that the quantized search returns."""
+        if len(queries) and isinstance(queries[0], str):
+            queries = [self.embedding.embed_query(q) for q in queries]
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        exact = self.exact_search(queries, k)
+        hits = [
+            len(set(self.search_vector(q, k)[0].tolist()) & set(truth.tolist())) / k
+            for q, truth in zip(queries, exact)
+        ]
+        return float(np.mean(hits)) if hits else 0.0
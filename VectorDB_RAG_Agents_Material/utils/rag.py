@@ -0,0 +1,261 @@
+# rag.py
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from langchain_core.documents import Document
+
+from utils.answer_cache import SemanticAnswerCache, context_fingerprint, prompt_key
+
+# ---- Config ----
+CONCURRENCY = 8        # LLM calls in flight at once
+RETRIEVAL_BATCH = 64   # questions embedded and searched together
+TIMINGS_KEPT = 1_000   # per-call timings remembered by a RAGChat
+
+SYSTEM_PROMPT = (
+    "You are an expert assistant providing information strictly based on the context provided to you. "
+    "Your task is to answer questions or provide information only using the details given in the current context. "
+    "Do not reference any external knowledge or information not explicitly mentioned in the context. "
+    "If the context does not contain sufficient information to answer a question, "
+    "clearly state that the information is not available in the provided context."
+)
+STYLE_PROMPT = " You should answer in a {style} style and in {language} language."
+
+T = TypeVar("T")
+
+
+def system_message(style: Optional[str] = None, language: Optional[str] = None) -> tuple[str, str]:
+    system = SYSTEM_PROMPT
+    if style or language:
+        system += STYLE_PROMPT.format(style=style or "formal", language=language or "english")
+    return ("system", system)
+
+
+def human_message(user_query: str, docs: list[Document]) -> tuple[str, str]:
+    retrieved_docs_text_str = "\n".join(doc.page_content for doc in docs)
+    query_and_context = (
+        "These docs can help you with your questions. If you have no answer, simply say 'I do not know'."
+        f"Question: {user_query}\n"
+        f"Relevant docs: {retrieved_docs_text_str}"
+    )
+    return ("human", query_and_context)
+
+
+def build_messages(
+    user_query: str,
+    docs: list[Document],
+    style: Optional[str] = None,
+    language: Optional[str] = None,
+) -> list[tuple[str, str]]:
+    """System + human messages for a question and its retrieved chunks."""
+    return [system_message(style, language), human_message(user_query, docs)]
+
+
+@dataclass
+class ChatTiming:
+    """Latency of one call, in seconds from the start of the call."""
+
+    retrieval_seconds: float = 0.0
+    first_token_seconds: Optional[float] = None
+    total_seconds: float = 0.0
+    tokens: int = 0
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Run a coroutine from sync code, also where an event loop is already running (Jupyter)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+class RAGChat:
+    """
+    Retrieval-augmented chat over a retriever with `similarity_search` and
+    `similarity_search_batch` (e.g. CachedRetriever) and a LangChain chat
+    model.
+
+    The batch API embeds a batch of questions in one forward pass, retrieves
+    them with one vectorized search and runs the LLM calls concurrently
+    (at most `concurrency` in flight); the next batch is retrieved while
+    the LLM answers the current one. Answers come back in question order.
+
+    `stream`/`astream` yield the answer token by token. Every call records
+    retrieval time, time to first token and total latency in `timings`.
+
+    With a `context_packer` (e.g. utils/context_packing.ContextPacker) the
+    retrieved chunks are merged, de-duplicated and fitted into a token
+    budget before they go into the prompt.
+
+    With an `answer_cache` (utils/answer_cache.SemanticAnswerCache; needs a
+    retriever with `embed_query`, e.g. CachedRetriever) a question that is a
+    paraphrase of an earlier one and retrieves the same context gets the
+    earlier answer without calling the LLM.
+    """
+
+    def __init__(
+        self,
+        retriever: Any,
+        llm: Any,
+        concurrency: int = CONCURRENCY,
+        batch_size: int = RETRIEVAL_BATCH,
+        context_packer: Optional[Callable[[list[Document]], list[Document]]] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+    ):
+        self.retriever = retriever
+        self.llm = llm
+        self.context_packer = context_packer
+        self.answer_cache = answer_cache
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.timings: deque[ChatTiming] = deque(maxlen=TIMINGS_KEPT)
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag")
+
+    @property
+    def last_timing(self) -> Optional[ChatTiming]:
+        return self.timings[-1] if self.timings else None
+
+    def _retrieve(self, user_query: str, k: int) -> list[Document]:
+        docs = self.retriever.similarity_search(user_query, k=k)
+        return self.context_packer(docs) if self.context_packer else docs
+
+    def _retrieve_batch(self, questions: list[str], k: int) -> list[list[Document]]:
+        docs_batch = self.retriever.similarity_search_batch(questions, k)
+        return [self.context_packer(docs) for docs in docs_batch] if self.context_packer else docs_batch
+
+    def _cache_entry(self, user_query: str, docs: list[Document], k: int, prompt: dict) -> Optional[tuple]:
+        """(question vector, context fingerprint, prompt key, collection version) for the answer cache."""
+        if self.answer_cache is None:
+            return None
+        return (
+            self.retriever.embed_query(user_query),
+            context_fingerprint(docs),
+            prompt_key(k, **prompt),
+            getattr(self.retriever, "version", None),
+        )
+
+    def _cached_answer(self, entry: Optional[tuple]) -> Optional[str]:
+        return self.answer_cache.get(*entry) if entry else None
+
+    def _remember(self, entry: Optional[tuple], answer: str) -> None:
+        if entry:
+            vector, fingerprint, key, version = entry
+            self.answer_cache.put(vector, fingerprint, answer, key, version)
+
+    def chat(self, user_query: str, k: int = 5, **prompt: Optional[str]) -> str:
+        timing = ChatTiming()
+        t0 = time.perf_counter()
+        docs = self._retrieve(user_query, k)
+        timing.retrieval_seconds = time.perf_counter() - t0
+        entry = self._cache_entry(user_query, docs, k, prompt)
+        content = self._cached_answer(entry)
+        if content is None:
+            content = self.llm.invoke(build_messages(user_query, docs, **prompt)).content
+            self._remember(entry, content)
+        timing.total_seconds = timing.first_token_seconds = time.perf_counter() - t0
+        self.timings.append(timing)
+        return content
+
+    def stream(self, user_query: str, k: int = 5, **prompt: Optional[str]) -> Iterator[str]:
+        """
+        Yield the answer token by token as the model produces it. Retrieval
+        starts first and runs while the system prompt is assembled;
+        time-to-first-token and total latency go to `last_timing`.
+        """
+        timing = ChatTiming()
+        self.timings.append(timing)
+        t0 = time.perf_counter()
+        retrieval = self._executor.submit(self._retrieve, user_query, k)
+        system = system_message(**prompt)
+        docs = retrieval.result()
+        timing.retrieval_seconds = time.perf_counter() - t0
+        entry = self._cache_entry(user_query, docs, k, prompt)
+        cached = self._cached_answer(entry)
+        if cached is not None:
+            timing.first_token_seconds = timing.total_seconds = time.perf_counter() - t0
+            timing.tokens = 1
+            yield cached
+            return
+        tokens = []
+        for chunk in self.llm.stream([system, human_message(user_query, docs)]):
+            if not chunk.content:
+                continue
+            if timing.first_token_seconds is None:
+                timing.first_token_seconds = time.perf_counter() - t0
+            timing.tokens += 1
+            tokens.append(chunk.content)
+            yield chunk.content
+        timing.total_seconds = time.perf_counter() - t0
+        self._remember(entry, "".join(tokens))
+
+    async def astream(self, user_query: str, k: int = 5, **prompt: Optional[str]) -> AsyncIterator[str]:
+        timing = ChatTiming()
+        self.timings.append(timing)
+        t0 = time.perf_counter()
+        retrieval = asyncio.create_task(asyncio.to_thread(self._retrieve, user_query, k))
+        system = system_message(**prompt)
+        docs = await retrieval
+        timing.retrieval_seconds = time.perf_counter() - t0
+        entry = self._cache_entry(user_query, docs, k, prompt)
+        cached = self._cached_answer(entry)
+        if cached is not None:
+            timing.first_token_seconds = timing.total_seconds = time.perf_counter() - t0
+            timing.tokens = 1
+            yield cached
+            return
+        tokens = []
+        async for chunk in self.llm.astream([system, human_message(user_query, docs)]):
+            if not chunk.content:
+                continue
+            if timing.first_token_seconds is None:
+                timing.first_token_seconds = time.perf_counter() - t0
+            timing.tokens += 1
+            tokens.append(chunk.content)
+            yield chunk.content
+        timing.total_seconds = time.perf_counter() - t0
+        self._remember(entry, "".join(tokens))
+
+    async def achat(self, user_query: str, k: int = 5, **prompt: Optional[str]) -> str:
+        docs = await asyncio.to_thread(self._retrieve, user_query, k)
+        entry = self._cache_entry(user_query, docs, k, prompt)
+        cached = self._cached_answer(entry)
+        if cached is not None:
+            return cached
+        res = await self.llm.ainvoke(build_messages(user_query, docs, **prompt))
+        self._remember(entry, res.content)
+        return res.content
+
+    async def achat_batch(
+        self, questions: list[str], k: int = 5, concurrency: Optional[int] = None, **prompt: Optional[str]
+    ) -> list[str]:
+        semaphore = asyncio.Semaphore(concurrency or self.concurrency)
+
+        async def answer(question: str, docs: list[Document]) -> str:
+            entry = self._cache_entry(question, docs, k, prompt)
+            cached = self._cached_answer(entry)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                res = await self.llm.ainvoke(build_messages(question, docs, **prompt))
+            self._remember(entry, res.content)
+            return res.content
+
+        tasks = []
+        for start in range(0, len(questions), self.batch_size):
+            batch = questions[start:start + self.batch_size]
+            # runs in a thread: earlier batches keep talking to the LLM meanwhile
+            docs_batch = await asyncio.to_thread(self._retrieve_batch, batch, k)
+            tasks += [asyncio.create_task(answer(q, docs)) for q, docs in zip(batch, docs_batch)]
+        return list(await asyncio.gather(*tasks))
+
+    def chat_batch(
+        self, questions: list[str], k: int = 5, concurrency: Optional[int] = None, **prompt: Optional[str]
+    ) -> list[str]:
+        return run_sync(self.achat_batch(questions, k, concurrency, **prompt))
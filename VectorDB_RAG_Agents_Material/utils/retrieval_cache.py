@@ -0,0 +1,200 @@
+# retrieval_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from utils.embedding_cache import normalize_text
+
+# ---- Config ----
+EMBEDDING_ENTRIES = 10_000
+EMBEDDING_TTL = 24 * 3600  # seconds; a query vector only changes with the model
+RESULT_ENTRIES = 2_000
+RESULT_TTL = 3600          # seconds; also dropped as soon as the collection changes
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after being stored."""
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._data),
+        }
+
+
+def collection_version(db_client: Any) -> tuple:
+    """
+    Cheap fingerprint that changes whenever the collection is written to:
+    its size plus, for a persistent store, the modification times of the
+    files in the persist directory (SQLite and its write-ahead log). Takes a
+    LangChain Chroma store or a chromadb collection. An in-memory collection
+    only has its size, so a delete plus an add goes unnoticed there.
+    """
+    collection = getattr(db_client, "_collection", db_client)
+    version: tuple = (collection.count(),)
+    persist_directory = getattr(db_client, "_persist_directory", None)
+    if persist_directory is None and hasattr(collection, "_client"):
+        settings = collection._client.get_settings()
+        persist_directory = settings.persist_directory if settings.is_persistent else None
+    if persist_directory and os.path.isdir(persist_directory):
+        with os.scandir(persist_directory) as entries:
+            version += tuple(sorted((e.name, e.stat().st_mtime_ns) for e in entries if e.is_file()))
+    return version
+
+
+class CachedRetriever:
+    """
+    Two cache levels in front of a LangChain Chroma store:
+
+    1. query embeddings, keyed by the normalized query text;
+    2. retrieval results, keyed by (query embedding hash, k, filter,
+       collection version).
+
+    Asking the same question again, e.g. only with another style or
+    language in the prompt, skips both the embedding model and the search.
+    Results are dropped automatically when the collection changes.
+    """
+
+    def __init__(
+        self,
+        db_client: Any,
+        embedding_entries: int = EMBEDDING_ENTRIES,
+        embedding_ttl: Optional[float] = EMBEDDING_TTL,
+        result_entries: int = RESULT_ENTRIES,
+        result_ttl: Optional[float] = RESULT_TTL,
+    ):
+        self.db_client = db_client
+        self.embeddings = TTLCache(embedding_entries, embedding_ttl)
+        self.results = TTLCache(result_entries, result_ttl)
+        self.version: Optional[tuple] = None
+        self.invalidations = 0
+
+    def embed_queries(self, queries: list[str]) -> np.ndarray:
+        """
+        Query vectors (m x d). Cache misses are embedded together in one
+        batched forward pass (embed_documents; for sentence-transformers
+        models such as MiniLM a query and a document embed the same way).
+        """
+        keys = [normalize_text(query) for query in queries]
+        found = {key: self.embeddings.get(key) for key in dict.fromkeys(keys)}
+        missing = {key: query for key, query in zip(keys, queries) if found[key] is None}
+        if len(missing) == 1:
+            new = [self.db_client.embeddings.embed_query(*missing.values())]
+        else:
+            new = self.db_client.embeddings.embed_documents(list(missing.values())) if missing else []
+        for key, vector in zip(missing, np.asarray(new, dtype=np.float32)):
+            self.embeddings.put(key, vector)
+            found[key] = vector
+        return np.stack([found[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_queries([query])[0]
+
+    def _current_version(self) -> tuple:
+        version = collection_version(self.db_client)
+        if version != self.version:
+            if self.version is not None:
+                self.results.clear()
+                self.invalidations += 1
+            self.version = version
+        return version
+
+    def _search(self, vectors: np.ndarray, k: int, filter: Optional[dict]) -> list[list[tuple[Document, float]]]:
+        """One Chroma query for all the vectors."""
+        res = self.db_client._collection.query(
+            query_embeddings=vectors, n_results=k, where=filter, include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(id=doc_id, page_content=text, metadata=metadata or {}), distance)
+                for doc_id, text, metadata, distance in zip(*columns)
+            ]
+            for columns in zip(res["ids"], res["documents"], res["metadatas"], res["distances"])
+        ]
+
+    def similarity_search_with_score_batch(
+        self, queries: list[str], k: int = 4, filter: Optional[dict] = None
+    ) -> list[list[tuple[Document, float]]]:
+        """
+        Results for many queries: cached ones are reused, the others are
+        embedded in one batch and searched in one vectorized Chroma query.
+        """
+        vectors = self.embed_queries(queries)
+        version = self._current_version()
+        filter_key = json.dumps(filter, sort_keys=True, default=str)
+        keys = [(hashlib.sha256(v.tobytes()).hexdigest()[:32], k, filter_key, version) for v in vectors]
+        first: dict[tuple, int] = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+        results = {key: self.results.get(key) for key in first}
+        missing = [i for key, i in first.items() if results[key] is None]
+        if missing:
+            for i, found in zip(missing, self._search(vectors[missing], k, filter)):
+                self.results.put(keys[i], found)
+                results[keys[i]] = found
+        return [list(results[key]) for key in keys]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None
+    ) -> list[tuple[Document, float]]:
+        return self.similarity_search_with_score_batch([query], k, filter)[0]
+
+    def similarity_search_batch(
+        self, queries: list[str], k: int = 4, filter: Optional[dict] = None
+    ) -> list[list[Document]]:
+        return [[doc for doc, _ in res] for res in self.similarity_search_with_score_batch(queries, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None) -> list[Document]:
+        return self.similarity_search_batch([query], k, filter)[0]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "embeddings": self.embeddings.stats(),
+            "results": self.results.stats(),
+            "invalidations": self.invalidations,
+        }
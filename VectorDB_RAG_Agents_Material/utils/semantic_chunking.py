@@ -0,0 +1,207 @@
+# semantic_chunking.py
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import BaseDocumentTransformer, Document
+from langchain_core.embeddings import Embeddings
+
+# ---- Config ----
+SENTENCE_SPLIT = r"(?<=[.?!])\s+"
+BREAKPOINT_DEFAULTS = {"percentile": 95, "standard_deviation": 3, "interquartile": 1.5, "gradient": 95}
+MAX_BATCH_TOKENS = 100_000  # tokens per embedding request (OpenAI allows 300k)
+MAX_BATCH_TEXTS = 2_048     # texts per embedding request (OpenAI limit)
+
+
+def approx_tokens(text: str) -> int:
+    return len(text) // 4 + 1  # ~4 characters per token
+
+
+def token_batches(
+    texts: Sequence[str],
+    max_tokens: int = MAX_BATCH_TOKENS,
+    max_texts: int = MAX_BATCH_TEXTS,
+    count_tokens: Callable[[str], int] = approx_tokens,
+) -> list[slice]:
+    """Consecutive slices of `texts`, each as large as the token and text limits allow."""
+    batches = []
+    start = used = 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if i > start and (used + tokens > max_tokens or i - start >= max_texts):
+            batches.append(slice(start, i))
+            start, used = i, 0
+        used += tokens
+    if start < len(texts):
+        batches.append(slice(start, len(texts)))
+    return batches
+
+
+def embed_batched(
+    embeddings: Embeddings,
+    texts: Sequence[str],
+    on_request: Optional[Callable[[int], None]] = None,
+    **batch_kwargs: Any,
+) -> np.ndarray:
+    """
+    L2-normalized embeddings (n x d) of `texts`, in as few token-packed
+    requests as possible. `on_request(n_texts)` is called after every
+    embed_documents call.
+    """
+    vectors = []
+    for part in token_batches(texts, **batch_kwargs):
+        vectors.append(np.asarray(embeddings.embed_documents(list(texts[part])), dtype=np.float32))
+        if on_request is not None:
+            on_request(len(vectors[-1]))
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    matrix = np.concatenate(vectors)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def combine_sentences(sentences: list[str], buffer_size: int = 1) -> list[str]:
+    """Each sentence with `buffer_size` neighbours on both sides, as SemanticChunker embeds them."""
+    return [
+        " ".join(sentences[max(0, i - buffer_size):i + buffer_size + 1])
+        for i in range(len(sentences))
+    ]
+
+
+def sentence_distances(vectors: np.ndarray) -> np.ndarray:
+    """Cosine distance between each (normalized) sentence vector and the next."""
+    return 1.0 - np.einsum("ij,ij->i", vectors[:-1], vectors[1:])
+
+
+def breakpoints(distances: np.ndarray, threshold_type: str = "percentile", amount: Optional[float] = None) -> np.ndarray:
+    """Indices i after which a chunk ends (same rules as langchain_experimental's SemanticChunker)."""
+    if threshold_type not in BREAKPOINT_DEFAULTS:
+        raise ValueError(f"threshold_type must be one of {sorted(BREAKPOINT_DEFAULTS)}.")
+    amount = BREAKPOINT_DEFAULTS[threshold_type] if amount is None else amount
+    values = distances
+    if threshold_type == "percentile":
+        threshold = np.percentile(distances, amount)
+    elif threshold_type == "standard_deviation":
+        threshold = np.mean(distances) + amount * np.std(distances)
+    elif threshold_type == "interquartile":
+        q1, q3 = np.percentile(distances, [25, 75])
+        threshold = np.mean(distances) + amount * (q3 - q1)
+    else:
+        values = np.gradient(distances) if len(distances) > 1 else distances
+        threshold = np.percentile(values, amount)
+    return np.flatnonzero(values > threshold)
+
+
+class BatchedSemanticChunker(BaseDocumentTransformer):
+    """
+    Semantic chunking like `langchain_experimental`'s SemanticChunker
+    (sentences + buffer are embedded, a chunk ends where the distance to
+    the next sentence crosses a percentile / std / IQR / gradient
+    threshold), made cheap enough for whole books:
+
+    - the sentences of all documents are embedded together, in as few
+      token-packed requests as the API limits allow;
+    - distances and breakpoints are computed with NumPy on the whole matrix;
+    - `split_documents_with_embeddings` also returns one vector per chunk,
+      the normalized mean of its sentence vectors, so the chunks can be
+      stored without embedding them a second time. Pooled vectors are close
+      to, not equal to, embedding the chunk text itself.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        breakpoint_threshold_type: str = "percentile",
+        breakpoint_threshold_amount: Optional[float] = None,
+        buffer_size: int = 1,
+        sentence_split_regex: str = SENTENCE_SPLIT,
+        min_chunk_size: Optional[int] = None,
+        add_start_index: bool = False,
+        max_batch_tokens: int = MAX_BATCH_TOKENS,
+        max_batch_texts: int = MAX_BATCH_TEXTS,
+        count_tokens: Callable[[str], int] = approx_tokens,
+    ):
+        if breakpoint_threshold_type not in BREAKPOINT_DEFAULTS:
+            raise ValueError(f"breakpoint_threshold_type must be one of {sorted(BREAKPOINT_DEFAULTS)}.")
+        self.embeddings = embeddings
+        self.breakpoint_threshold_type = breakpoint_threshold_type
+        self.breakpoint_threshold_amount = breakpoint_threshold_amount
+        self.buffer_size = buffer_size
+        self.sentence_split_regex = sentence_split_regex
+        self.min_chunk_size = min_chunk_size
+        self.add_start_index = add_start_index
+        self.batch_kwargs = {"max_tokens": max_batch_tokens, "max_texts": max_batch_texts, "count_tokens": count_tokens}
+        # embed_documents calls made by the chunker; a caching wrapper may answer them without the provider
+        self.embedding_batches = self.embedded_texts = 0
+
+    def _count_batch(self, n_texts: int) -> None:
+        self.embedding_batches += 1
+        self.embedded_texts += n_texts
+
+    def _per_sentence(self, n_sentences: int) -> bool:
+        # SemanticChunker returns the sentences as they are when there are too few for a threshold
+        return n_sentences < 2 or (n_sentences == 2 and self.breakpoint_threshold_type == "gradient")
+
+    def _groups(self, vectors: np.ndarray) -> list[tuple[int, int]]:
+        """(first, last + 1) sentence of every chunk of one text."""
+        if self._per_sentence(len(vectors)):
+            return [(i, i + 1) for i in range(len(vectors))]
+        ends = breakpoints(sentence_distances(vectors), self.breakpoint_threshold_type,
+                           self.breakpoint_threshold_amount)
+        groups = []
+        start = 0
+        for end in (ends + 1).tolist() + [len(vectors)]:
+            if end <= start:
+                continue
+            groups.append((start, end))
+            start = end
+        return groups
+
+    def _chunk(self, texts: list[str], metadatas: list[dict]) -> tuple[list[Document], np.ndarray]:
+        sentences = [re.split(self.sentence_split_regex, text) for text in texts]
+        windows = [window for parts in sentences for window in combine_sentences(parts, self.buffer_size)]
+        vectors = embed_batched(self.embeddings, windows, self._count_batch, **self.batch_kwargs)
+
+        chunks: list[Document] = []
+        pooled: list[np.ndarray] = []
+        offset = 0
+        for text, parts, metadata in zip(texts, sentences, metadatas):
+            text_vectors = vectors[offset:offset + len(parts)]
+            offset += len(parts)
+            starts = [0] + [m.end() for m in re.finditer(self.sentence_split_regex, text)]
+            min_chunk_size = None if self._per_sentence(len(parts)) else self.min_chunk_size
+            first: Optional[int] = None  # first sentence of the chunk being built
+            for start, end in self._groups(text_vectors):
+                if first is None:
+                    first = start
+                content = " ".join(parts[first:end])
+                if min_chunk_size is not None and len(content) < min_chunk_size and end < len(parts):
+                    continue  # too small: merged with the next group
+                chunk_metadata = dict(metadata)
+                if self.add_start_index:
+                    chunk_metadata["start_index"] = starts[first]
+                chunks.append(Document(page_content=content, metadata=chunk_metadata))
+                mean = text_vectors[first:end].sum(axis=0)
+                pooled.append(mean / (np.linalg.norm(mean) or 1.0))
+                first = None
+        dim = vectors.shape[1] if vectors.size else 0
+        return chunks, np.stack(pooled) if pooled else np.empty((0, dim), dtype=np.float32)
+
+    def create_documents(self, texts: list[str], metadatas: Optional[list[dict]] = None) -> list[Document]:
+        return self._chunk(texts, metadatas or [{} for _ in texts])[0]
+
+    def split_text(self, text: str) -> list[str]:
+        return [doc.page_content for doc in self.create_documents([text])]
+
+    def split_documents(self, documents: Iterable[Document]) -> list[Document]:
+        return self.split_documents_with_embeddings(documents)[0]
+
+    def split_documents_with_embeddings(self, documents: Iterable[Document]) -> tuple[list[Document], np.ndarray]:
+        """Chunks and their pooled embeddings (chunks x d, L2-normalized), from one embedding pass."""
+        documents = list(documents)
+        return self._chunk([doc.page_content for doc in documents], [doc.metadata for doc in documents])
+
+    def transform_documents(self, documents: Sequence[Document], **kwargs: Any) -> list[Document]:
+        return self.split_documents(documents)
@@ -0,0 +1,190 @@
+# token_length.py
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+
+import numpy as np
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# ---- Config ----
+MAX_MEMO_ENTRIES = 200_000  # memo is cleared when it grows past this
+LOOKBACK_CHARS = 4_096      # how far behind the last match we search for a piece
+
+# text -> (word starts, word ends, tokens per word)
+Segmenter = Callable[[str], tuple[np.ndarray, np.ndarray, np.ndarray]]
+
+
+class _Document:
+    """Word spans and token prefix sums of one tokenized text."""
+
+    __slots__ = ("text", "starts", "ends", "cum", "cursor")
+
+    def __init__(self, text: str, starts: np.ndarray, ends: np.ndarray, counts: np.ndarray):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.cum = np.concatenate(([0], np.cumsum(counts)))
+        self.cursor = 0
+
+    @property
+    def n_tokens(self) -> int:
+        return int(self.cum[-1])
+
+    def span_tokens(self, start: int, end: int) -> Optional[int]:
+        """
+        Tokens of text[start:end], or None if a word crosses either boundary
+        (then the substring would not tokenize like the document does).
+        """
+        lo = int(np.searchsorted(self.starts, start, "left"))
+        hi = int(np.searchsorted(self.ends, end, "right"))
+        if hi < lo:
+            return None
+        if lo > 0 and self.ends[lo - 1] > start:
+            return None
+        if hi < self.starts.size and self.starts[hi] < end:
+            return None
+        return int(self.cum[hi] - self.cum[lo])
+
+
+def _group_words(offsets: np.ndarray, word_of_token: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    n = word_of_token.size
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    first = np.flatnonzero(np.r_[True, word_of_token[1:] != word_of_token[:-1]])
+    last = np.r_[first[1:], n] - 1
+    return offsets[first, 0], offsets[last, 1], last - first + 1
+
+
+class TokenLengthCounter:
+    """
+    Drop-in `length_function` for LangChain text splitters.
+
+    Returns exactly len(tokenizer.encode(text)), but each document is tokenized
+    once with offsets; pieces of it are answered from a prefix-sum array and
+    repeated pieces from a memo. Pieces whose edges cut through a word fall
+    back to a direct encode, so the splitter produces the same chunks.
+
+    So do pieces that end in whitespace: tiktoken pre-tokenizes whitespace
+    at the end of a string as one piece, while inside the document the same
+    run can be split between several, so the prefix sums would miscount it.
+    """
+
+    def __init__(
+        self,
+        count: Callable[[str], int],
+        segment: Segmenter,
+        lookback: int = LOOKBACK_CHARS,
+        max_memo: int = MAX_MEMO_ENTRIES,
+        name: str = "",
+    ):
+        self.name = name  # tokenizer name, identifies the counts (e.g. in cache keys)
+        self._count = count
+        self._segment = segment
+        self._n_special = count("")
+        self._doc: Optional[_Document] = None
+        self._memo: dict[str, int] = {}
+        self.lookback = lookback
+        self.max_memo = max_memo
+        self.calls = self.memo_hits = self.span_hits = self.encodes = 0
+
+    @classmethod
+    def from_hf_tokenizer(cls, tokenizer: Any, **kwargs) -> "TokenLengthCounter":
+        """
+        Works with `transformers` fast tokenizers and `tokenizers.Tokenizer`
+        (WordPiece / whitespace pre-tokenized models such as all-MiniLM-L6-v2).
+        """
+        backend = getattr(tokenizer, "backend_tokenizer", tokenizer)
+
+        def segment(text: str):
+            enc = backend.encode(text, add_special_tokens=False)
+            offsets = np.asarray(enc.offsets, dtype=np.int64).reshape(-1, 2)
+            word_ids = np.array([-1 if w is None else w for w in enc.word_ids], dtype=np.int64)
+            return _group_words(offsets, word_ids)
+
+        kwargs.setdefault("name", str(getattr(tokenizer, "name_or_path", "")))
+        return cls(lambda text: len(tokenizer.encode(text)), segment, **kwargs)
+
+    @classmethod
+    def from_tiktoken(cls, encoding: Any, **kwargs) -> "TokenLengthCounter":
+        """
+        Works with `tiktoken.Encoding` (or anything exposing encode,
+        decode_with_offsets and the pre-tokenization regex `_pat_str`).
+        """
+        import regex  # installed with tiktoken
+
+        pattern = regex.compile(encoding._pat_str)
+
+        def segment(text: str):
+            pieces = np.array([m.span() for m in pattern.finditer(text)], dtype=np.int64).reshape(-1, 2)
+            tokens = encoding.encode(text)
+            _, token_starts = encoding.decode_with_offsets(tokens)
+            piece_of_token = np.searchsorted(pieces[:, 0], token_starts, "right") - 1
+            counts = np.bincount(piece_of_token, minlength=len(pieces)).astype(np.int64)
+            return pieces[:, 0], pieces[:, 1], counts
+
+        kwargs.setdefault("name", str(getattr(encoding, "name", "")))
+        return cls(lambda text: len(encoding.encode(text)), segment, **kwargs)
+
+    def register(self, text: str) -> int:
+        """
+        Tokenize `text` once and make it the document pieces are looked up in.
+        """
+        self._doc = _Document(text, *self._segment(text))
+        self.encodes += 1
+        return self._doc.n_tokens + self._n_special
+
+    def __call__(self, text: str) -> int:
+        self.calls += 1
+        n = self._memo.get(text)
+        if n is not None:
+            self.memo_hits += 1
+            return n
+
+        n = self._from_document(text)
+        if len(self._memo) >= self.max_memo:
+            self._memo.clear()
+        self._memo[text] = n
+        return n
+
+    def _from_document(self, text: str) -> int:
+        doc = self._doc
+        start = -1
+        if doc is not None and len(text) <= len(doc.text):
+            start = doc.text.find(text, max(0, doc.cursor - self.lookback))
+        if start < 0:
+            # Not part of the current document: it becomes the new one
+            return self.register(text)
+
+        n = None if text[-1:].isspace() else doc.span_tokens(start, start + len(text))
+        if n is None:
+            self.encodes += 1
+            return self._count(text)
+        doc.cursor = start
+        self.span_hits += 1
+        return n + self._n_special
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "memo_hits": self.memo_hits,
+            "span_hits": self.span_hits,
+            "encodes": self.encodes,
+        }
+
+
+class TokenRecursiveTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    RecursiveCharacterTextSplitter measuring chunks with a TokenLengthCounter.
+    Each text is registered with the counter before it is split, so every
+    piece the splitter measures is answered from that text's prefix sums:
+    one encode per document instead of one per unmatched piece.
+    """
+
+    def __init__(self, length_function: TokenLengthCounter, **kwargs: Any):
+        super().__init__(length_function=length_function, **kwargs)
+        self.token_length = length_function
+
+    def split_text(self, text: str) -> list[str]:
+        self.token_length.register(text)
+        return super().split_text(text)
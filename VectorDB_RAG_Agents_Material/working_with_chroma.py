@@ -1,9 +1,145 @@
-import shutil
+"""
+Maintenance of the persisted Chroma database (`db/`), without re-embedding:
+
+    snapshot   consistent copy of db/ in db_snapshots/ (incremental: unchanged
+               index files are hard-linked to the previous snapshot)
+    list       snapshots, newest last
+    prune      delete all but the --keep newest snapshots
+    restore    put a snapshot (default: the latest) back in db/
+    compact    rebuild the HNSW indexes from the stored vectors, drop orphaned
+               segment folders and VACUUM SQLite: reclaims space after deletes
+    rebuild    rebuild the index of one collection from its stored vectors,
+               optionally with new --M / --construction-ef / --search-ef
+    search-ef  change the search ef of a collection (no rebuild needed)
+    clean      snapshot, then delete db/ (the default: what this script
+               used to do when run without arguments)
+
+The BM25 index of M07 (`db_bm25/`, see --extra-dir) holds the same chunks
+as db/, so snapshot and restore copy it together with db/ and clean deletes
+it too. compact and rebuild keep chunk ids, so it stays valid.
+
+compact, rebuild and clean take a snapshot first unless --no-snapshot is
+given. After each snapshot only the --keep newest are kept (default 5, 0
+keeps all). Stop notebooks and scripts that have db/ open before restore,
+compact, rebuild or clean.
+
+Run from anywhere:
+    python VectorDB_RAG_Agents_Material/working_with_chroma.py
+    python VectorDB_RAG_Agents_Material/working_with_chroma.py snapshot --label before-m07
+    python VectorDB_RAG_Agents_Material/working_with_chroma.py restore
+"""
+import argparse
+import dataclasses
 import os
+import shutil
+
+from utils.hnsw import HNSWParams, set_search_ef
+from utils.maintenance import (
+    KEEP_SNAPSHOTS,
+    compact,
+    dir_size,
+    list_snapshots,
+    prune_snapshots,
+    rebuild_collection,
+    restore,
+    snapshot,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PERSIST_DIR = os.path.join(HERE, "db")
+SNAPSHOT_DIR = os.path.join(HERE, "db_snapshots")
+EXTRA_DIRS = [os.path.join(HERE, "db_bm25")]  # derived from db/: snapshotted, restored and cleaned with it
+
+
+def take_snapshot(args: argparse.Namespace, label: str) -> None:
+    if args.no_snapshot or not os.path.exists(args.db):
+        return
+    manifest = snapshot(args.db, args.snapshots, label, extra_dirs=args.extra_dirs, keep=args.keep or None)
+    links = sum(f["method"] == "link" for f in manifest["files"].values())
+    extras = f", with {', '.join(manifest['extra_dirs'])}" if manifest["extra_dirs"] else ""
+    print(f"snapshot {manifest['name']}: {manifest['bytes'] / 2**20:.1f} MB, "
+          f"{len(manifest['files'])} index files ({links} hard-linked){extras}, {manifest['seconds']:.2f} s")
+    if manifest["pruned"]:
+        print(f"deleted {len(manifest['pruned'])} older snapshots: {', '.join(manifest['pruned'])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="clean",
+                        choices=["snapshot", "list", "prune", "restore", "compact", "rebuild", "search-ef", "clean"])
+    parser.add_argument("name", nargs="?", help="snapshot to restore (default: latest)")
+    parser.add_argument("--db", default=PERSIST_DIR)
+    parser.add_argument("--snapshots", default=SNAPSHOT_DIR)
+    parser.add_argument("--extra-dir", dest="extra_dirs", action="append",
+                        help="directory kept in step with db/, repeatable (default: db_bm25; '' for none)")
+    parser.add_argument("--label", help="suffix of the snapshot name")
+    parser.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS,
+                        help=f"number of newest snapshots to keep (default: {KEEP_SNAPSHOTS}; 0 keeps all)")
+    parser.add_argument("--collection", default="langchain", help="collection to rebuild or tune")
+    parser.add_argument("--M", type=int, help="HNSW links per node (rebuild)")
+    parser.add_argument("--construction-ef", type=int, help="HNSW ef at build time (rebuild)")
+    parser.add_argument("--search-ef", type=int, help="HNSW ef at query time (rebuild, search-ef)")
+    parser.add_argument("--no-snapshot", action="store_true", help="skip the snapshot before changing db/")
+    args = parser.parse_args()
+    args.extra_dirs = [d for d in (EXTRA_DIRS if args.extra_dirs is None else args.extra_dirs) if d]
+
+    if args.command == "snapshot":
+        args.no_snapshot = False
+        take_snapshot(args, args.label)
+    elif args.command == "list":
+        for m in list_snapshots(args.snapshots):
+            print(f"{m['name']:<32} {m['bytes'] / 2**20:>8.1f} MB  {', '.join(m['collections'])}")
+    elif args.command == "prune":
+        if args.keep < 1:
+            raise SystemExit("--keep must be at least 1 to prune.")
+        removed = prune_snapshots(args.snapshots, args.keep)
+        print(f"deleted {len(removed)} snapshots" + (f": {', '.join(removed)}" if removed else ""))
+    elif args.command == "restore":
+        snapshots = list_snapshots(args.snapshots)
+        chosen = [m for m in snapshots if m["name"] == args.name] if args.name else snapshots[-1:]
+        if not chosen:
+            raise SystemExit(f"No snapshot {args.name or ''} in {args.snapshots}.")
+        result = restore(chosen[0]["path"], args.db, extra_dirs=args.extra_dirs)
+        restored = " and ".join([args.db] + result["extra_dirs"])
+        print(f"restored {chosen[0]['name']} into {restored} in {result['seconds']:.2f} s ({result['files']})")
+        for path in result["stale"]:
+            print(f"warning: {path} is not in this snapshot and no longer matches {args.db}; "
+                  f"delete it and re-run M07 to rebuild it")
+    elif args.command == "compact":
+        take_snapshot(args, "before-compact")
+        result = compact(args.db)
+        print(f"compacted {len(result['collections'])} collections, "
+              f"{len(result['orphan_segments'])} orphaned segments removed: "
+              f"{result['bytes_before'] / 2**20:.1f} MB -> {result['bytes_after'] / 2**20:.1f} MB "
+              f"in {result['seconds']:.2f} s")
+    elif args.command == "rebuild":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=args.db)
+        changes = {name: value for name, value in [
+            ("M", args.M), ("construction_ef", args.construction_ef), ("search_ef", args.search_ef)
+        ] if value is not None}
+        hnsw = dataclasses.replace(HNSWParams.of(client.get_collection(args.collection)), **changes) if changes else None
+        take_snapshot(args, "before-rebuild")
+        result = rebuild_collection(client, args.collection, hnsw=hnsw)
+        print(f"rebuilt {result['collection']}: {result['records']} records in {result['seconds']:.2f} s, "
+              f"{result['hnsw']}")
+    elif args.command == "search-ef":
+        import chromadb
 
-PERSIST_DIR = os.path.abspath("./VectorDB_RAG_Agents_Material/db")
+        if args.search_ef is None:
+            raise SystemExit("--search-ef is required.")
+        collection = chromadb.PersistentClient(path=args.db).get_collection(args.collection)
+        set_search_ef(collection, args.search_ef)
+        print(f"{args.collection}: {HNSWParams.of(collection)}")
+    elif args.command == "clean":
+        take_snapshot(args, "before-clean")
+        size = 0
+        for path in [args.db, *args.extra_dirs]:
+            size += dir_size(path) if os.path.exists(path) else 0
+            shutil.rmtree(path, ignore_errors=True)
+        print(f"DB cleaned ({size / 2**20:.1f} MB)")
 
-if os.path.exists(PERSIST_DIR):
-    shutil.rmtree(PERSIST_DIR)
 
-print("DB cleaned")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
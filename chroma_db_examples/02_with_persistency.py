@@ -2,7 +2,14 @@ import chromadb
 
 client = chromadb.PersistentClient(path="platohedro.db")
 
-collection = client.get_or_create_collection(name="notas")
+# Parámetros del índice HNSW (solo se aplican al crear la colección):
+# M = vecinos por nodo, construction_ef / search_ef = candidatos al construir / al buscar
+collection = client.get_or_create_collection(
+    name="notas",
+    metadata={"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 100},
+)
+# search_ef se puede cambiar después (se aplica al cargar el índice)
+collection.modify(configuration={"hnsw": {"ef_search": 100}})
 
 collection.add(
     ids=["1", "2"],
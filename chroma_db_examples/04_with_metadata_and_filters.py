@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 import chromadb
 
 client = chromadb.PersistentClient(path="platohedro.db")
@@ -27,4 +29,25 @@ resultado = collection.query(
     where={"nivel": "intermedio"}
 )
 
-print(resultado)
\ No newline at end of file
+print(resultado)
+
+# Con muchos documentos y filtros selectivos conviene resolver el filtro
+# antes de buscar: un índice invertido guarda el conjunto de ids de cada
+# (clave, valor), el filtro se resuelve con intersecciones y uniones de
+# conjuntos, y la consulta solo compara los ids que lo cumplen
+indice = defaultdict(set)
+todo = collection.get(include=["metadatas"])
+for id_, metadata in zip(todo["ids"], todo["metadatas"]):
+    for clave, valor in (metadata or {}).items():
+        indice[(clave, valor)].add(id_)
+
+# nivel == "basico" AND tema IN ("python", "vectordb")
+candidatos = indice[("nivel", "basico")] & (indice[("tema", "python")] | indice[("tema", "vectordb")])
+
+resultado = collection.query(
+    query_texts="Quiero aprender python",
+    n_results=1,
+    ids=sorted(candidatos),
+)
+
+print(resultado)
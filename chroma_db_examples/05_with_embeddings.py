@@ -6,11 +6,16 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+from utils.embedding_cache import CachedEmbeddingFunction
+
 embedding_fn = OpenAIEmbeddingFunction(
     api_key=os.getenv('OPENAI_API_KEY'),
     model_name="text-embedding-3-small",
 )
 
+# Cache en disco por (modelo, texto): los textos ya vistos no llaman a la API
+cached_embeddings = CachedEmbeddingFunction(embedding_fn, model_name="text-embedding-3-small")
+
 client = chromadb.PersistentClient(path="platohedro.db")
 
 collection = client.get_or_create_collection(
@@ -18,18 +23,22 @@ collection = client.get_or_create_collection(
     embedding_function=embedding_fn
 )
 
+documentos = [
+    "ChromaDB permite búsqueda semántica",
+    "FastAPI es útil para exponer APIs de IA"
+]
+
 collection.add(
     ids=["1", "2"],
-    documents=[
-        "ChromaDB permite búsqueda semántica",
-        "FastAPI es útil para exponer APIs de IA"
-    ]
+    documents=documentos,
+    embeddings=cached_embeddings.embed_documents(documentos)
 )
 
 resultado = collection.query(
-    query_texts=["vector database"],
+    query_embeddings=[cached_embeddings.embed_query("vector database")],
     n_results=2,
     include=["documents", "metadatas", "embeddings"]
 )
 
-print(resultado)
\ No newline at end of file
+print(resultado)
+print(cached_embeddings.stats())
\ No newline at end of file
@@ -1,15 +1,6 @@
-def chunk_text(text, chunk_size=200, overlap=50):
-    words = text.split()
-    chunks = []
+import os
 
-    start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = words[start:end]
-        chunks.append(" ".join(chunk))
-        start += chunk_size - overlap
-
-    return chunks
+from utils.chunking import chunk_text, iter_file_chunks
 
 texto = """
 ChromaDB es una base de datos vectorial que permite almacenar embeddings...
@@ -22,3 +13,9 @@ chunks = chunk_text(texto, chunk_size=10, overlap=5)
 for i, c in enumerate(chunks):
     print(f"Chunk {i}:\n{c}\n")
 
+# Archivos grandes: chunking en streaming sobre mmap, sin cargar todo el texto
+ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "getting-started.md")
+for i, c in enumerate(iter_file_chunks(ruta, chunk_size=50, overlap=10)):
+    if i == 3:
+        break
+    print(f"Chunk {i} (archivo):\n{c}\n")
@@ -1,15 +1,6 @@
-def chunk_text(text, chunk_size=200, overlap=50):
-    words = text.split()
-    chunks = []
+import hashlib
 
-    start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = words[start:end]
-        chunks.append(" ".join(chunk))
-        start += chunk_size - overlap
-
-    return chunks
+from utils.chunking import char_offsets, chunk_text, iter_chunk_spans
 
 texto = """
 ChromaDB es una base de datos vectorial que permite almacenar embeddings...
@@ -31,17 +22,40 @@ client = chromadb.PersistentClient(path="platohedro.db")
 # 2) Crear o recuperar colección
 collection = client.get_or_create_collection(name="demo_chunking")
 
-collection.add(
-    ids=[f"doc1_chunk_{i}" for i in range(len(chunks))],
-    documents=chunks,
-    metadatas=[
-        {
-            "source": "doc1",
-            "chunk_id": i
-        }
-        for i in range(len(chunks))
-    ]
-)
+# 3) IDs deterministas: fuente + offset + hash del contenido.
+#    Re-ejecutar el script no duplica chunks ni vuelve a generar embeddings.
+def chunk_id(source, start, text):
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return f"{source}-{start}-{digest}"
+
+source = "doc1"
+# iter_chunk_spans da offsets en bytes; start_index (como en LangChain) va en caracteres
+starts = char_offsets(texto, [start for start, _ in iter_chunk_spans(texto, chunk_size=10, overlap=5)])
+ids = [chunk_id(source, start, c) for start, c in zip(starts, chunks)]
+
+# 4) Diff contra lo ya guardado: solo se agregan chunks nuevos o modificados
+existentes = set(collection.get(where={"source": source}, include=[])["ids"])
+nuevos = [i for i, id_ in enumerate(ids) if id_ not in existentes]
+obsoletos = list(existentes - set(ids))
+
+if obsoletos:
+    collection.delete(ids=obsoletos)
+
+if nuevos:
+    collection.add(
+        ids=[ids[i] for i in nuevos],
+        documents=[chunks[i] for i in nuevos],
+        metadatas=[
+            {
+                "source": source,
+                "chunk_id": i,
+                "start_index": starts[i]
+            }
+            for i in nuevos
+        ]
+    )
+
+print(f"Nuevos: {len(nuevos)} | Sin cambios: {len(ids) - len(nuevos)} | Eliminados: {len(obsoletos)}")
 
 resultado = collection.get(
     include=["documents", "metadatas", "embeddings"]
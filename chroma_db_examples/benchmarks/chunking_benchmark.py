@@ -0,0 +1,106 @@
+# chunking_benchmark.py
+"""
+Compara el chunk_text original (split + join) contra el chunker en streaming.
+
+Uso:
+    python -m chroma_db_examples.benchmarks.chunking_benchmark --sizes-mb 8 64 256
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from chroma_db_examples.utils.chunking import iter_chunk_spans, iter_chunk_texts, mapped_file
+
+
+def legacy_chunk_text(text, chunk_size=200, overlap=50):
+    words = text.split()
+    chunks = []
+
+    start = 0
+    while start < len(words):
+        end = start + chunk_size
+        chunk = words[start:end]
+        chunks.append(" ".join(chunk))
+        start += chunk_size - overlap
+
+    return chunks
+
+
+def make_corpus(path: Path, size_mb: int, seed: int = 0) -> None:
+    """
+    Escribe texto sintetico (palabras de 1-12 letras, saltos de linea) de ~size_mb MiB.
+    """
+    rng = np.random.default_rng(seed)
+    letters = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+    block = 1 << 20
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            data = letters[rng.integers(0, letters.size, block)]
+            data[rng.random(block) < 1 / 6] = ord(" ")
+            data[rng.random(block) < 1 / 80] = ord("\n")
+            f.write(data.tobytes())
+
+
+def measure(fn) -> tuple[float, float, int]:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    n_chunks = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, n_chunks
+
+
+def run_legacy(path: Path, chunk_size: int, overlap: int) -> int:
+    text = path.read_text(encoding="utf-8")
+    return len(legacy_chunk_text(text, chunk_size, overlap))
+
+
+def run_streaming(path: Path, chunk_size: int, overlap: int) -> int:
+    n_chunks = 0
+    with mapped_file(path) as buf:
+        for _ in iter_chunk_spans(buf, chunk_size, overlap):
+            n_chunks += 1
+    return n_chunks
+
+
+def run_streaming_texts(path: Path, chunk_size: int, overlap: int) -> int:
+    n_chunks = 0
+    with mapped_file(path) as buf:
+        for _ in iter_chunk_texts(buf, chunk_size, overlap):
+            n_chunks += 1
+    return n_chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--overlap", type=int, default=50)
+    parser.add_argument("--skip-legacy-above-mb", type=int, default=512)
+    args = parser.parse_args()
+
+    print(f"{'MiB':>6} {'metodo':>10} {'seg':>8} {'MiB/s':>8} {'pico MiB':>9} {'chunks':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes_mb:
+            path = Path(tmp) / f"corpus_{size_mb}.txt"
+            make_corpus(path, size_mb)
+            runs = [("spans", run_streaming), ("texts", run_streaming_texts)]
+            if size_mb <= args.skip_legacy_above_mb:
+                runs.insert(0, ("legacy", run_legacy))
+            for name, fn in runs:
+                elapsed, peak, n_chunks = measure(lambda: fn(path, args.chunk_size, args.overlap))
+                print(f"{size_mb:>6} {name:>10} {elapsed:>8.2f} {size_mb / elapsed:>8.1f} "
+                      f"{peak:>9.1f} {n_chunks:>10}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
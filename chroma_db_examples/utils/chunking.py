@@ -0,0 +1,202 @@
+# chunking.py
+from __future__ import annotations
+
+import mmap
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+import numpy as np
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+# ---- Config ----
+DEFAULT_BLOCK_SIZE = 1 << 22  # 4 MiB por bloque al buscar limites de palabras
+
+# Bytes que str.split() considera espacio en blanco dentro del rango ASCII
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x1C, 0x1D, 0x1E, 0x1F, 0x20]] = True
+# Y fuera de ASCII, en UTF-8 (\x85, \xa0, \u2000-\u200a, \u3000, ...): todos estan por debajo de U+3001
+_UNICODE_WHITESPACE = [chr(c).encode("utf-8") for c in range(0x80, 0x3001) if chr(c).isspace()]
+_UNICODE_LEADS = np.array(sorted({seq[0] for seq in _UNICODE_WHITESPACE}), dtype=np.uint8)
+
+
+def _check_params(chunk_size: int, overlap: int) -> int:
+    if chunk_size <= 0:
+        raise ValueError("chunk_size debe ser mayor que 0.")
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap debe estar entre 0 y chunk_size - 1.")
+    return chunk_size - overlap
+
+
+def _as_bytes(data: Union[str, Buffer]) -> Buffer:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+def whitespace_mask(block: np.ndarray) -> np.ndarray:
+    """
+    True en cada byte que forma parte de un espacio en blanco segun str.split(),
+    incluidos los espacios Unicode de varios bytes. Una secuencia cortada al
+    final del bloque no se marca: queda pegada a la ultima palabra, que
+    iter_word_spans vuelve a leer en el bloque siguiente.
+    """
+    mask = _WHITESPACE[block]
+    candidates = np.flatnonzero(np.isin(block, _UNICODE_LEADS))
+    for seq in _UNICODE_WHITESPACE:
+        found = candidates[(block[candidates] == seq[0]) & (candidates + len(seq) <= block.size)]
+        for j in range(1, len(seq)):
+            found = found[block[found + j] == seq[j]]
+        for j in range(len(seq)):
+            mask[found + j] = True
+    return mask
+
+
+def word_spans(block: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Devuelve (starts, ends) de cada palabra dentro de un bloque de bytes uint8.
+    Vectorizado: una sola pasada con NumPy, sin crear strings.
+    """
+    in_word = ~whitespace_mask(block)
+    edges = np.diff(in_word.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def iter_word_spans(
+    data: Union[str, Buffer],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Recorre el buffer por bloques y produce arrays (starts, ends) con offsets
+    absolutos de palabras completas. La memoria usada depende del bloque,
+    no del tamaño del documento.
+    """
+    buf = np.frombuffer(_as_bytes(data), dtype=np.uint8)
+    n = buf.size
+    pos = 0
+    size = block_size
+    while pos < n:
+        end = min(pos + size, n)
+        starts, ends = word_spans(buf[pos:end])
+        next_pos = end
+        if end < n and starts.size and ends[-1] == end - pos:
+            # La ultima palabra puede seguir en el siguiente bloque
+            if starts.size == 1 and starts[0] == 0:
+                size *= 2  # palabra mas grande que el bloque: ampliamos
+                continue
+            next_pos = pos + int(starts[-1])
+            starts, ends = starts[:-1], ends[:-1]
+        if starts.size:
+            yield starts + pos, ends + pos
+        pos = next_pos
+        size = block_size
+
+
+def iter_chunk_spans(
+    data: Union[str, Buffer],
+    chunk_size: int = 200,
+    overlap: int = 50,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[tuple[int, int]]:
+    """
+    Genera (start, end) en bytes para cada chunk de `chunk_size` palabras con
+    `overlap` palabras compartidas. Produce los mismos chunks que chunk_text,
+    pero sin copiar el texto.
+    """
+    step = _check_params(chunk_size, overlap)
+    starts = ends = np.empty(0, dtype=np.int64)
+    for block_starts, block_ends in iter_word_spans(data, block_size):
+        starts = np.concatenate((starts, block_starts))
+        ends = np.concatenate((ends, block_ends))
+        if starts.size < chunk_size:
+            continue
+        first = np.arange(0, starts.size - chunk_size + 1, step)
+        yield from zip(starts[first].tolist(), ends[first + chunk_size - 1].tolist())
+        consumed = int(first[-1]) + step
+        starts, ends = starts[consumed:], ends[consumed:]
+
+    # Cola del documento: igual que chunk_text, cada inicio < n produce un chunk
+    for first in range(0, starts.size, step):
+        last = min(first + chunk_size, starts.size) - 1
+        yield int(starts[first]), int(ends[last])
+
+
+def char_offsets(data: Union[str, Buffer], byte_offsets: list[int]) -> list[int]:
+    """
+    Convierte offsets en bytes (UTF-8) a offsets en caracteres, los que usa
+    start_index en LangChain: cuenta los bytes que no son de continuacion.
+    """
+    buf = np.frombuffer(_as_bytes(data), dtype=np.uint8)
+    starts_char = np.concatenate(([0], np.cumsum((buf & 0xC0) != 0x80)))
+    return starts_char[np.asarray(byte_offsets, dtype=np.int64)].tolist()
+
+
+def iter_chunks(
+    data: Buffer,
+    chunk_size: int = 200,
+    overlap: int = 50,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[memoryview]:
+    """
+    Genera cada chunk como memoryview sobre el buffer original (zero-copy).
+    Si el buffer es un mmap, libera las vistas antes de cerrarlo.
+    """
+    view = memoryview(data)
+    for start, end in iter_chunk_spans(data, chunk_size, overlap, block_size):
+        yield view[start:end]
+
+
+def iter_chunk_texts(
+    data: Union[str, Buffer],
+    chunk_size: int = 200,
+    overlap: int = 50,
+    normalize_whitespace: bool = False,
+    encoding: str = "utf-8",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[str]:
+    """
+    Igual que iter_chunks pero decodifica cada chunk a str solo al pedirlo.
+    normalize_whitespace=True une las palabras con un espacio, como chunk_text.
+    """
+    data = _as_bytes(data)
+    view = memoryview(data)
+    for start, end in iter_chunk_spans(data, chunk_size, overlap, block_size):
+        text = str(view[start:end], encoding)
+        yield " ".join(text.split()) if normalize_whitespace else text
+
+
+@contextmanager
+def mapped_file(path: Union[str, Path]) -> Iterator[Buffer]:
+    """
+    Abre un archivo como mmap de solo lectura (o bytes vacios si no tiene contenido).
+    """
+    with open(path, "rb") as f:
+        if Path(path).stat().st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def iter_file_chunks(
+    path: Union[str, Path],
+    chunk_size: int = 200,
+    overlap: int = 50,
+    normalize_whitespace: bool = False,
+    encoding: str = "utf-8",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[str]:
+    """
+    Chunking en streaming de un archivo de texto de cualquier tamaño via mmap.
+    """
+    with mapped_file(path) as buf:
+        yield from iter_chunk_texts(
+            buf, chunk_size, overlap, normalize_whitespace, encoding, block_size
+        )
+
+
+def chunk_text(text: str, chunk_size: int = 200, overlap: int = 50) -> list[str]:
+    """
+    Reemplazo directo del chunk_text original: misma firma y mismo resultado,
+    tambien con espacios Unicode como \xa0.
+    """
+    return list(iter_chunk_texts(text, chunk_size, overlap, normalize_whitespace=True))
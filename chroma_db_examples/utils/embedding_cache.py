@@ -0,0 +1,139 @@
+# embedding_cache.py
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Union
+
+import numpy as np
+
+# ---- Config ----
+CACHE_PATH = ".embedding_cache/chroma_db_examples.sqlite3"
+MAX_ENTRADAS = 1_000_000   # vectores guardados en disco; al pasarse se borran los menos usados
+MAX_CALIENTES = 10_000     # vectores guardados en memoria (LRU)
+FRACCION_DESALOJO = 0.1    # parte del disco que se libera cada vez que se llena
+LIMITE_SQLITE = 500        # parametros por consulta
+
+
+def normalizar(texto: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+
+class CachedEmbeddingFunction:
+    """
+    Cache en disco para una funcion de embeddings de chromadb (por ejemplo
+    OpenAIEmbeddingFunction). Cada vector se guarda en SQLite con la clave
+    sha256(modelo, tipo, texto normalizado): los textos ya vistos no vuelven
+    a llamar a la API, tampoco entre ejecuciones.
+
+    Encima del disco hay un LRU en memoria de `max_calientes` vectores. El
+    disco guarda como mucho `max_entradas` vectores: cuando se llena se
+    borran los menos usados (columna `usado`). SQLite se encarga de los
+    accesos concurrentes de varios procesos.
+    """
+
+    def __init__(
+        self,
+        embedding_fn: Callable[[list[str]], Any],
+        model_name: str,
+        path: Union[str, Path] = CACHE_PATH,
+        max_entradas: int = MAX_ENTRADAS,
+        max_calientes: int = MAX_CALIENTES,
+    ):
+        self.embedding_fn = embedding_fn
+        self.model_name = model_name
+        self.max_entradas = max_entradas
+        self.max_calientes = max_calientes
+        self.calientes: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("CREATE TABLE IF NOT EXISTS vectores (clave BLOB PRIMARY KEY, vector BLOB, usado INTEGER)")
+        columnas = [fila[1] for fila in self.db.execute("PRAGMA table_info(vectores)")]
+        if "usado" not in columnas:  # cache creada por una version anterior
+            self.db.execute("ALTER TABLE vectores ADD COLUMN usado INTEGER DEFAULT 0")
+        self.db.execute("CREATE INDEX IF NOT EXISTS vectores_usado ON vectores (usado)")
+        self.db.commit()
+        self.hits = self.disk_hits = self.misses = self.desalojados = 0
+
+    def _clave(self, texto: str, tipo: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{tipo}\0{normalizar(texto)}".encode("utf-8")).digest()
+
+    def _recordar(self, clave: bytes, vector: np.ndarray) -> None:
+        self.calientes[clave] = vector
+        self.calientes.move_to_end(clave)
+        if len(self.calientes) > self.max_calientes:
+            self.calientes.popitem(last=False)
+
+    def _desalojar(self) -> None:
+        """Si el disco pasa de `max_entradas`, borra los vectores menos usados."""
+        (total,) = self.db.execute("SELECT COUNT(*) FROM vectores").fetchone()
+        if total <= self.max_entradas:
+            return
+        sobran = total - self.max_entradas + int(self.max_entradas * FRACCION_DESALOJO)
+        with self.db:
+            self.db.execute(
+                "DELETE FROM vectores WHERE clave IN (SELECT clave FROM vectores ORDER BY usado LIMIT ?)", (sobran,)
+            )
+        self.desalojados += sobran
+
+    def _embed(self, textos: list[str], tipo: str) -> list[list[float]]:
+        claves = [self._clave(texto, tipo) for texto in textos]
+        encontrados = {}
+        for clave in claves:
+            if clave in self.calientes:
+                self.calientes.move_to_end(clave)
+                encontrados[clave] = self.calientes[clave]
+
+        en_disco = list(dict.fromkeys(clave for clave in claves if clave not in encontrados))
+        for i in range(0, len(en_disco), LIMITE_SQLITE):
+            parte = en_disco[i:i + LIMITE_SQLITE]
+            filas = self.db.execute(
+                f"SELECT clave, vector FROM vectores WHERE clave IN ({','.join('?' * len(parte))})", parte
+            ).fetchall()
+            for clave, vector in filas:
+                encontrados[clave] = np.frombuffer(vector, dtype=np.float32)
+                self._recordar(clave, encontrados[clave])
+                self.disk_hits += 1
+        ahora = time.time_ns()
+        usados = [(ahora, clave) for clave in en_disco if clave in encontrados]
+        if usados:
+            with self.db:
+                self.db.executemany("UPDATE vectores SET usado = ? WHERE clave = ?", usados)
+
+        faltan = {clave: texto for clave, texto in zip(claves, textos) if clave not in encontrados}
+        self.hits += sum(clave not in faltan for clave in claves)
+        self.misses += len(faltan)
+        if faltan:
+            nuevos = np.asarray(self.embedding_fn(list(faltan.values())), dtype=np.float32)
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO vectores VALUES (?, ?, ?)",
+                    [(clave, vector.tobytes(), ahora) for clave, vector in zip(faltan, nuevos)],
+                )
+            for clave, vector in zip(faltan, nuevos):
+                encontrados[clave] = vector
+                self._recordar(clave, vector)
+            self._desalojar()
+        return [encontrados[clave].tolist() for clave in claves]
+
+    def embed_documents(self, textos: list[str]) -> list[list[float]]:
+        return self._embed(textos, "document")
+
+    def embed_query(self, texto: str) -> list[float]:
+        return self._embed([texto], "query")[0]
+
+    def stats(self) -> dict[str, Any]:
+        consultas = self.hits + self.misses
+        (entradas,) = self.db.execute("SELECT COUNT(*) FROM vectores").fetchone()
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / consultas if consultas else 0.0,
+            "entradas": entradas,
+            "desalojados": self.desalojados,
+        }